@@ -0,0 +1,161 @@
+"""
+Offline bundles of app configuration files.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+
+from ndeploy.exception import NDeployError
+
+
+class ConfigBundleError(NDeployError):
+    """
+    Thrown when a config bundle could not be read or its content does not
+    match the bundle index
+    """
+    def __init__(self, bundle_file, error):
+        self.bundle_file = bundle_file
+        self.error = error
+
+    def __str__(self):
+        return "Invalid config bundle {}.\nERROR: {}".format(self.bundle_file, self.error)
+
+
+class ConfigBundle:
+    """
+    A compressed zip archive with the config files of remote config
+    repositories and the local ndeploy template, so apps can be deployed
+    without accessing the config repositories.
+
+    The `index.json` entry maps each repository file to its archive entry
+    and content sha256, so any file is read directly, and checked, without
+    reading the rest of the archive. It has the same reading interface of
+    ndeploy.config_mirror.ConfigMirror.
+    """
+
+    VERSION = 1
+    INDEX_ENTRY = "index.json"
+    TEMPLATE_ENTRY = "template.json"
+
+    def __init__(self, bundle_file):
+        """
+        Constructor. Opens the bundle and reads its index.
+
+        Args:
+            bundle_file (str): path of the bundle file
+
+        Raises:
+            ConfigBundleError if the file is not a valid bundle
+        """
+        self.bundle_file = bundle_file
+        try:
+            self._archive = zipfile.ZipFile(bundle_file)
+            index = json.loads(self._archive.read(self.INDEX_ENTRY).decode("utf-8"))
+            if index.get("version") != self.VERSION:
+                raise ValueError("Unsupported bundle version {}, expected {}"
+                                 .format(index.get("version"), self.VERSION))
+            self._template = index.get("template")
+            self._files = {(file["repo_url"], file["branch"], file["path"]): file for file in index["files"]}
+        except (OSError, KeyError, ValueError, AttributeError, TypeError, zipfile.BadZipFile) as e:
+            raise ConfigBundleError(bundle_file, e)
+
+    def read_file(self, repo_url, branch, file_path, rsa_path=None):
+        """
+        Returns the content of a file of a config repository
+
+        Args:
+            repo_url (str): the remote repo url
+            branch (str): git branch name
+            file_path (str): the path of the file relative to the repo root
+            rsa_path (str): not used, the bundle needs no key
+
+        Returns:
+            bytes containing the file content or None if the file is not in the bundle
+        """
+        file = self._files.get((repo_url, branch, file_path))
+        return self._read_entry(file) if file else None
+
+    def list_files(self, repo_url, branch, directory="", rsa_path=None):
+        """
+        Lists the bundled files of a directory of a config repository, recursively
+
+        Args:
+            repo_url (str): the remote repo url
+            branch (str): git branch name
+            directory (str): the directory relative to the repo root, empty for the root
+            rsa_path (str): not used, the bundle needs no key
+
+        Returns:
+            list of str containing the file paths relative to the repo root
+        """
+        prefix = directory.rstrip("/") + "/" if directory else ""
+        return sorted(path for file_repo_url, file_branch, path in self._files
+                      if file_repo_url == repo_url and file_branch == branch and path.startswith(prefix))
+
+    def get_template(self):
+        """
+        Returns the ndeploy template bundled with the config files
+
+        Returns:
+            dict with the template items or None if no template was bundled
+        """
+        if not self._template:
+            return None
+        return json.loads(self._read_entry(self._template).decode("utf-8"))
+
+    def _read_entry(self, file):
+        """
+        Reads an archive entry checking its content hash
+
+        Args:
+            file (dict): the index item of the entry
+
+        Returns:
+            bytes containing the entry content
+        """
+        try:
+            content = self._archive.read(file["entry"])
+        except (KeyError, zipfile.BadZipFile) as e:
+            raise ConfigBundleError(self.bundle_file, e)
+        if hashlib.sha256(content).hexdigest() != file["sha256"]:
+            raise ConfigBundleError(self.bundle_file, "The content of {} does not match the bundle index"
+                                    .format(file["entry"]))
+        return content
+
+    @classmethod
+    def write(cls, bundle_file, files, template=None):
+        """
+        Writes a bundle. The file is replaced atomically, so a failed
+        write never leaves a partial bundle.
+
+        Args:
+            bundle_file (str): path of the bundle file
+            files (dict): content (bytes) of each file, keyed by the tuple (repo_url, branch, path)
+            template (dict): the ndeploy template, if any
+        """
+        index = {"version": cls.VERSION, "template": None, "files": []}
+        bundle_dir = os.path.dirname(os.path.abspath(bundle_file))
+        fd, temp_file = tempfile.mkstemp(dir=bundle_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(temp_file, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                if template:
+                    content = json.dumps(template, sort_keys=True).encode("utf-8")
+                    index["template"] = cls._write_entry(archive, cls.TEMPLATE_ENTRY, content)
+                for (repo_url, branch, path), content in sorted(files.items()):
+                    entry = "configs/{}/{}/{}".format(hashlib.sha1(repo_url.encode("utf-8")).hexdigest(), branch, path)
+                    file = cls._write_entry(archive, entry, content)
+                    file.update(repo_url=repo_url, branch=branch, path=path)
+                    index["files"].append(file)
+                archive.writestr(cls.INDEX_ENTRY, json.dumps(index, indent=2, sort_keys=True))
+            os.replace(temp_file, bundle_file)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    @staticmethod
+    def _write_entry(archive, entry, content):
+        archive.writestr(entry, content)
+        return {"entry": entry, "sha256": hashlib.sha256(content).hexdigest()}
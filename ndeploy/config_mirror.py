@@ -0,0 +1,229 @@
+"""
+Local mirrors of the remote app configuration repositories.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import git
+
+from ndeploy.exception import NDeployError
+from ndeploy.ssh_agent import SshAgentPool
+
+
+class ConfigMirrorError(NDeployError):
+    """
+    Thrown when a config repository could not be mirrored
+    """
+    def __init__(self, repo_url, error):
+        self.repo_url = repo_url
+        self.error = error
+
+    def __str__(self):
+        return "Could not mirror config repository {}.\nERROR: {}".format(self.repo_url, self.error)
+
+
+class ConfigMirror:
+    """
+    Keeps a bare mirror of each remote config repository under the ndeploy
+    directory. The mirrors are refreshed with incremental fetches at most
+    once per `refresh_interval` and the config files are read straight from
+    the mirror object store, without a checkout. The repositories are
+    accessed through the ssh-agent session of their key.
+    """
+
+    DEFAULT_REFRESH_INTERVAL = 60
+    LAST_FETCH_FILE = "ndeploy-last-fetch"
+
+    def __init__(self, mirrors_dir, refresh_interval=DEFAULT_REFRESH_INTERVAL, ssh_agents=None):
+        """
+        Constructor.
+
+        Args:
+            mirrors_dir (str): directory where the mirrors are kept
+            refresh_interval (int): minimum seconds between two fetches
+                of the same repository. Each repository is fetched at most
+                once per ndeploy execution anyway.
+            ssh_agents (ssh_agent.SshAgentPool): ssh-agent sessions of the repo keys,
+                shared with the deployer. If None the mirror starts its own sessions.
+        """
+        self.mirrors_dir = mirrors_dir
+        self.refresh_interval = refresh_interval
+        self.ssh_agents = ssh_agents or SshAgentPool()
+        self._refreshed = set()
+        self._lock = threading.Lock()
+
+    def read_file(self, repo_url, branch, file_path, rsa_path=None):
+        """
+        Returns the content of a file of the config repository
+
+        Args:
+            repo_url (str): the remote repo url
+            branch (str): git branch, tag or commit name
+            file_path (str): the path of the file relative to the repo root
+            rsa_path (str): path to the repo rsa private key
+
+        Returns:
+            bytes containing the file content or None if the file does not exist
+        """
+        repo = self.get_mirror(repo_url, rsa_path)
+        commit = self._resolve_commit(repo, branch)
+        if commit is None:
+            return None
+        try:
+            return repo.git.cat_file("blob", "{}:{}".format(commit, file_path), stdout_as_string=False)
+        except git.GitCommandError:
+            return None
+
+    def list_files(self, repo_url, branch, directory="", rsa_path=None):
+        """
+        Lists the files of a directory of the config repository, recursively
+
+        Args:
+            repo_url (str): the remote repo url
+            branch (str): git branch, tag or commit name
+            directory (str): the directory relative to the repo root, empty for the root
+            rsa_path (str): path to the repo rsa private key
+
+        Returns:
+            list of str containing the file paths relative to the repo root
+        """
+        repo = self.get_mirror(repo_url, rsa_path)
+        commit = self._resolve_commit(repo, branch)
+        if commit is None:
+            return []
+        args = ["-r", "-z", "--name-only", commit]
+        if directory:
+            args += ["--", directory]
+        try:
+            out = repo.git.ls_tree(*args)
+        except git.GitCommandError:
+            return []
+        return [path for path in out.split("\0") if path]
+
+    def get_mirror(self, repo_url, rsa_path=None):
+        """
+        Returns the mirror of the repository, creating or refreshing it
+        if needed
+
+        Args:
+            repo_url (str): the remote repo url
+            rsa_path (str): path to the repo rsa private key
+
+        Returns:
+            git.Repo of the bare mirror
+        """
+        mirror_path = self.get_mirror_path(repo_url)
+        with self._lock:
+            try:
+                if not os.path.isdir(mirror_path):
+                    print("...Mirroring config repository " + repo_url)
+                    self._clone_mirror(repo_url, mirror_path, rsa_path)
+                    self._refreshed.add(mirror_path)
+                elif self._should_refresh(mirror_path):
+                    print("...Fetching config repository " + repo_url)
+                    repo = git.Repo(mirror_path)
+                    self._remove_key_ssh_command(repo)
+                    repo.git.fetch("--prune", "origin", env=self._get_git_env(rsa_path))
+                    self._touch_last_fetch(mirror_path)
+                    self._refreshed.add(mirror_path)
+            except git.GitCommandError as e:
+                raise ConfigMirrorError(repo_url, e)
+        return git.Repo(mirror_path)
+
+    def get_mirror_path(self, repo_url):
+        """
+        Returns the directory of the repository mirror
+
+        Args:
+            repo_url (str): the remote repo url
+
+        Returns:
+            str containing the mirror full path
+        """
+        return os.path.join(self.mirrors_dir, "{}.git".format(hashlib.sha1(repo_url.encode("utf-8")).hexdigest()))
+
+    @staticmethod
+    def _resolve_commit(repo, branch):
+        """
+        Resolves the name the user gave for the config version, looking for
+        a branch first, then a tag and at last a commit
+
+        Args:
+            repo (git.Repo): the mirror
+            branch (str): git branch, tag or commit name
+
+        Returns:
+            str containing the commit sha or None if the name does not exist
+        """
+        for ref in ["refs/heads/{}".format(branch), "refs/tags/{}".format(branch), branch]:
+            try:
+                return repo.git.rev_parse("--verify", "--quiet", "{}^{{commit}}".format(ref))
+            except git.GitCommandError:
+                continue
+        return None
+
+    def _should_refresh(self, mirror_path):
+        """
+        Tells if the mirror must be fetched, that is if it was not fetched
+        in this execution and the last fetch is older than the refresh interval
+
+        Args:
+            mirror_path (str): the mirror full path
+
+        Returns:
+            True if the mirror must be fetched, False otherwise
+        """
+        if mirror_path in self._refreshed:
+            return False
+
+        try:
+            last_fetch = os.path.getmtime(os.path.join(mirror_path, self.LAST_FETCH_FILE))
+        except OSError:
+            return True
+        return time.time() - last_fetch >= self.refresh_interval
+
+    def _clone_mirror(self, repo_url, mirror_path, rsa_path):
+        """
+        Clones the mirror in a temporary directory and moves it to
+        `mirror_path`, so an interrupted clone never leaves a broken mirror
+
+        Args:
+            repo_url (str): the remote repo url
+            mirror_path (str): the mirror full path
+            rsa_path (str): path to the repo rsa private key
+        """
+        os.makedirs(self.mirrors_dir, exist_ok=True)
+        temp_path = tempfile.mkdtemp(dir=self.mirrors_dir, suffix=".tmp")
+        try:
+            git.Repo.clone_from(repo_url, temp_path, mirror=True, env=self._get_git_env(rsa_path))
+            self._touch_last_fetch(temp_path)
+            os.rename(temp_path, mirror_path)
+        except OSError:
+            if not os.path.isdir(mirror_path):
+                raise
+        finally:
+            shutil.rmtree(temp_path, ignore_errors=True)
+
+    def _touch_last_fetch(self, mirror_path):
+        with open(os.path.join(mirror_path, self.LAST_FETCH_FILE), "w"):
+            pass
+
+    @staticmethod
+    def _remove_key_ssh_command(repo):
+        """
+        Removes the ssh command with the key file saved by older versions in
+        the mirror config, which would bypass the ssh-agent of the key
+
+        Args:
+            repo (git.Repo): the mirror
+        """
+        with repo.config_writer() as config:
+            if config.has_option("core", "sshCommand"):
+                config.remove_option("core", "sshCommand")
+
+    def _get_git_env(self, rsa_path):
+        return self.ssh_agents.get(rsa_path).get_env() if rsa_path else None
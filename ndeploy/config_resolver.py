@@ -0,0 +1,155 @@
+"""
+Inheritance and includes of config files.
+
+Any dict of a config file may name shared config fragments:
+
+    - `extends`: the configs the dict is based on, like a base app config.
+    - `include`: fragments spliced into the dict, like a shared env_vars block.
+
+Both take a path or a list of paths, relative to the file where they are
+declared: a local path for local files, or a path in the same config
+repository for remote files. The fragments are merged in order, then
+`extends` before `include`, and the keys of the dict itself win.
+"""
+import os.path
+import posixpath
+from collections.abc import Mapping
+
+from ndeploy.exception import NDeployError
+from ndeploy.layered_dict import LayeredDict
+
+EXTENDS_KEY = "extends"
+INCLUDE_KEY = "include"
+
+
+class ConfigCycleError(NDeployError):
+    """
+    Thrown when config files extend or include themselves
+    """
+    def __init__(self, chain):
+        self.chain = chain
+
+    def __str__(self):
+        return "Config files extend or include themselves: {}".format(" -> ".join(self.chain))
+
+
+class ConfigResolver:
+    """
+    Resolves the `extends` and `include` of config files. Each fragment
+    is loaded and resolved once, however many files use it, and shared by
+    them as a layer of their LayeredDict.
+
+    A config file is located by its `source` and `path`. The source is
+    None for local files and any hashable naming the repository for
+    remote files, e.g. (repo_url, branch, rsa_path).
+    """
+
+    def __init__(self, load_fragment):
+        """
+        Constructor.
+
+        Args:
+            load_fragment (fn): function with signature fn(source, path) returning
+                the parsed data of a fragment
+        """
+        self.load_fragment = load_fragment
+        self._fragments = {}
+        self._resolving = []
+
+    def resolve(self, data, source, path):
+        """
+        Resolves the `extends` and `include` of the config data, recursively
+
+        Args:
+            data: the parsed data of a config file or of part of it
+            source: the source of the config file, None for local files
+            path (str): the path of the config file
+
+        Returns:
+            the resolved data
+        """
+        if isinstance(data, list):
+            return [self.resolve(item, source, path) for item in data]
+        if not isinstance(data, Mapping):
+            return data
+
+        references = _as_list(data.get(EXTENDS_KEY)) + _as_list(data.get(INCLUDE_KEY))
+        data = {key: self.resolve(value, source, path) for key, value in data.items()
+                if key not in (EXTENDS_KEY, INCLUDE_KEY)}
+        if not references:
+            return data
+
+        fragments = [self.get_fragment(source, self.join_path(source, path, reference)) for reference in references]
+        return LayeredDict(*fragments, data)
+
+    def get_fragment(self, source, path):
+        """
+        Returns the resolved data of a fragment, loading it in the first use
+
+        Args:
+            source: the source of the fragment, None for local files
+            path (str): the path of the fragment
+
+        Returns:
+            the resolved data, shared by all the callers, so it must not be changed
+
+        Raises:
+            ConfigCycleError if the fragment extends or includes itself
+        """
+        key = (source, path)
+        if key in self._resolving:
+            chain = [resolving_path for _, resolving_path in self._resolving[self._resolving.index(key):]]
+            raise ConfigCycleError(chain + [path])
+
+        if key not in self._fragments:
+            print("...Resolving config fragment " + path)
+            self._resolving.append(key)
+            try:
+                self._fragments[key] = self.resolve(self.load_fragment(source, path), source, path)
+            finally:
+                self._resolving.pop()
+        return self._fragments[key]
+
+    def resolve_file(self, data, source, path):
+        """
+        Resolves the data of a config file loaded by the caller, like an
+        app config file. While it is resolved, fragments that extend or
+        include the file itself are reported as cycles.
+
+        Args:
+            data: the parsed data of the config file
+            source: the source of the config file, None for local files
+            path (str): the path of the config file
+
+        Returns:
+            the resolved data
+        """
+        self._resolving.append((source, path))
+        try:
+            return self.resolve(data, source, path)
+        finally:
+            self._resolving.pop()
+
+    @staticmethod
+    def join_path(source, path, reference):
+        """
+        Returns the path of a fragment referenced in a config file
+
+        Args:
+            source: the source of the config file, None for local files
+            path (str): the path of the config file
+            reference (str): the fragment path, relative to the config file.
+                For remote files a path starting with / is relative to the repo root.
+
+        Returns:
+            str containing the fragment path
+        """
+        if source is None:
+            return os.path.normpath(os.path.join(os.path.dirname(path), reference))
+        return posixpath.normpath(posixpath.join(posixpath.dirname(path), reference)).lstrip("/")
+
+
+def _as_list(reference):
+    if reference is None:
+        return []
+    return reference if isinstance(reference, list) else [reference]
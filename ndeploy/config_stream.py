@@ -0,0 +1,151 @@
+"""
+Streaming readers of multi-app config files.
+
+The readers go through the top level object of a json or yaml config
+file and return the items of its `apps` list one at a time, so the whole
+list is never in memory.
+"""
+import json
+
+import yaml
+from yaml.events import MappingEndEvent, MappingStartEvent, SequenceEndEvent, SequenceStartEvent
+
+from ndeploy.exception import InvalidEnvironmentFileError
+
+APPS_KEY = "apps"
+APP_ITEM = None
+READ_SIZE = 64 * 1024
+
+
+def iter_config_items(file):
+    """
+    Iterates a config file yielding its top level items. The items of the
+    `apps` list are yielded one by one with the key APP_ITEM.
+
+    Args:
+        file (str): path of the json or yaml config file
+
+    Returns:
+        iterator of tuples (key, value)
+
+    Raises:
+        InvalidEnvironmentFileError if the file is not a valid config file
+    """
+    with open(file) as content:
+        if file.endswith(".json"):
+            yield from _iter_json_items(file, _JsonStream(content))
+        elif file.endswith(".yaml"):
+            yield from _iter_yaml_items(file, content)
+        else:
+            raise InvalidEnvironmentFileError(file, ValueError("Invalid config file format"))
+
+
+class _JsonStream:
+    """
+    Buffered reader of a json text decoding one value at a time
+    """
+
+    def __init__(self, content):
+        self.content = content
+        self.buffer = ""
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def next_char(self):
+        """
+        Skips whitespaces and returns the next char without consuming it,
+        or an empty string at the end of the stream
+        """
+        while True:
+            self.buffer = self.buffer.lstrip()
+            if self.buffer or not self._read():
+                return self.buffer[:1]
+
+    def expect(self, chars):
+        """
+        Consumes the next char, that must be one of `chars`
+
+        Returns:
+            str containing the consumed char
+        """
+        char = self.next_char()
+        if not char or char not in chars:
+            raise ValueError("Expected one of '{}' but found '{}'".format(chars, char))
+        self.buffer = self.buffer[1:]
+        return char
+
+    def decode(self):
+        """
+        Decodes and consumes the next json value, reading more content
+        while the value is incomplete
+        """
+        self.next_char()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer)
+                if end < len(self.buffer) or self.eof:
+                    self.buffer = self.buffer[end:]
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._read()
+
+    def _read(self):
+        chunk = self.content.read(READ_SIZE)
+        self.eof = not chunk
+        self.buffer += chunk
+        return bool(chunk)
+
+
+def _iter_json_items(file, stream):
+    try:
+        stream.expect("{")
+        if stream.next_char() == "}":
+            return
+        while True:
+            key = stream.decode()
+            stream.expect(":")
+            if key == APPS_KEY and stream.next_char() == "[":
+                stream.expect("[")
+                if stream.next_char() == "]":
+                    stream.expect("]")
+                else:
+                    while True:
+                        yield APP_ITEM, stream.decode()
+                        if stream.expect(",]") == "]":
+                            break
+            else:
+                yield key, stream.decode()
+            if stream.expect(",}") == "}":
+                return
+    except ValueError as e:
+        raise InvalidEnvironmentFileError(file, e)
+
+
+def _iter_yaml_items(file, content):
+    """
+    Composes the yaml nodes one at a time from the parser events.
+    The pure python SafeLoader is used since the libyaml loader can only
+    compose whole documents.
+    """
+    loader = yaml.SafeLoader(content)
+    try:
+        loader.get_event()
+        loader.get_event()
+        if not loader.check_event(MappingStartEvent):
+            raise yaml.YAMLError("The config file should be a mapping")
+        loader.get_event()
+        while not loader.check_event(MappingEndEvent):
+            key = loader.construct_document(loader.compose_node(None, None))
+            if key == APPS_KEY and loader.check_event(SequenceStartEvent):
+                loader.get_event()
+                while not loader.check_event(SequenceEndEvent):
+                    yield APP_ITEM, loader.construct_document(loader.compose_node(None, None))
+                loader.get_event()
+            else:
+                yield key, loader.construct_document(loader.compose_node(None, None))
+    except yaml.YAMLError as e:
+        raise InvalidEnvironmentFileError(file, e)
+    finally:
+        loader.dispose()
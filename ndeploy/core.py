@@ -84,7 +84,8 @@ class NDeployCore:
         """
         return self.environment_repository.get_environment_key(name)
 
-    def deploy(self, file=None, group=None, name=None, environment=None):
+    def deploy(self, file=None, group=None, name=None, environment=None, all_apps=False, stream=False,
+               bundle=None):
         """
         Faz o deploy de uma aplicação.
         Args:
@@ -92,9 +93,48 @@ class NDeployCore:
             group: nome do grupo do projeto, usado em conjunto com name caso não seja informado o file.
             name: nome do projeto, usado em conjunto com group caso não seja informado o file.
             environment: nome do environment onde será feita o deploy.
+            all_apps: se True faz o deploy de todas as aplicações do grupo.
+            stream: se True lê e faz o deploy das aplicações do file uma a uma.
+            bundle: path do bundle de configurações de onde são lidos os arquivos remotos e o template.
 
         """
-        self.deployer.deploy(file, group, name, environment)
+        self.deployer.deploy(file, group, name, environment, all_apps, stream, bundle)
+
+    def compile(self, plan_file, file=None, group=None, name=None, environment=None, all_apps=False):
+        """
+        Gera o plano de deploy das aplicações, sem fazer o deploy.
+        Args:
+            plan_file: path do arquivo do plano que será gerado.
+            file: path do arquivo com os dados para deploy.
+            group: nome do grupo do projeto, usado em conjunto com name caso não seja informado o file.
+            name: nome do projeto, usado em conjunto com group caso não seja informado o file.
+            environment: nome do environment onde será feito o deploy.
+            all_apps: se True inclui no plano todas as aplicações do grupo.
+
+        """
+        self.deployer.compile(plan_file, file, group, name, environment, all_apps)
+
+    def apply(self, plan_file):
+        """
+        Faz o deploy das aplicações de um plano gerado pelo compile.
+        Args:
+            plan_file: path do arquivo do plano.
+
+        """
+        self.deployer.apply(plan_file)
+
+    def bundle(self, bundle_file, environments, groups, names=None):
+        """
+        Gera o bundle com os arquivos de configuração remotos e o template, para deploy sem acesso aos
+        repositórios de configuração.
+        Args:
+            bundle_file: path do arquivo do bundle que será gerado.
+            environments: nomes dos environments.
+            groups: nomes dos grupos dos projetos.
+            names: nomes dos projetos. Se vazio inclui todas as aplicações dos grupos.
+
+        """
+        self.deployer.bundle(bundle_file, environments, groups, names)
 
     def undeploy(self, file=None, name=None, group=None, environment=None):
         """
@@ -0,0 +1,153 @@
+"""
+Compiled deploy plans.
+
+A plan holds everything needed to deploy a set of apps: the environment,
+the apps with their env vars already resolved and the provider operation
+that deploys each one. It is written by `ndeploy compile` and executed by
+`ndeploy apply`, on the same or another machine, without reading any
+config file or config repository.
+"""
+import hashlib
+import json
+import os
+
+from ndeploy.exception import NDeployError
+from ndeploy.model import App, Environment
+from ndeploy.provider import AbstractProvider
+
+
+class InvalidDeployPlanError(NDeployError):
+    """
+    Thrown when a plan file could not be read, has an unsupported version
+    or does not match its checksum
+    """
+    def __init__(self, plan_file, error):
+        self.plan_file = plan_file
+        self.error = error
+
+    def __str__(self):
+        return "Invalid deploy plan {}.\nERROR: {}".format(self.plan_file, self.error)
+
+
+class DeployPlan:
+    """
+    A resolved deploy of apps in an environment. The plan file is a json
+    document with the plan `version`, the `checksum` of the plan content
+    and the `content` itself.
+
+    The apps env vars are stored resolved, so the plan file may hold
+    secrets and is written readable only by its owner.
+    """
+
+    VERSION = 1
+
+    def __init__(self, environment, steps=None):
+        """
+        Constructor.
+
+        Args:
+            environment (Environment): the environment where the apps will be deployed
+            steps (list): tuples (operation, App) with the provider operation that
+                deploys each app (@see ndeploy.provider.AbstractProvider.DEPLOY_OPERATIONS)
+        """
+        self.environment = environment
+        self.steps = steps or []
+
+    def add_step(self, operation, app):
+        """
+        Adds an app to the plan
+
+        Args:
+            operation (str): the provider operation that deploys the app
+            app (App): the app, with its env vars resolved
+        """
+        self.steps.append((operation, app))
+
+    def to_dict(self):
+        """
+        Returns the plan content as a dict
+
+        Returns:
+            dict with the environment and the apps
+        """
+        return {
+            "environment": dict(vars(self.environment)),
+            "apps": [{"operation": operation, "app": dict(vars(app))} for operation, app in self.steps]
+        }
+
+    @classmethod
+    def from_dict(cls, content):
+        """
+        Creates a plan from its content
+
+        Args:
+            content (dict): the plan content, as returned by `to_dict`
+
+        Returns:
+            DeployPlan object
+
+        Raises:
+            ValueError if the content is not a valid plan
+        """
+        try:
+            plan = cls(Environment(**content["environment"]))
+            for step in content["apps"]:
+                if step["operation"] not in AbstractProvider.DEPLOY_OPERATIONS:
+                    raise ValueError("Unknown deploy operation {}".format(step["operation"]))
+                plan.add_step(step["operation"], App(**step["app"]))
+        except (KeyError, TypeError) as e:
+            raise ValueError("Bad formed plan content: {!r}".format(e))
+        return plan
+
+    def save(self, plan_file):
+        """
+        Writes the plan file
+
+        Args:
+            plan_file (str): path of the plan file
+        """
+        content = self.to_dict()
+        document = {"version": self.VERSION, "checksum": self.get_checksum(content), "content": content}
+        fd = os.open(plan_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as file:
+            json.dump(document, file, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, plan_file):
+        """
+        Reads a plan file, checking its version and checksum
+
+        Args:
+            plan_file (str): path of the plan file
+
+        Returns:
+            DeployPlan object
+
+        Raises:
+            InvalidDeployPlanError if the file is not a valid plan
+        """
+        try:
+            with open(plan_file) as file:
+                document = json.load(file)
+            if not isinstance(document, dict) or document.get("version") != cls.VERSION:
+                raise ValueError("Unsupported plan version {}, expected {}"
+                                 .format(document.get("version") if isinstance(document, dict) else None, cls.VERSION))
+            if document.get("checksum") != cls.get_checksum(document.get("content")):
+                raise ValueError("The plan content does not match its checksum")
+            return cls.from_dict(document["content"])
+        except (OSError, ValueError) as e:
+            raise InvalidDeployPlanError(plan_file, e)
+
+    @staticmethod
+    def get_checksum(content):
+        """
+        Returns the checksum of a plan content
+
+        Args:
+            content (dict): the plan content
+
+        Returns:
+            str containing the sha256 of the canonical json of the content
+        """
+        canonical = json.dumps(content, sort_keys=True, separators=(",", ":"))
+        return "sha256:" + hashlib.sha256(canonical.encode("utf-8")).hexdigest()
@@ -1,15 +1,25 @@
 import json
 import os.path
-import tempfile
+import tarfile
 
 import yaml
-from yaml.parser import ParserError
-
+from yaml import YAMLError
+
+from ndeploy import config_stream
+from ndeploy.config_bundle import ConfigBundle
+from ndeploy.config_mirror import ConfigMirrorError
+from ndeploy.config_resolver import ConfigResolver
+from ndeploy.deploy_plan import DeployPlan
+from ndeploy.layered_dict import LayeredDict, to_dict
+from ndeploy.parse_cache import ParseCache
 from ndeploy.shell_exec import ShellExec
+from ndeploy.ssh_agent import SshAgentPool
 from ndeploy.model import App, Environment
 from ndeploy.exception import InvalidArgumentError, \
     AppConfigFileCloneError, InvalidEnvironmentFileError
 
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 
 class Deployer:
     """
@@ -19,18 +29,30 @@ class Deployer:
     NDEPLOY_TEMPLATE_FILE = 'ndeploy'
     CONFIG_FILE_FORMAT_SUPPORTED = ['json', 'yaml']
 
-    def __init__(self, provider_repository, env_repository):
+    def __init__(self, provider_repository, env_repository, config_mirror=None, parse_cache=None, ssh_agents=None):
         """
         Constructor.
         Args:
             provider_repository (provider.ProviderRepository):
             env_repository (environment_repository.EnvironmentRepository):
+            config_mirror (config_mirror.ConfigMirror): local mirrors of the remote
+                config repositories. If None the config files are downloaded
+                with git archive in every deploy.
+            parse_cache (parse_cache.ParseCache): cache of the parsed config files.
+                If None the parsed files are cached only in memory.
+            ssh_agents (ssh_agent.SshAgentPool): ssh-agent sessions of the repo keys,
+                shared with the config mirror. If None the sessions are only the deployer ones.
         """
         self.provider_repository = provider_repository
         self.env_repository = env_repository
+        self.config_mirror = config_mirror
+        self.parse_cache = parse_cache or ParseCache()
+        self.ssh_agents = ssh_agents or SshAgentPool()
         self._app_data_template = None
+        self.config_bundle = None
+        self.config_resolver = ConfigResolver(self._load_config_fragment)
 
-    def deploy(self, file=None, group=None, name=None, environment=None):
+    def deploy(self, file=None, group=None, name=None, environment=None, all_apps=False, stream=False, bundle=None):
         """
         Resolves the user parameters and deploys apps in an environment.
 
@@ -39,13 +61,152 @@ class Deployer:
         in the environment (@see ndeploy.model.Environment.app_deployment_file_url)
 
         If remotely the url will be formatted with `group` and `name` args.
+        With `all_apps` every config file of the `group` repository is deployed.
+        With `stream` the apps of the local `file` are read and deployed one
+        at a time (@see _deploy_stream). With `bundle` the remote config files
+        and the template are read from a config bundle written by `bundle`.
+
+        Args:
+            file (str): path to the local json configuration file
+            group (str): app group
+            name (str): app name
+            environment (str): environment name where the apps will be deployed
+            all_apps (bool): deploys all the apps of the group
+            stream (bool): streams the apps of the local file
+            bundle (str): path to a config bundle file
+        """
+        if bundle:
+            self._open_config_bundle(bundle)
+        self._exec_for_deploy_args(self._deploy, file, group, name, environment, all_apps, stream)
+
+    def bundle(self, bundle_file, environments, groups, names=None):
+        """
+        Writes a config bundle with the remote config files of the apps of
+        `groups` in each of the `environments`, the fragments they extend or
+        include and the local template, so they can be deployed later with
+        no access to the config repositories.
+        (@see ndeploy.config_bundle.ConfigBundle)
+
+        Args:
+            bundle_file (str): path of the bundle file to write
+            environments (list): names of the environments
+            groups (list): app groups
+            names (list): app names. If empty all the apps of the groups are bundled
+        """
+        files = {}
+
+        def load_fragment(source, path):
+            repo_url, branch, rsa_path = source
+            content = self._read_remote_file(repo_url, branch, path, rsa_path)
+            if content is None:
+                raise AppConfigFileCloneError(repo_url, path)
+            files[(repo_url, branch, path)] = content
+            return self._load_content_to_dict(path, content.decode("utf-8"))
+
+        bundle_resolver = ConfigResolver(load_fragment)
+        for environment in environments:
+            env = self._resolve_environment(None, environment)
+            for group in groups:
+                repo_url, branch, rsa_path, group_files = self._get_remote_group_files(group, env, names)
+                if not group_files:
+                    raise InvalidArgumentError("No app config file was found for group {} in environment {}"
+                                               .format(group, env.name))
+                for _, path, content in group_files:
+                    files[(repo_url, branch, path)] = content
+                    bundle_resolver.resolve_file(self._load_content_to_dict(path, content.decode("utf-8")),
+                                                 (repo_url, branch, rsa_path), path)
+
+        self._load_template_ndeploy_file()
+        ConfigBundle.write(bundle_file, files, to_dict(self._app_data_template))
+        print("...Config bundle with {} files written to {}".format(len(files), bundle_file))
+
+    def _open_config_bundle(self, bundle_file):
+        """
+        Makes the remote config files and the template be read from a
+        config bundle. The bundle takes the place of the config mirror, and
+        files missing in it are not fetched from the config repositories.
+
+        Args:
+            bundle_file (str): path to the config bundle file
+        """
+        print("...Reading config files from bundle " + bundle_file)
+        self.config_bundle = ConfigBundle(bundle_file)
+        self.config_mirror = self.config_bundle
+
+    def compile(self, plan_file, file=None, group=None, name=None, environment=None, all_apps=False):
+        """
+        Resolves the apps like `deploy` does, without deploying them, and
+        writes a deploy plan with the environment, the apps with their env
+        vars resolved and the provider operation that deploys each app.
+        (@see ndeploy.deploy_plan.DeployPlan)
 
         Args:
+            plan_file (str): path of the plan file to write
             file (str): path to the local json configuration file
             group (str): app group
             name (str): app name
             environment (str): environment name where the apps will be deployed
+            all_apps (bool): plans all the apps of the group
         """
+        plan = None
+
+        def add_to_plan(env, item_data, app_group, app_name):
+            nonlocal plan
+            app, provider = self._resolve_app_and_provider(env, app_group, app_name, item_data)
+            plan = plan or DeployPlan(env)
+            plan.add_step(provider.plan_deploy(app, env), app)
+
+        self._exec_for_deploy_args(add_to_plan, file, group, name, environment, all_apps, False)
+        if plan is None:
+            raise InvalidArgumentError("No app was found to write the deploy plan")
+        plan.save(plan_file)
+        print("...Deploy plan with {} apps written to {}".format(len(plan.steps), plan_file))
+
+    def apply(self, plan_file):
+        """
+        Deploys the apps of a plan written by `compile`. No config file or
+        config repository is read.
+
+        Args:
+            plan_file (str): path of the plan file
+        """
+        plan = DeployPlan.load(plan_file)
+        provider = self._resolve_provider(plan.environment)
+        assert provider is not None
+
+        for index, (operation, app) in enumerate(plan.steps, start=1):
+            print("...Application {}/{}...".format(index, len(plan.steps)))
+            provider.execute_deploy(operation, app, plan.environment)
+
+    def _exec_for_deploy_args(self, deploy_callback, file, group, name, environment, all_apps, stream):
+        """
+        Validates the deploy arguments and calls 'deploy_callback' for each
+        app they select
+
+        Args:
+            deploy_callback (fn): function that makes the deploy
+            file (str): path to the local json configuration file
+            group (str): app group
+            name (str): app name
+            environment (str): environment name where the apps will be deployed
+            all_apps (bool): selects all the apps of the group
+            stream (bool): streams the apps of the local file
+        """
+        if stream:
+            if not file or all_apps:
+                raise InvalidArgumentError("To stream the apps pass the local file path with --file arg")
+            self._load_template_ndeploy_file()
+            self._deploy_stream(deploy_callback, file, environment)
+            return
+
+        if all_apps:
+            if not group or file or name:
+                raise InvalidArgumentError("To deploy all the apps of a group pass only the group "
+                                           "with --group arg and the environment")
+            self._load_template_ndeploy_file()
+            self._deploy_group(deploy_callback, group, environment)
+            return
+
         if not file and (not group or not name):
             raise InvalidArgumentError("Could not resolve the app json file. Either pass "
                                        "the local file path with --file arg or remotely"
@@ -53,11 +214,13 @@ class Deployer:
 
         self._load_template_ndeploy_file()
 
-        self._exec_deploy_or_undeploy(self._deploy, file, group, name, environment)
+        self._exec_deploy_or_undeploy(deploy_callback, file, group, name, environment)
 
     def undeploy(self, file=None, name=None, group=None, environment=None):
         """
-        Undeploys the app with `name` and `group` from `environment`
+        Undeploys the app with `name` and `group` from `environment`.
+        All the apps of the config file are handed to the provider at once,
+        so it can remove them in a single batch.
 
         Args:
             file (str): path to the local json configuration file
@@ -71,7 +234,14 @@ class Deployer:
                                        "the local file path with --file arg or remotely"
                                        "using --group and --name args")
 
-        self._exec_deploy_or_undeploy(self._undeploy, file, group, name, environment)
+        env, data_in_json = self._resolve_apps_data_and_env(file, group, name, environment)
+        items_data = data_in_json['apps'] if data_in_json and 'apps' in data_in_json else [data_in_json]
+
+        apps = [self._resolve_app(item_data, group, name, env) for item_data in items_data]
+        provider = self._resolve_provider(env)
+        assert provider is not None
+
+        provider.undeploy_apps(apps, env)
 
     def _exec_deploy_or_undeploy(self, undeploy_deploy_callback, file, group, name, environment):
         """
@@ -86,7 +256,19 @@ class Deployer:
             environment (str): the environment name
         """
         env, data_in_json = self._resolve_apps_data_and_env(file, group, name, environment)
+        self._exec_for_each_app(undeploy_deploy_callback, env, data_in_json, group, name)
+
+    def _exec_for_each_app(self, undeploy_deploy_callback, env, data_in_json, group, name):
+        """
+        Calls 'undeploy_deploy_callback' for each app of a config file
 
+        Args:
+            undeploy_deploy_callback (fn): function that makes the undeploy or deploy
+            env (Environment): the environment of the apps
+            data_in_json (dict): the config file data
+            group (str): the app group name
+            name (str): the app name
+        """
         if data_in_json and 'apps' in data_in_json:
             for index, item_data in enumerate(data_in_json['apps'], start=1):
                 print("...Application {}/{}...".format(index, len(data_in_json['apps'])))
@@ -94,31 +276,88 @@ class Deployer:
         else:
             undeploy_deploy_callback(env, data_in_json, group, name)
 
-    def _deploy(self, env, item_data, group, app_name):
+    def _deploy_group(self, deploy_callback, group, environment):
         """
-        Deploy an application session
+        Deploys the apps of all the config files of the group repository.
+        The config files are fetched at once and deployed in name order.
 
         Args:
-            env (class): Environment for deploy
-            item_data (dict): dict containing app data from existing file
-            group (str): app group name
-            app_name (str): app name
+            deploy_callback (fn): function that makes the deploy
+            group (str): the app group name
+            environment (str): the environment name
         """
-        app, provider = self._resolve_app_and_provider(env, group, app_name, item_data)
-        provider.deploy(app, env)
+        env = self._resolve_environment(None, environment)
+        group_confs = self._get_remote_group_confs(group, env)
+        if not group_confs:
+            raise InvalidArgumentError("No app config file was found for group {}".format(group))
+
+        for index, (name, data_in_json) in enumerate(group_confs, start=1):
+            print("...Config file {}/{}: {}...".format(index, len(group_confs), name))
+            self._exec_for_each_app(deploy_callback, env, data_in_json, group, name)
+
+    def _deploy_stream(self, deploy_callback, file, environment):
+        """
+        Deploys the apps of a local config file while it is read, so the
+        first app is deployed right away and the memory use does not grow
+        with the number of apps. The other top level items, like the
+        `environment`, must come before the `apps` list.
+
+        Args:
+            deploy_callback (fn): function that makes the deploy
+            file (str): path to the local json or yaml configuration file
+            environment (str): the environment name
+        """
+        path = os.path.abspath(file)
+        env = None
+        file_data = {}
+        count = 0
+        for key, item_data in config_stream.iter_config_items(file):
+            if key is not config_stream.APP_ITEM:
+                file_data[key] = item_data
+                continue
+
+            if env is None:
+                file_data = self.config_resolver.resolve_file(file_data, None, path)
+                env = self._resolve_stream_environment(file_data, environment)
+            count += 1
+            print("...Application {}...".format(count))
+            deploy_callback(env, self.config_resolver.resolve_file(item_data, None, path), None, None)
 
-    def _undeploy(self, env, item_data, group, name):
+        if not count:
+            data_in_json = self._resolve_environment_data(self.config_resolver.resolve_file(file_data, None, path))
+            env = self._resolve_environment(data_in_json, environment)
+            self._exec_for_each_app(deploy_callback, env, data_in_json, None, None)
+
+    def _resolve_stream_environment(self, file_data, environment):
+        """
+        Resolves the environment of a streamed config file from the top
+        level items read before the `apps` list
+
+        Args:
+            file_data (dict): the top level items already read
+            environment (str): the environment name
+
+        Returns:
+            ndeploy.model.Environment object
+        """
+        if not environment and "environment" not in file_data:
+            raise InvalidArgumentError("cant resolve any environment. When streaming the apps "
+                                       "the environment must come before the apps list in the "
+                                       "config file or be passed explicitly in 'ndeploy deploy' command")
+        return self._resolve_environment(self._resolve_environment_data(file_data), environment)
+
+    def _deploy(self, env, item_data, group, app_name):
         """
-        Undeploy an application session
+        Deploy an application session
 
         Args:
             env (class): Environment for deploy
             item_data (dict): dict containing app data from existing file
             group (str): app group name
-            name (str): app name
+            app_name (str): app name
         """
-        app, provider = self._resolve_app_and_provider(env, group, name, item_data)
-        provider.undeploy(app, env)
+        app, provider = self._resolve_app_and_provider(env, group, app_name, item_data)
+        provider.deploy(app, env)
 
     def _resolve_apps_data_and_env(self, file, group, app_name, env_name):
         """
@@ -168,30 +407,57 @@ class Deployer:
 
         return app, provider
 
-    @staticmethod
-    def _exec_git_clone_file(rsa_path, repo_url, branch_name, temporary_path, file_path):
+    def _get_ssh_agent(self, rsa_path):
         """
-           Download the remote configuration file in a git repository
+        Returns the ssh-agent session holding the key, started once per
+        key and reused by all the remote fetches of this process
+
+        Args:
+            rsa_path (str): path to the repo rsa private key
+
+        Returns:
+            ndeploy.ssh_agent.SshAgentSession object
+        """
+        return self.ssh_agents.get(rsa_path)
+
+    def _exec_git_archive(self, rsa_path, repo_url, branch_name, path):
+        """
+           Downloads files of a remote git repository. The archive is read
+           as a stream and the files are kept in memory. The key is served by
+           the ssh-agent session of the key.
 
            Args:
                rsa_path (str): path to the repo rsa private key
                repo_url (str): the remote repo url
                branch_name (str): git branch name
-               temporary_path (str): the path of the temporary dir to the ndeploy
-               file_path (str): the path of the file relative to the repo root
+               path (str): the path of the file or directory relative to the repo root.
+                   Empty for the whole repository
 
            Returns:
-               full path for the downloaded file
+               dict with the path relative to the repo root and the content
+               of each downloaded file
+
+           Raises:
+               AppConfigFileCloneError with the git archive errors if nothing
+               was downloaded, including when the path does not exist
            """
-        ShellExec.execute_program("ssh-agent bash -c 'ssh-add {rsa_path}; git archive --remote={repo_url} "
-                                  "{branch} {file_relative_path} | tar -x -C {local_folder}'"
-                                  .format(rsa_path=rsa_path, repo_url=repo_url,
-                                          branch=branch_name, local_folder=temporary_path,
-                                          file_relative_path=file_path), True)
-        cloned_file = os.path.join(temporary_path, file_path)
-        if not os.path.isfile(cloned_file):
-            raise AppConfigFileCloneError(repo_url, cloned_file)
-        return cloned_file
+        def read_archive(stream):
+            files = {}
+            try:
+                with tarfile.open(fileobj=stream, mode="r|") as archive:
+                    for member in archive:
+                        if member.isfile():
+                            files[member.name] = archive.extractfile(member).read()
+            except tarfile.ReadError:
+                pass
+            return files
+
+        err, files = ShellExec.read_program_output("git archive --remote={repo_url} {branch} {path}"
+                                                   .format(repo_url=repo_url, branch=branch_name, path=path),
+                                                   read_archive, env=self._get_ssh_agent(rsa_path).get_env())
+        if err and not files:
+            raise AppConfigFileCloneError(repo_url, path, err)
+        return files
 
     def _get_remote_conf(self, repo_url, branch, file_relative_path, rsa_path):
         """
@@ -207,25 +473,202 @@ class Deployer:
             dict containing the contents of the remote config file
 
         """
-        local_folder = os.path.join(
-            self.env_repository.get_ndeploy_dir(), "tmp")
-
-        if not os.path.isdir(local_folder):
-            os.makedirs(local_folder)
+        if self.config_mirror:
+            try:
+                return self._get_remote_conf_from_mirror(repo_url, branch, file_relative_path, rsa_path)
+            except ConfigMirrorError as e:
+                print("...{}\n...Downloading the file with git archive".format(e))
 
         print("...Getting remote app config file from " + repo_url)
 
-        with tempfile.TemporaryDirectory(dir=local_folder) as temporary_dir:
+        file_name, file_extension = file_relative_path.split('.')
+        new_file_extension = 'yaml' if file_extension == 'json' else 'json'
+        clone_errors = []
+        for file_path in [file_relative_path, '{}.{}'.format(file_name, new_file_extension)]:
+            try:
+                files = self._exec_git_archive(rsa_path, repo_url, branch, file_path)
+            except AppConfigFileCloneError as e:
+                clone_errors.append(e)
+                continue
+            if file_path in files:
+                print("...Successfully downloaded remote app config file")
+                return self._resolve_environment_data(self._load_remote_config_content(
+                    repo_url, branch, rsa_path, file_path, files[file_path]))
+
+        raise clone_errors[0] if clone_errors else AppConfigFileCloneError(repo_url, file_relative_path)
+
+    def _get_remote_conf_from_mirror(self, repo_url, branch, file_relative_path, rsa_path):
+        """
+        Gets the remote app configuration file from the local mirror of
+        the config repository. If the file does not exist the other
+        supported extension is tried.
+
+        Args:
+            repo_url (str): the remote repo url
+            branch (str): git branch name
+            file_relative_path (str): the path of the file relative to the repo root
+            rsa_path (str): path to the repo rsa private key
+
+        Returns:
+            dict containing the contents of the remote config file
+
+        """
+        print("...Getting remote app config file from mirror of " + repo_url)
+        file_name, file_extension = file_relative_path.split('.')
+        new_file_extension = 'yaml' if file_extension == 'json' else 'json'
+        for file_path in [file_relative_path, '{}.{}'.format(file_name, new_file_extension)]:
+            content = self.config_mirror.read_file(repo_url, branch, file_path, rsa_path)
+            if content is not None:
+                return self._resolve_environment_data(self._load_remote_config_content(
+                    repo_url, branch, rsa_path, file_path, content))
+
+        raise AppConfigFileCloneError(repo_url, file_relative_path)
+
+    def _get_remote_group_confs(self, group, env):
+        """
+        Gets all the app configuration files of the group repository.
+        The files are those matching the config file path of the
+        environment url, in any supported format.
+
+        Args:
+            group (str): the app group
+            env (Environment): Environment for deploy
+
+        Returns:
+            list of tuples (app name, dict containing the config file contents) sorted by name
+        """
+        repo_url, branch, rsa_path, files = self._get_remote_group_files(group, env)
+        return [(name, self._resolve_environment_data(self._load_remote_config_content(
+            repo_url, branch, rsa_path, path, content))) for name, path, content in files]
+
+    def _get_remote_group_files(self, group, env, names=None):
+        """
+        Gets the app configuration files of the group repository, from the
+        config mirror if available or else in one git archive download.
+
+        Args:
+            group (str): the app group
+            env (Environment): Environment for deploy
+            names (list): app names to get. If empty all the apps of the group are got
+
+        Returns:
+            tuple (repo_url, branch, rsa_path, files) where files is a list of tuples
+            (app name, file path, bytes containing the file content) sorted by name
+        """
+        rsa_path = self.env_repository.get_env_private_key_path(env.name)
+        repo_url, branch, file_template = env.format_remote_deployment_file_url(group, "{name}")
+        config_dir = os.path.dirname(file_template.split("{name}")[0])
+
+        def select(files):
+            return [(name, path) for name, path in files if not names or name in names]
+
+        if self.config_mirror:
+            try:
+                print("...Listing remote app config files from mirror of " + repo_url)
+                files = select(self._find_group_config_files(
+                    self.config_mirror.list_files(repo_url, branch, config_dir, rsa_path), file_template))
+                return repo_url, branch, rsa_path, [
+                    (name, path, self.config_mirror.read_file(repo_url, branch, path, rsa_path))
+                    for name, path in files]
+            except ConfigMirrorError as e:
+                print("...{}\n...Downloading the files with git archive".format(e))
+
+        print("...Getting remote app config files from " + repo_url)
+        archive_files = self._exec_git_archive(rsa_path, repo_url, branch, config_dir)
+        files = select(self._find_group_config_files(list(archive_files), file_template))
+        print("...Successfully downloaded {} remote app config files".format(len(files)))
+        return repo_url, branch, rsa_path, [(name, path, archive_files[path]) for name, path in files]
+
+    def _load_remote_config_content(self, repo_url, branch, rsa_path, file_path, content):
+        """
+        Parses the content of a remote config file and resolves its
+        extends and includes, fetched from the same config repository
+
+        Args:
+            repo_url (str): the remote repo url
+            branch (str): git branch name
+            rsa_path (str): path to the repo rsa private key
+            file_path (str): the path of the file relative to the repo root
+            content (bytes): the file content
+
+        Returns:
+            dict with file items
+        """
+        return self.config_resolver.resolve_file(self._load_content_to_dict(file_path, content.decode("utf-8")),
+                                                 (repo_url, branch, rsa_path), file_path)
+
+    def _read_remote_file(self, repo_url, branch, file_path, rsa_path):
+        """
+        Reads a file of a remote config repository, from the config mirror
+        if available or else with git archive
+
+        Args:
+            repo_url (str): the remote repo url
+            branch (str): git branch name
+            file_path (str): the path of the file relative to the repo root
+            rsa_path (str): path to the repo rsa private key
+
+        Returns:
+            bytes containing the file content or None if the file does not exist
+        """
+        if self.config_mirror:
             try:
-                cloned_file = self._exec_git_clone_file(rsa_path, repo_url, branch, temporary_dir, file_relative_path)
-            except AppConfigFileCloneError:
-                file_name, file_extension = file_relative_path.split('.')
-                new_file_extension = 'yaml' if file_extension == 'json' else 'json'
-                file_relative_path = '{}.{}'.format(file_name, new_file_extension)
-                cloned_file = self._exec_git_clone_file(rsa_path, repo_url, branch, temporary_dir, file_relative_path)
+                return self.config_mirror.read_file(repo_url, branch, file_path, rsa_path)
+            except ConfigMirrorError as e:
+                print("...{}\n...Downloading the file with git archive".format(e))
+        return self._exec_git_archive(rsa_path, repo_url, branch, file_path).get(file_path)
+
+    def _load_config_fragment(self, source, path):
+        """
+        Loads a config fragment extended or included by a config file
+        (@see ndeploy.config_resolver.ConfigResolver)
+
+        Args:
+            source: None for local fragments or the tuple (repo_url, branch, rsa_path)
+                of the config repository
+            path (str): the fragment path, relative to the repo root for remote fragments
+
+        Returns:
+            dict with the fragment items
+        """
+        if source is None:
+            try:
+                with open(path) as content_data:
+                    return self._load_content_to_dict(path, content_data.read())
+            except OSError as e:
+                raise InvalidEnvironmentFileError(path, e)
+
+        repo_url, branch, rsa_path = source
+        content = self._read_remote_file(repo_url, branch, path, rsa_path)
+        if content is None:
+            raise AppConfigFileCloneError(repo_url, path)
+        return self._load_content_to_dict(path, content.decode("utf-8"))
+
+    def _find_group_config_files(self, paths, file_template):
+        """
+        Finds the app config files in `paths`, that is the paths matching
+        `file_template` with any app name and supported extension. If an
+        app has files in several formats the template one is used.
+
+        Args:
+            paths (list): file paths relative to the repo root
+            file_template (str): the config file path with a {name} placeholder
 
-            print("...Successfully downloaded remote app config file")
-            return self._resolve_environment_file(cloned_file)
+        Returns:
+            list of tuples (app name, file path) sorted by name
+        """
+        prefix, suffix = file_template.split("{name}", 1)
+        suffix_base, _, template_extension = suffix.rpartition(".")
+        extensions = [template_extension] + [extension for extension in self.CONFIG_FILE_FORMAT_SUPPORTED
+                                             if extension != template_extension]
+        files = {}
+        for extension in reversed(extensions):
+            file_suffix = "{}.{}".format(suffix_base, extension)
+            for path in paths:
+                name = path[len(prefix):-len(file_suffix)]
+                if path.startswith(prefix) and path.endswith(file_suffix) and name and "/" not in name:
+                    files[name] = path
+        return sorted(files.items())
 
     def _resolve_remote_app_file(self, group, name, env):
         """
@@ -274,7 +717,7 @@ class Deployer:
         if "environment" in app_data:
             app_data.pop("environment")
 
-        return App(**app_data)
+        return App(**to_dict(app_data))
 
     def _resolve_provider(self, env):
         """
@@ -314,34 +757,51 @@ class Deployer:
                                    "Either pass an environment in app "
                                    "config file or explicitly in 'ndeploy deploy' command")
 
-    @staticmethod
-    def _load_file_to_dict(file):
+    def _load_file_to_dict(self, file):
         """
-        Load config file and return a dict with items
+        Load config file and return a dict with items, with its extends
+        and includes resolved
 
         Args:
             file: configuration file json, yaml
         Returns:
             dict with file items
         """
+        with open(file) as content_data:
+            return self.config_resolver.resolve_file(self._load_content_to_dict(content_data.name, content_data.read()),
+                                                     None, os.path.abspath(file))
+
+    def _load_content_to_dict(self, file, content):
+        """
+        Parses the content of a config file and return a dict with items.
+        Contents already parsed are taken from the parse cache.
+
+        Args:
+            file: configuration file name, its extension tells the format
+            content (str): the configuration json, yaml
+        Returns:
+            dict with file items
+        """
         try:
-            with open(file) as content_data:
-                if content_data.name.endswith(".json"):
-                    config_data = json.load(content_data)
-                elif content_data.name.endswith(".yaml"):
-                    config_data = yaml.load(content_data)
-                else:
-                    raise ValueError("Invalid config file format")
-
-                return config_data
-        except (ValueError, ParserError) as e:
+            if file.endswith(".json"):
+                return self.parse_cache.get_or_parse(content, "json", json.loads)
+            elif file.endswith(".yaml"):
+                return self.parse_cache.get_or_parse(content, "yaml", lambda c: yaml.load(c, Loader=YAML_LOADER))
+            else:
+                raise ValueError("Invalid config file format")
+        except (ValueError, YAMLError) as e:
             raise InvalidEnvironmentFileError(file, e)
 
     def _load_template_ndeploy_file(self):
         """
-        Load local template file ndeploy.json
+        Load local template file ndeploy.json, or the bundled template
+        when reading from a config bundle
 
         """
+        if self.config_bundle:
+            self._app_data_template = self.config_bundle.get_template()
+            return
+
         cwd = os.getcwd() + os.sep
         full_path_template = "{0}{1}".format(cwd, self.NDEPLOY_TEMPLATE_FILE)
         if os.path.exists('{}.json'.format(full_path_template)):
@@ -360,32 +820,22 @@ class Deployer:
         Returns:
             dict with file items
         """
-        app_data_load = self._load_file_to_dict(file)
-
-        if self._app_data_template:
-            print("...Merge local settings with remote...")
-            return self._deep_merge_two_dict(self._app_data_template, app_data_load)
-
-        return app_data_load
+        return self._resolve_environment_data(self._load_file_to_dict(file))
 
-    def _deep_merge_two_dict(self, dict1, dict2, in_conflict=lambda v1, v2: v2):
+    def _resolve_environment_data(self, app_data_load):
         """
-        Merge dict2 into dict1, using in_conflict function to resolve the leaf conflicts
+        Merges the local template ndeploy.json in the config file data.
+        The merge is a copy-on-write view, so the template is never changed
+        and is shared by all the config files.
 
         Args:
-            dict1: dictionary initial
-            dict2: dictionary to merge
+            app_data_load (dict): the config file data
 
         Returns:
-            new merged dict
+            dict with file items
         """
+        if self._app_data_template:
+            print("...Merge local settings with remote...")
+            return LayeredDict(self._app_data_template, app_data_load)
 
-        for k in dict2:
-            if k in dict1:
-                if isinstance(dict1[k], dict) and isinstance(dict2[k], dict):
-                    self._deep_merge_two_dict(dict1[k], dict2[k], in_conflict)
-                elif dict1[k] != dict2[k]:
-                    dict1[k] = in_conflict(dict1[k], dict2[k])
-            else:
-                dict1[k] = dict2[k]
-        return dict1
+        return app_data_load
@@ -19,13 +19,14 @@ class AppConfigFileCloneError(NDeployError):
     """
     Throws when ndeploy could not get remote config file for a deploy
     """
-    def __init__(self, repo, local_file):
+    def __init__(self, repo, local_file, error=None):
         self.repo = repo
         self.local_file = local_file
+        self.error = error
 
     def __str__(self):
-        return "Could not get app config file from {}. Tried to save in {}"\
-            .format(self.repo, self.local_file)
+        message = "Could not get app config file {} from {}".format(self.local_file, self.repo)
+        return "{}.\nERROR: {}".format(message, self.error) if self.error else message
 
 
 class BadFormedRemoteConfigUrlError(NDeployError):
@@ -1,3 +1,8 @@
+import fcntl
+import os
+import shutil
+import tempfile
+
 import git
 
 from ndeploy.exception import NDeployError
@@ -92,8 +97,33 @@ class GitExec:
                                    .format(remote_repo=remote_name, repo_full_path=repo_full_path))
         except git.NoSuchPathError:
             raise GitNoSuchPathError(repo_full_path)
+        except git.GitCommandError as e:
+            raise GitExecError(e)
 
-    def git_clone_from(self, source_repository, repo_full_path, branch_name=None):
+    def git_push_url(self, repo_full_path, remote_url, ref, branch_remote_name):
+        """
+        Push para a url de um repositório remoto, sem adicionar um remoto na
+        configuração do repositório
+
+        Args:
+            repo_full_path: diretório completo do repositório git
+            remote_url: url do repositório remoto
+            ref: branch, ref ou commit local
+            branch_remote_name: nome da branch remota
+        """
+        try:
+            repo = git.Repo(repo_full_path)
+            status, out, err = repo.git.push(remote_url, "{ref}:refs/heads/{branch_remote}"
+                                             .format(ref=ref, branch_remote=branch_remote_name),
+                                             with_extended_output=True)
+            print(err or out)
+        except git.NoSuchPathError:
+            raise GitNoSuchPathError(repo_full_path)
+        except git.GitCommandError as e:
+            raise GitExecError(e)
+
+    def git_clone_from(self, source_repository, repo_full_path, branch_name=None, depth=None, blobless=False,
+                       single_branch=False):
         """
         Clone de uma branch de um repositório remoto
 
@@ -101,29 +131,196 @@ class GitExec:
             source_repository: endereço do repositório do fonte
             repo_full_path: diretório completo para clone do fonte
             branch_name: nome do branch a ser clonada
+            depth: se informado clona apenas esse número de commits do histórico
+            blobless: se True os conteúdos dos arquivos são baixados apenas quando usados
+            single_branch: se True clona apenas a branch, sem as outras refs do remoto
         """
         kwargs = {"progress": self.progress}
         if branch_name:
             kwargs["branch"] = branch_name
+        if depth:
+            kwargs["depth"] = depth
+        if blobless:
+            kwargs["filter"] = "blob:none"
+        if single_branch:
+            kwargs["single_branch"] = True
         try:
             git.Repo.clone_from(source_repository, repo_full_path, **kwargs)
         except git.GitCommandError as e:
             raise GitExecError(e)
 
-    def git_pull(self, temp_path_app):
+    def git_pull(self, temp_path_app, depth=None):
         """
         Pull do repositório remoto
 
         Args:
             temp_path_app: diretório completo do repositório para pull
+            depth: se informado busca apenas esse número de commits do histórico
         """
+        kwargs = {"progress": self.progress}
+        if depth:
+            kwargs["depth"] = depth
         try:
             repo = git.Repo(temp_path_app)
             origin = repo.remotes.origin
-            origin.pull(progress=self.progress)
+            origin.pull(**kwargs)
         except git.NoSuchPathError:
             raise GitNoSuchPathError(temp_path_app)
 
+    @staticmethod
+    def git_deepen(repo_full_path):
+        """
+        Busca o histórico completo de um repositório clonado com depth
+
+        Args:
+            repo_full_path: diretório completo do repositório git
+
+        Returns:
+            bool: True se o histórico foi buscado, False se o repositório já estava completo
+        """
+        try:
+            repo = git.Repo(repo_full_path)
+            if repo.git.rev_parse("--is-shallow-repository") != "true":
+                return False
+            repo.git.fetch("--unshallow")
+            return True
+        except git.NoSuchPathError:
+            raise GitNoSuchPathError(repo_full_path)
+        except git.GitCommandError as e:
+            raise GitExecError(e)
+
+    def git_mirror(self, source_repository, mirror_full_path, blobless=False):
+        """
+        Cria um mirror bare do repositório remoto ou, se já existe,
+        atualiza o mirror buscando apenas os novos objetos. Os worktrees
+        removidos são descartados antes da busca, e os que ainda existem não
+        impedem a atualização das branches. Um arquivo de lock ao lado do
+        mirror serializa a criação e as buscas de processos concorrentes
+
+        Args:
+            source_repository: endereço do repositório do fonte
+            mirror_full_path: diretório completo do mirror
+            blobless: se True o mirror é criado sem os conteúdos dos arquivos,
+                baixados apenas quando usados por um checkout ou push. As
+                atualizações seguintes mantêm o mesmo filtro
+        """
+        mirrors_dir = os.path.dirname(mirror_full_path)
+        os.makedirs(mirrors_dir, exist_ok=True)
+        with open(mirror_full_path + ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if os.path.isdir(mirror_full_path):
+                    repo = git.Repo(mirror_full_path)
+                    repo.git.worktree("prune")
+                    repo.git.fetch("--prune", "--update-head-ok", "origin")
+                    return
+
+                temp_full_path = tempfile.mkdtemp(dir=mirrors_dir, suffix=".tmp")
+                try:
+                    kwargs = {"filter": "blob:none"} if blobless else {}
+                    git.Repo.clone_from(source_repository, temp_full_path, mirror=True, progress=self.progress,
+                                        **kwargs)
+                    os.rename(temp_full_path, mirror_full_path)
+                finally:
+                    shutil.rmtree(temp_full_path, ignore_errors=True)
+            except git.GitCommandError as e:
+                raise GitExecError(e)
+
+    @staticmethod
+    def git_worktree_add(repo_full_path, worktree_full_path, branch_name):
+        """
+        Cria um worktree do repositório no commit da branch em um diretório.
+        O worktree é criado com o HEAD desanexado, sem fazer checkout da
+        branch, para que a branch continue podendo ser atualizada no repositório
+
+        Args:
+            repo_full_path: diretório completo do repositório git
+            worktree_full_path: diretório vazio ou inexistente do worktree
+            branch_name: nome da branch do worktree
+        """
+        try:
+            git.Repo(repo_full_path).git.worktree("add", "--detach", worktree_full_path, branch_name)
+        except git.NoSuchPathError:
+            raise GitNoSuchPathError(repo_full_path)
+        except git.GitCommandError as e:
+            raise GitExecError(e)
+
+    @staticmethod
+    def git_worktree_remove(repo_full_path, worktree_full_path):
+        """
+        Remove um worktree do repositório
+
+        Args:
+            repo_full_path: diretório completo do repositório git
+            worktree_full_path: diretório do worktree
+        """
+        shutil.rmtree(worktree_full_path, ignore_errors=True)
+        try:
+            git.Repo(repo_full_path).git.worktree("prune")
+        except git.NoSuchPathError:
+            raise GitNoSuchPathError(repo_full_path)
+
+    @staticmethod
+    def get_remote_ref(remote_repo, ref):
+        """
+        Returns the commit of a ref in a remote repository, without fetching it
+
+        Args:
+            remote_repo: endereço do repositório remoto
+            ref: nome da ref, ex.: refs/heads/master ou HEAD
+
+        Returns:
+            str: sha do commit ou None se a ref não existe ou o remoto não responde
+        """
+        try:
+            out = git.cmd.Git().ls_remote(remote_repo, ref)
+        except git.GitCommandError:
+            return None
+
+        for line in out.splitlines():
+            tokens = line.split()
+            if len(tokens) == 2 and tokens[1] == ref:
+                return tokens[0]
+        return None
+
+    @staticmethod
+    def get_commit_sha(repo_full_path, ref):
+        """
+        Returns the commit of a ref in the local repository
+
+        Args:
+            repo_full_path: diretório completo do repositório git
+            ref: nome da branch ou ref
+
+        Returns:
+            str: sha do commit
+        """
+        try:
+            return git.Repo(repo_full_path).commit(ref).hexsha
+        except git.NoSuchPathError:
+            raise GitNoSuchPathError(repo_full_path)
+
+    @staticmethod
+    def list_worktree_files(repo_full_path):
+        """
+        Lists the files of the repository working tree, tracked or not,
+        excluding the files ignored by git
+
+        Args:
+            repo_full_path: diretório completo do repositório git
+
+        Returns:
+            list: sorted paths relative to the repository root
+        """
+        try:
+            repo = git.Repo(repo_full_path)
+            out = repo.git.ls_files("--cached", "--others", "--exclude-standard", "-z")
+        except (git.NoSuchPathError, git.InvalidGitRepositoryError):
+            raise GitNoSuchPathError(repo_full_path)
+
+        files = set(path for path in out.split("\0") if path)
+        return sorted(path for path in files if os.path.isfile(os.path.join(repo_full_path, path)))
+
     @staticmethod
     def get_current_branch_name(repo_app_full_path):
         """
@@ -0,0 +1,128 @@
+"""
+Functions to stream docker images between hosts without a registry.
+
+The images are transferred as the archive produced by `docker save` and
+read by `docker load`. Layers the target host already has are removed from
+the archive, `docker load` reuses the existing layers when their chain is
+already in the host layer store.
+"""
+import hashlib
+import tarfile
+import tempfile
+
+LAYER_SPOOL_MAX_SIZE = 64 * 1024 * 1024
+OCI_BLOB_PREFIX = "blobs/sha256/"
+LEGACY_LAYER_SUFFIX = "/layer.tar"
+
+
+def parse_layers(inspect_output):
+    """
+    Parses the layers printed by `docker image inspect --format {{.RootFS.Layers}}`
+
+    Args:
+        inspect_output (str): the command output, one image per line.
+            Ex: [sha256:a1b2 sha256:c3d4]
+
+    Returns:
+        list containing the list of layer diff ids of each image
+    """
+    return [line.strip().strip("[]").split() for line in inspect_output.splitlines() if line.strip()]
+
+
+def get_chain_ids(layers):
+    """
+    Returns the chain ids of `layers`, computed like docker does. The chain
+    id of a layer identifies it together with all its parent layers.
+
+    Args:
+        layers (list): diff ids of the image layers, from the base layer
+
+    Returns:
+        list of str containing the chain id of each layer
+    """
+    chain_ids = []
+    for diff_id in layers:
+        if chain_ids:
+            diff_id = "sha256:" + hashlib.sha256("{} {}".format(chain_ids[-1], diff_id).encode()).hexdigest()
+        chain_ids.append(diff_id)
+    return chain_ids
+
+
+def get_shared_layers(image_layers, host_images_layers):
+    """
+    Returns the layers of an image that the host already has. A layer is
+    only shared if all its parent layers are shared too.
+
+    Args:
+        image_layers (list): diff ids of the image layers
+        host_images_layers (list): list with the diff ids of each host image
+
+    Returns:
+        set of str containing the shared diff ids
+    """
+    host_chain_ids = set()
+    for layers in host_images_layers:
+        host_chain_ids.update(get_chain_ids(layers))
+
+    shared_layers = set()
+    for diff_id, chain_id in zip(image_layers, get_chain_ids(image_layers)):
+        if chain_id not in host_chain_ids:
+            break
+        shared_layers.add(diff_id)
+    return shared_layers
+
+
+def filter_image_archive(source, target, skip_layers):
+    """
+    Copies the `docker save` archive read from `source` to `target` as a
+    gzip compressed stream, leaving out the files of `skip_layers`.
+    Both legacy (<id>/layer.tar) and OCI (blobs/sha256/<digest>) layouts
+    are supported.
+
+    Args:
+        source: binary file object with the `docker save` output
+        target: binary file object receiving the filtered archive
+        skip_layers (set): diff ids of the layers to leave out
+
+    Returns:
+        int containing the number of layer files left out
+    """
+    skipped = 0
+    with tarfile.open(fileobj=source, mode="r|") as source_archive, \
+            tarfile.open(fileobj=target, mode="w|gz") as target_archive:
+        for member in source_archive:
+            if not member.isfile():
+                target_archive.addfile(member)
+                continue
+
+            content = source_archive.extractfile(member)
+            if member.name.startswith(OCI_BLOB_PREFIX):
+                if "sha256:" + member.name[len(OCI_BLOB_PREFIX):] in skip_layers:
+                    skipped += 1
+                    continue
+            elif member.name.endswith(LEGACY_LAYER_SUFFIX):
+                if skip_layers:
+                    content, diff_id = _spool_and_hash(content)
+                    if diff_id in skip_layers:
+                        skipped += 1
+                        continue
+
+            target_archive.addfile(member, content)
+    return skipped
+
+
+def _spool_and_hash(content):
+    """
+    Reads `content` into a temporary file computing its digest, since the
+    digest of a legacy layer is only known after reading it.
+
+    Returns:
+        tuple (file, diff_id) with the spooled file positioned at start
+    """
+    digest = hashlib.sha256()
+    spool = tempfile.SpooledTemporaryFile(max_size=LAYER_SPOOL_MAX_SIZE)
+    for chunk in iter(lambda: content.read(1024 * 1024), b""):
+        digest.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return spool, "sha256:" + digest.hexdigest()
@@ -0,0 +1,116 @@
+"""
+Copy-on-write merged view of config dicts.
+"""
+import copy
+from collections.abc import Mapping, MutableMapping
+
+
+class LayeredDict(MutableMapping):
+    """
+    A merged view of several dicts (layers), resolved lazily key by key.
+
+    The layers are given from the lowest to the highest priority, like
+    the template, the config file and the app data. A key takes the value
+    of the highest layer having it, and when the values of the higher
+    layers are dicts they are merged recursively, like a deep merge of the
+    layers in order.
+
+    The layers are never changed: writes go to the view itself, and list
+    values are copied when first read, so the layers may be shared by
+    several views and threads. Merging costs only the keys actually read
+    or changed.
+    """
+
+    def __init__(self, *layers):
+        """
+        Constructor.
+
+        Args:
+            *layers (Mapping): the layers, from the lowest to the highest priority.
+                None layers are ignored.
+        """
+        self.layers = [layer for layer in layers if layer is not None]
+        self._changes = {}
+        self._deleted = set()
+
+    def __getitem__(self, key):
+        if key in self._changes:
+            return self._changes[key]
+        if key in self._deleted:
+            raise KeyError(key)
+
+        values = []
+        for layer in reversed(self.layers):
+            if key not in layer:
+                continue
+            value = layer[key]
+            if values and not isinstance(value, Mapping):
+                break
+            values.append(value)
+            if not isinstance(value, Mapping):
+                break
+        if not values:
+            raise KeyError(key)
+
+        value = values[0]
+        if isinstance(value, Mapping):
+            value = LayeredDict(*reversed(values))
+        elif isinstance(value, list):
+            value = copy.deepcopy(value)
+        else:
+            return value
+        self._changes[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self._deleted.discard(key)
+        self._changes[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._changes.pop(key, None)
+        self._deleted.add(key)
+
+    def __iter__(self):
+        seen = set()
+        for mapping in self.layers + [self._changes]:
+            for key in mapping:
+                if key not in seen and key not in self._deleted:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return "LayeredDict({!r})".format(self.to_dict())
+
+    def to_dict(self):
+        """
+        Returns the merged data as plain dicts, for code that changes it or
+        needs real dicts, like the app models.
+
+        Returns:
+            dict with the merged items
+        """
+        return {key: to_dict(value) for key, value in self.items()}
+
+
+def to_dict(data):
+    """
+    Returns `data` with all its LayeredDict converted to plain dicts
+
+    Args:
+        data: any config data
+
+    Returns:
+        the data with plain dicts
+    """
+    if isinstance(data, LayeredDict):
+        return data.to_dict()
+    if isinstance(data, Mapping):
+        return {key: to_dict(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [to_dict(item) for item in data]
+    return data
@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class LocalCache:
+    """
+    Small key/value store used to remember facts between deploys.
+
+    Values are kept in memory for the process lifetime and, when a
+    `cache_file` is given, persisted as json so later runs can reuse them.
+    Each entry may have a time to live in seconds.
+    """
+
+    def __init__(self, cache_file=None):
+        """
+        Constructor.
+
+        Args:
+            cache_file (str): json file where the entries are persisted.
+                If None the cache will live only in memory.
+        """
+        self.cache_file = cache_file
+        self._entries = None
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None, min_ttl=0):
+        """
+        Returns the value stored with `key`.
+
+        Args:
+            key (str): the entry key
+            default: value returned if the entry does not exist or is expired
+            min_ttl (int): seconds the entry must still be valid for. Entries
+                that expire sooner are treated as expired.
+
+        Returns:
+            the stored value or `default`
+        """
+        entry = self._load().get(key)
+        if entry is None:
+            return default
+
+        expires_at = entry.get("expires_at")
+        if expires_at is not None and expires_at - min_ttl <= time.time():
+            return default
+
+        return entry["value"]
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores `value` with `key` and persists the cache file.
+
+        Args:
+            key (str): the entry key
+            value: any json serializable value
+            ttl (int): seconds the entry is valid for. None never expires.
+        """
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._load()[key] = {"value": value, "expires_at": expires_at}
+            self._save()
+
+    def remove(self, key):
+        """
+        Removes the entry with `key` if it exists.
+
+        Args:
+            key (str): the entry key
+        """
+        with self._lock:
+            if self._load().pop(key, None) is not None:
+                self._save()
+
+    def _load(self):
+        """
+        Loads the entries from the cache file in the first access
+
+        Returns:
+            dict containing the cache entries
+        """
+        with self._lock:
+            if self._entries is None:
+                entries = {}
+                if self.cache_file and os.path.isfile(self.cache_file):
+                    try:
+                        with open(self.cache_file) as file:
+                            entries = json.load(file)
+                    except ValueError:
+                        entries = {}
+                self._entries = entries
+        return self._entries
+
+    def _save(self):
+        """
+        Saves the entries in the cache file. The file is replaced atomically
+        so concurrent ndeploy processes never read a partial file.
+
+        """
+        if not self.cache_file:
+            return
+
+        cache_dir = os.path.dirname(self.cache_file)
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(dir=cache_dir)
+        with os.fdopen(fd, 'w') as file:
+            json.dump(self._entries, file)
+        os.replace(tmp_file, self.cache_file)
@@ -17,7 +17,8 @@ class Environment:
                 Ex: 'openshift', 'dokku', 'heroku', etc.
             name (str): environment name.
                 Ex: 'dev', 'qa', 'stage', 'production', etc.
-            deploy_host (str): host where the target apps will be deployed
+            deploy_host (str): host where the target apps will be deployed.
+                Several hosts may be separated by commas
             app_deployment_file_url (str): template url from where the
                 remote apps configuration will be downloaded.
                 Should have three tokens separated by spaces
@@ -33,6 +34,29 @@ class Environment:
 
         self.check_is_valid()
 
+    def get_deploy_hosts(self):
+        """
+        Returns the hosts of the environment. The deploy_host may list
+        several hosts separated by commas, for PaaS running the same apps
+        in more than one host.
+
+        Returns:
+            list of str containing the hosts
+        """
+        return [host.strip() for host in self.deploy_host.split(",") if host.strip()]
+
+    def for_host(self, deploy_host):
+        """
+        Returns a copy of this environment with a single deploy host
+
+        Args:
+            deploy_host (str): the host of the new environment
+
+        Returns:
+            Environment object
+        """
+        return Environment(self.type, self.name, deploy_host, self.app_deployment_file_url)
+
     def update(self, env):
         """
         Updates an instance of Environment.
@@ -116,6 +140,15 @@ class App:
                 Each variable/value should be passed as the dict key/value
                 OS environment variables, services and app urls could be used
                 as described in `ndeploy.env_var_resolver.EnvVarResolver`
+            source_sync (bool): if True and the repository is an url, the
+                deploy host fetches and builds the source by itself instead
+                of ndeploy cloning and pushing it. Only for PaaS supporting it.
+            image_delivery (str): how the image reaches the deploy host.
+                'pull' pulls it from the registry, 'stream' sends the image
+                available in the ndeploy machine. Only for PaaS supporting it.
+            binary_build (bool): if True and the repository is a local
+                directory, its working tree is uploaded as the input of a
+                binary build. Only for PaaS supporting it.
         """
         self.name = name
         self.group = group
@@ -124,3 +157,6 @@ class App:
         self.image = args["image"] if "image" in args else ""
         self.env_vars = args["env_vars"] if "env_vars" in args else {}
         self.domains = args["domains"] if "domains" in args else []
+        self.source_sync = args["source_sync"] if "source_sync" in args else False
+        self.image_delivery = args["image_delivery"] if "image_delivery" in args else "pull"
+        self.binary_build = args["binary_build"] if "binary_build" in args else False
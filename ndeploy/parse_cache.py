@@ -0,0 +1,111 @@
+"""
+Cache of parsed configuration files.
+"""
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+class ParseCache:
+    """
+    Keeps the parsed data of configuration files keyed by the hash of
+    their content, so an unchanged file is parsed only once.
+
+    The entries are kept in memory and, when a `cache_dir` is given, also
+    persisted as json files so later runs reuse them. Json content is not
+    persisted, since loading the entry would cost as much as parsing it,
+    neither is data that json can not represent exactly (e.g. yaml dates).
+    """
+
+    def __init__(self, cache_dir=None):
+        """
+        Constructor.
+
+        Args:
+            cache_dir (str): directory where the parsed data is persisted.
+                If None the cache will live only in memory.
+        """
+        self.cache_dir = cache_dir
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_parse(self, content, file_format, parse):
+        """
+        Returns the parsed data of `content`, calling `parse` only if the
+        content is not in the cache.
+
+        Args:
+            content (str): the file content
+            file_format (str): the file format, part of the cache key
+            parse (fn): function with signature fn(content) returning the parsed data
+
+        Returns:
+            the parsed data. Each call returns a new copy, so callers may change it.
+        """
+        key = self.get_key(content, file_format)
+        with self._lock:
+            if key not in self._entries:
+                data = self._read_entry(key) if file_format != "json" else None
+                if data is None:
+                    data = parse(content)
+                    if file_format != "json":
+                        self._write_entry(key, data)
+                self._entries[key] = data
+            return copy.deepcopy(self._entries[key])
+
+    @staticmethod
+    def get_key(content, file_format):
+        """
+        Returns the cache key of a file content
+
+        Args:
+            content (str): the file content
+            file_format (str): the file format
+
+        Returns:
+            str containing the key
+        """
+        return "{}-{}".format(file_format, hashlib.sha256(content.encode("utf-8")).hexdigest())
+
+    def _get_entry_file(self, key):
+        return os.path.join(self.cache_dir, "{}.json".format(key))
+
+    def _read_entry(self, key):
+        """
+        Reads a persisted entry
+
+        Returns:
+            the parsed data or None if there is no valid persisted entry
+        """
+        if not self.cache_dir:
+            return None
+
+        try:
+            with open(self._get_entry_file(key)) as file:
+                return json.load(file)["data"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_entry(self, key, data):
+        """
+        Persists an entry. The file is replaced atomically so concurrent
+        ndeploy processes never read a partial entry.
+        """
+        if not self.cache_dir or data is None:
+            return
+
+        try:
+            serialized = json.dumps({"data": data})
+        except (TypeError, ValueError):
+            return
+        if json.loads(serialized)["data"] != data:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(fd, 'w') as file:
+            file.write(serialized)
+        os.replace(tmp_file, self._get_entry_file(key))
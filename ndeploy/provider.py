@@ -3,9 +3,11 @@ Módulo com implementações referentes ao que uma PaaS precisa ter mapeada para
 """
 import importlib
 import inspect
+import os
 import pkgutil
 from abc import abstractmethod
 from ndeploy.env_var_resolver import EnvVarResolver
+from ndeploy.local_cache import LocalCache
 from ndeploy.shell_exec import ShellExec
 from ndeploy.git_exec import GitExec
 
@@ -40,10 +42,16 @@ class AbstractProvider:
 
     __type__ = None
 
+    DEPLOY_BY_IMAGE = "deploy_by_image"
+    DEPLOY_BY_GIT_PUSH = "deploy_by_git_push"
+    DEPLOY_OPERATIONS = (DEPLOY_BY_IMAGE, DEPLOY_BY_GIT_PUSH)
+
     def __init__(self):
         self.env_resolver = EnvVarResolver()
         self.shell_exec = None
         self.git_exec = None
+        self.ndeploy_dir = None
+        self.local_cache = LocalCache()
 
     @abstractmethod
     def deploy_by_git_push(self, app, env):
@@ -94,8 +102,39 @@ class AbstractProvider:
 
         Returns:
 
+        """
+        operation = self.plan_deploy(app, env)
+        self.execute_deploy(operation, app, env)
+
+    def plan_deploy(self, app, env):
+        """
+        Resolve as variáveis de app.env_vars e escolhe a operação de deploy,
+        sem executá-la. Usado também para compilar planos de deploy.
+        Args:
+            app: Objeto App com dados da aplicação a ser deployada.
+            env: Environment no qual será feito o deploy.
+
+        Returns:
+            str com o nome da operação de deploy, um de DEPLOY_OPERATIONS.
+        """
+        app.env_vars = self._resolve_env_vars(app.env_vars)
+
+        # by image has priority
+        return self.DEPLOY_BY_IMAGE if app.image else self.DEPLOY_BY_GIT_PUSH
+
+    def execute_deploy(self, operation, app, env):
+        """
+        Executa a operação de deploy escolhida por plan_deploy, com as variáveis já resolvidas.
+        Args:
+            operation: nome da operação de deploy, um de DEPLOY_OPERATIONS.
+            app: Objeto App com dados da aplicação a ser deployada.
+            env: Environment no qual será feito o deploy.
+
+        Returns:
+
         """
         assert self.shell_exec  # shell_exec should exist at this point
+        assert operation in self.DEPLOY_OPERATIONS, "invalid deploy operation " + operation
 
         print("...Beginning deploy on %s" % env.type)
         print("Environment name: %s" % env.name)
@@ -106,13 +145,8 @@ class AbstractProvider:
         print("App group: %s" % app.group)
         print("App image: %s" % app.image)
         print("App repository: %s" % app.repository)
-        app.env_vars = self._resolve_env_vars(app.env_vars)
 
-        # by image has priority
-        if app.image:
-            self.deploy_by_image(app, env)
-        else:
-            self.deploy_by_git_push(app, env)
+        getattr(self, operation)(app, env)
 
     @abstractmethod
     def undeploy(self, app, env):
@@ -125,6 +159,21 @@ class AbstractProvider:
         """
         pass
 
+    def undeploy_apps(self, apps, env):
+        """
+        Undeploys all the `apps` from the environment.
+        Providers able to remove many apps at once should override this method,
+        by default each app is undeployed in sequence.
+
+        Args:
+            apps (list): list of App objects
+            env (Environment): Environment object
+
+        """
+        for index, app in enumerate(apps, start=1):
+            print("...Application {}/{}...".format(index, len(apps)))
+            self.undeploy(app, env)
+
     def _resolve_env_vars(self, env_vars):
         """
         Faz a resolução dos valores para cada variável.
@@ -142,6 +191,17 @@ class AbstractProvider:
     def set_git_exec(self, git_exec):
         self.git_exec = git_exec
 
+    def set_ndeploy_dir(self, ndeploy_dir):
+        """
+        Sets the ndeploy home directory. The provider local cache will be
+        persisted under this directory.
+
+        Args:
+            ndeploy_dir (str): the ndeploy home directory
+        """
+        self.ndeploy_dir = ndeploy_dir
+        self.local_cache = LocalCache(os.path.join(ndeploy_dir, "cache", "{}.json".format(self.__type__)))
+
     def get_image_tag(self):
         """
         Retorna a tag da imagem de app.image url ou 'latest' quando não possui tag na url
@@ -195,8 +255,8 @@ class ProviderRepository:
     Carrega módulos definidos no diretório supported_providers que implementem AbstractProvider
     """
 
-    def __init__(self):
-        self.available_providers = ProviderRepository.load_available_providers()
+    def __init__(self, ndeploy_dir=None):
+        self.available_providers = ProviderRepository.load_available_providers(ndeploy_dir)
 
     def get_available_providers(self):
         return self.available_providers
@@ -205,9 +265,12 @@ class ProviderRepository:
         return self.available_providers[provider_type]
 
     @staticmethod
-    def load_available_providers():
+    def load_available_providers(ndeploy_dir=None):
         """
         Carrega as implementações de AbstractProvider
+        Args:
+            ndeploy_dir: diretório home do ndeploy, onde os providers persistem seus caches.
+
         Returns: dicionário com o nome/instancia das PaaS implementadas.
         """
 
@@ -223,5 +286,7 @@ class ProviderRepository:
                     new_provider = cls()
                     new_provider.set_shell_exec(ShellExec())
                     new_provider.set_git_exec(GitExec())
+                    if ndeploy_dir:
+                        new_provider.set_ndeploy_dir(ndeploy_dir)
                     _available_providers[cls.__type__] = new_provider
         return _available_providers
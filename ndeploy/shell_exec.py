@@ -2,6 +2,7 @@ import timeout_decorator
 import subprocess
 import shlex
 import os
+import tempfile
 
 
 class ShellExec:
@@ -10,8 +11,8 @@ class ShellExec:
     """
 
     @staticmethod
-    def execute_program(cmd, silent=False):
-        p = subprocess.Popen(shlex.split(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    def execute_program(cmd, silent=False, env=None):
+        p = subprocess.Popen(shlex.split(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
         out, err = p.communicate()
         err = err.decode().strip()
         out = out.decode().strip()
@@ -20,9 +21,111 @@ class ShellExec:
             print(out)
         return err, out
 
+    @staticmethod
+    def execute_pipe(producer_cmd, consumer_cmd, silent=False):
+        """
+        Executes `producer_cmd` piping its output to `consumer_cmd`,
+        like 'producer_cmd | consumer_cmd' in a shell. The producer errors
+        go to a temporary file, so a full pipe never blocks the producer.
+
+        Returns:
+            tuple (err, out) with the errors of both programs and the consumer output
+        """
+        with tempfile.TemporaryFile() as producer_stderr:
+            producer = subprocess.Popen(shlex.split(producer_cmd), stdout=subprocess.PIPE, stderr=producer_stderr)
+            consumer = subprocess.Popen(shlex.split(consumer_cmd), stdin=producer.stdout,
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            producer.stdout.close()
+            out, consumer_err = consumer.communicate()
+            producer.wait()
+            producer_err = ShellExec._read_output_file(producer_stderr)
+        err = "\n".join(e.decode().strip() for e in [producer_err, consumer_err] if e.strip())
+        out = out.decode().strip()
+        if not silent:
+            print(err)
+            print(out)
+        return err, out
+
+    @staticmethod
+    def read_program_output(cmd, reader, env=None):
+        """
+        Executes `cmd` handing its binary output stream to `reader`,
+        so the output is consumed while the program runs.
+
+        Args:
+            cmd (str): the command to execute
+            reader (fn): function with signature fn(stdout) returning the read result
+            env (dict): environment variables of the program, None to inherit them
+
+        Returns:
+            tuple (err, result) with the program errors and the `reader` result
+        """
+        with tempfile.TemporaryFile() as stderr:
+            p = subprocess.Popen(shlex.split(cmd), stdout=subprocess.PIPE, stderr=stderr, env=env)
+            try:
+                result = reader(p.stdout)
+                p.stdout.read()
+            finally:
+                p.stdout.close()
+                p.wait()
+            err = ShellExec._read_output_file(stderr)
+        return err.decode().strip(), result
+
+    @staticmethod
+    def execute_stream(producer_cmd, consumer_cmd, transform, silent=False):
+        """
+        Executes `producer_cmd` piping its output to `consumer_cmd` through
+        `transform`, which reads the producer output and writes the consumer input.
+        The outputs not read by `transform` go to temporary files, so the
+        programs never block on a full pipe.
+
+        Args:
+            producer_cmd (str): the command producing the stream
+            consumer_cmd (str): the command consuming the stream
+            transform (fn): function with signature fn(producer_stdout, consumer_stdin)
+            silent (bool): if True the outputs are not printed
+
+        Returns:
+            tuple (err, out) with the errors of both programs and the consumer output
+        """
+        with tempfile.TemporaryFile() as producer_stderr, tempfile.TemporaryFile() as consumer_stdout, \
+                tempfile.TemporaryFile() as consumer_stderr:
+            producer = subprocess.Popen(shlex.split(producer_cmd), stdout=subprocess.PIPE, stderr=producer_stderr)
+            consumer = subprocess.Popen(shlex.split(consumer_cmd), stdin=subprocess.PIPE,
+                                        stdout=consumer_stdout, stderr=consumer_stderr)
+            try:
+                transform(producer.stdout, consumer.stdin)
+            finally:
+                producer.stdout.close()
+                consumer.stdin.close()
+                consumer.wait()
+                producer.wait()
+            out = ShellExec._read_output_file(consumer_stdout)
+            errors = [ShellExec._read_output_file(producer_stderr), ShellExec._read_output_file(consumer_stderr)]
+        err = "\n".join(e.decode().strip() for e in errors if e.strip())
+        out = out.decode().strip()
+        if not silent:
+            print(err)
+            print(out)
+        return err, out
+
+    @staticmethod
+    def _read_output_file(output_file):
+        """
+        Reads the whole content of a temporary file written by a program
+
+        Args:
+            output_file (file): the binary temporary file
+
+        Returns:
+            bytes: the file content
+        """
+        output_file.seek(0)
+        return output_file.read()
+
     @staticmethod
     def execute_system(cmd):
-        os.system(cmd)
+        return os.system(cmd)
 
     @staticmethod
     def program_return_error(cmd):
@@ -0,0 +1,129 @@
+"""
+ssh-agent sessions used to access remote git repositories with the
+environment keys.
+"""
+import atexit
+import os
+import re
+import threading
+
+from ndeploy.exception import NDeployError
+from ndeploy.shell_exec import ShellExec
+
+
+class SshAgentError(NDeployError):
+    """
+    Thrown when the ssh-agent could not be started or could not load the key
+    """
+    def __init__(self, rsa_path, error):
+        self.rsa_path = rsa_path
+        self.error = error
+
+    def __str__(self):
+        return "Could not start ssh-agent with key {}.\nERROR: {}".format(self.rsa_path, self.error)
+
+
+class SshAgentSession:
+    """
+    An ssh-agent process holding one private key. The agent is started
+    in the first use and reused by every command executed with `get_env`,
+    so the key is loaded only once. It is stopped when the process exits.
+    """
+
+    AGENT_VARIABLE = re.compile(r'(SSH_AUTH_SOCK|SSH_AGENT_PID)=([^;\s]+);')
+
+    def __init__(self, rsa_path, shell_exec=ShellExec):
+        """
+        Constructor.
+
+        Args:
+            rsa_path (str): path to the private key loaded in the agent
+            shell_exec (ShellExec): executes the ssh-agent commands
+        """
+        self.rsa_path = rsa_path
+        self.shell_exec = shell_exec
+        self.agent_variables = None
+
+    def start(self):
+        """
+        Starts the agent and loads the key, if not started yet.
+
+        Raises:
+            SshAgentError if the agent could not be started or the key
+                could not be loaded
+        """
+        if self.agent_variables is not None:
+            return
+
+        err, out = self.shell_exec.execute_program("ssh-agent -s", True)
+        agent_variables = dict(self.AGENT_VARIABLE.findall(out))
+        if "SSH_AUTH_SOCK" not in agent_variables or "SSH_AGENT_PID" not in agent_variables:
+            raise SshAgentError(self.rsa_path, err or out)
+        self.agent_variables = agent_variables
+        atexit.register(self.stop)
+
+        err, out = self.shell_exec.execute_program("ssh-add {}".format(self.rsa_path), True, env=self._build_env())
+        if "Identity added" not in err + out:
+            self.stop()
+            raise SshAgentError(self.rsa_path, err or out)
+
+    def stop(self):
+        """
+        Stops the agent, if started.
+        """
+        if self.agent_variables is None:
+            return
+
+        env = self._build_env()
+        self.agent_variables = None
+        atexit.unregister(self.stop)
+        self.shell_exec.execute_program("ssh-agent -k", True, env=env)
+
+    def get_env(self):
+        """
+        Returns the environment variables for commands that should use the
+        agent, starting it if needed
+
+        Returns:
+            dict containing the process environment with the agent variables
+        """
+        self.start()
+        return self._build_env()
+
+    def _build_env(self):
+        env = dict(os.environ)
+        env.update(self.agent_variables)
+        return env
+
+
+class SshAgentPool:
+    """
+    Holds one SshAgentSession per private key, so every access to the
+    remote repositories with the same key shares a single agent.
+    """
+
+    def __init__(self, shell_exec=ShellExec):
+        """
+        Constructor.
+
+        Args:
+            shell_exec (ShellExec): executes the ssh-agent commands of the sessions
+        """
+        self.shell_exec = shell_exec
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, rsa_path):
+        """
+        Returns the session holding the key, created in the first request
+
+        Args:
+            rsa_path (str): path to the private key
+
+        Returns:
+            SshAgentSession of the key
+        """
+        with self._lock:
+            if rsa_path not in self._sessions:
+                self._sessions[rsa_path] = SshAgentSession(rsa_path, self.shell_exec)
+            return self._sessions[rsa_path]
@@ -1,5 +1,7 @@
-import glob
+import hashlib
+import os
 import shutil
+import tarfile
 import tempfile
 
 
@@ -11,9 +13,36 @@ def rmtree(directory):
     shutil.rmtree(directory, ignore_errors=True)
 
 
-def get_temp_dir_app_if_exists(app_name, suffix="-ndeploy"):
-    temp_dir = glob.glob('{0}/{1}*{2}'.format(tempfile.gettempdir(), app_name, suffix))
-    if temp_dir:
-        return temp_dir[0]
+def hash_files(base_dir, files):
+    """
+    Returns a hash of the paths and contents of `files`
 
-    return None
+    Args:
+        base_dir (str): directory the files are relative to
+        files (list): file paths relative to `base_dir`
+
+    Returns:
+        str containing the sha256 hex digest
+    """
+    digest = hashlib.sha256()
+    for path in sorted(files):
+        digest.update(path.encode("utf-8") + b"\0")
+        with open(os.path.join(base_dir, path), 'rb') as file:
+            for chunk in iter(lambda: file.read(65536), b""):
+                digest.update(chunk)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def create_tar_archive(archive_path, base_dir, files):
+    """
+    Creates a gzip compressed tar archive with `files`
+
+    Args:
+        archive_path (str): path of the archive to create
+        base_dir (str): directory the files are relative to
+        files (list): file paths relative to `base_dir`
+    """
+    with tarfile.open(archive_path, "w:gz") as archive:
+        for path in files:
+            archive.add(os.path.join(base_dir, path), arcname=path, recursive=False)
@@ -1,18 +1,27 @@
 import click
 import os
 
+from ndeploy import config_mirror
 from ndeploy import core
 from ndeploy import environment_repository
+from ndeploy import parse_cache
 from ndeploy import deployer
 from ndeploy import provider
+from ndeploy import ssh_agent
 from ndeploy.shell_exec import ShellExec
 from ndeploy.exception import NDeployError
 
 # dependencies resolution
 NDEPLOY_HOME = os.path.expanduser('~')+"/.ndeploy"
 env_repository = environment_repository.EnvironmentRepository(NDEPLOY_HOME, ShellExec())
-provider_repository = provider.ProviderRepository()
-deployer = deployer.Deployer(provider_repository, env_repository)
+provider_repository = provider.ProviderRepository(NDEPLOY_HOME)
+CONFIG_MIRROR_INTERVAL = int(os.environ.get("NDEPLOY_CONFIG_MIRROR_INTERVAL",
+                                            config_mirror.ConfigMirror.DEFAULT_REFRESH_INTERVAL))
+ssh_agents = ssh_agent.SshAgentPool()
+config_mirrors = config_mirror.ConfigMirror(os.path.join(NDEPLOY_HOME, "config-mirrors"), CONFIG_MIRROR_INTERVAL,
+                                            ssh_agents) if CONFIG_MIRROR_INTERVAL >= 0 else None
+parse_cache = parse_cache.ParseCache(os.path.join(NDEPLOY_HOME, "cache", "configs"))
+deployer = deployer.Deployer(provider_repository, env_repository, config_mirrors, parse_cache, ssh_agents)
 ndeploy_core = core.NDeployCore(env_repository, deployer)
 
 
@@ -74,6 +83,9 @@ def keyenv(**kwargs):
 @click.option('-g', '--group', help="Group name of project")
 @click.option('-n', '--name', help="Project name")
 @click.option('-e', '--environment', help="Environment name")
+@click.option('--all', 'all_apps', is_flag=True, help="Deploy all the apps of the group")
+@click.option('--stream', is_flag=True, help="Read and deploy the apps of the file one at a time")
+@click.option('--bundle', help="Config bundle to read the remote config files and template from")
 def deploy(**kwargs):
     try:
         ndeploy_core.deploy(**kwargs)
@@ -85,6 +97,44 @@ def deploy(**kwargs):
         raise click.Abort()
 
 
+@ndeploy.command(name='compile')
+@click.option('-o', '--output', 'plan_file', required=True, help="Deploy plan file to write")
+@click.option('-f', '--file', help="App deployment file")
+@click.option('-g', '--group', help="Group name of project")
+@click.option('-n', '--name', help="Project name")
+@click.option('-e', '--environment', help="Environment name")
+@click.option('--all', 'all_apps', is_flag=True, help="Plan all the apps of the group")
+def compile_plan(**kwargs):
+    try:
+        ndeploy_core.compile(**kwargs)
+    except NDeployError as e:
+        print(e)
+        raise click.Abort()
+
+
+@ndeploy.command()
+@click.option('-o', '--output', 'bundle_file', required=True, help="Config bundle file to write")
+@click.option('-e', '--environment', 'environments', multiple=True, required=True, help="Environment name")
+@click.option('-g', '--group', 'groups', multiple=True, required=True, help="Group name of project")
+@click.option('-n', '--name', 'names', multiple=True, help="Project name. All the projects of the groups if not passed")
+def bundle(**kwargs):
+    try:
+        ndeploy_core.bundle(**kwargs)
+    except NDeployError as e:
+        print(e)
+        raise click.Abort()
+
+
+@ndeploy.command()
+@click.argument('plan_file')
+def apply(**kwargs):
+    try:
+        ndeploy_core.apply(**kwargs)
+    except NDeployError as e:
+        print(e)
+        raise click.Abort()
+
+
 @ndeploy.command()
 @click.option('-f', '--file', help="App deployment file")
 @click.option('-g', '--group', help="Group name of project.", prompt="App group")
@@ -1,7 +1,14 @@
+import collections
 import hashlib
 import json
+import os
+import re
+from urllib.parse import urlparse
+
+import yaml
 
 from ndeploy.provider import AbstractProvider
+from ndeploy import utils
 import socket
 from ndeploy.exception import NDeployError
 import timeout_decorator
@@ -10,7 +17,20 @@ import timeout_decorator
 class OpenShiftNotLoggedError(NDeployError):
     def __str__(self):
         return "Could not continue deploying because openshift command line is not logged. " \
-               "You have to execute 'oc login' before executing ndeploy."
+               "You have to execute 'oc login' before executing ndeploy. When the environment has its own " \
+               "oc config file, pass it with 'oc login --config=~/.ndeploy/kube/<environment>.config'."
+
+
+class OpenShiftServerMismatchError(NDeployError):
+    def __init__(self, deploy_host, server, kubeconfig):
+        self.deploy_host = deploy_host
+        self.server = server
+        self.kubeconfig = kubeconfig
+
+    def __str__(self):
+        return "The oc config file {} points to the server {}, not to the environment deploy host {}. " \
+               "Execute 'oc login --config={} https://{}:8443' before executing ndeploy."\
+            .format(self.kubeconfig, self.server, self.deploy_host, self.kubeconfig, self.deploy_host)
 
 
 class OpenShiftNameTooLongError(NDeployError):
@@ -30,10 +50,22 @@ class OpenshiftProvider(AbstractProvider):
 
     __type__ = 'openshift'
 
+    # seconds a verified login is trusted by other ndeploy runs
+    LOGIN_CACHE_TTL = 300
+    # cached logins expiring in less than this seconds are verified again
+    LOGIN_EXPIRY_MARGIN = 60
+    AUTH_ERRORS = ["system:anonymous", "provide credentials", "Unauthorized"]
+    MISSING_PROJECT_RESOURCE_ERROR = re.compile(r'\(NotFound\): (namespaces|projects[\w.]*|secrets) "')
+    SCM_SECRET_KEY_PATH = os.path.join("~", ".ssh", "id_rsa")
+    # url (https://, ssh://, git://) or scp-like (git@host:group/app) remote repository
+    REMOTE_REPOSITORY = re.compile(r'^((https?|ssh|git)://|[\w.-]+@[\w.-]+[:/])')
+
     def __init__(self):
         super().__init__()
         self.app = None
         self.env = None
+        self._logged_hosts = {}
+        self._source_builds = {}
 
     def deploy_by_image(self, app, env):
         """
@@ -84,6 +116,34 @@ class OpenshiftProvider(AbstractProvider):
                             .format(app_name=app.deploy_name))
         print("Undeploy done.")
 
+    def undeploy_apps(self, apps, env):
+        """
+        Undeploys the apps from the environment with a single delete
+        per project, selecting all apps of the project by label.
+
+        Args:
+            apps (list): list of App objects
+            env (Environment): environment object
+
+        """
+        self.env = env
+
+        apps_by_project = collections.OrderedDict()
+        for app in apps:
+            apps_by_project.setdefault(str(app.group).lower(), []).append(app)
+
+        for project_apps in apps_by_project.values():
+            self.app = project_apps[0]
+            deploy_names = [app.deploy_name for app in project_apps]
+            print("Undeploying apps {app_names} from environment {env_name}"
+                  .format(app_names=", ".join(deploy_names), env_name=self.env.name))
+            if len(deploy_names) == 1:
+                selector = "app={}".format(deploy_names[0])
+            else:
+                selector = "'app in ({})'".format(",".join(deploy_names))
+            self.openshift_exec("delete all -l {selector}".format(selector=selector))
+        print("Undeploy done.")
+
     def openshift_deploy(self, create_app_callback):
         """
         Do all the flow needed to deploy an app on openshift.
@@ -111,15 +171,40 @@ class OpenshiftProvider(AbstractProvider):
 
         current_revision = self.get_app_deploy_revision()
 
-        # those commands may trigger another deployment if some var or image has changed
-        self.import_image()
-        self.update_env_vars()
+        # rollouts are paused so image and env changes result in a single rollout on resume
+        self.pause_rollouts()
+        try:
+            self.import_image()
+            self.update_env_vars()
+        finally:
+            self.resume_rollouts()
 
         # last chance to trigger a new deployment..
-        # if new-app and env dc didn't triggered we need to force a new
+        # if neither the image nor the env changed we need to force a new
         # deploy
-        if current_revision == self.get_app_deploy_revision():
+        rollouts = self.get_app_deploy_revision() - current_revision
+        if rollouts == 0:
             self.force_deploy()
+            rollouts = 1
+        print("...Rollouts triggered by this deploy: {}".format(rollouts))
+
+    def pause_rollouts(self):
+        """
+        Pauses the deployment config triggers, changes made while paused
+        don't start new rollouts
+
+        """
+        print("...Pausing rollouts")
+        self.openshift_exec("rollout pause dc/{app_name}".format(app_name=self.app.deploy_name))
+
+    def resume_rollouts(self):
+        """
+        Resumes the deployment config triggers. If something changed while
+        paused a single rollout will be started
+
+        """
+        print("...Resuming rollouts")
+        self.openshift_exec("rollout resume dc/{app_name}".format(app_name=self.app.deploy_name))
 
     def import_image(self):
         """
@@ -160,20 +245,154 @@ class OpenshiftProvider(AbstractProvider):
         print("...Deploying app {app_name} by source\nRepository: {repo}"
               .format(app_name=self.app.deploy_name, repo=self.app.repository))
 
+        if self.is_local_source():
+            self.create_app_by_local_source()
+            return
+
         self.create_app_if_does_not_exist(False)
 
-        project = self.get_openshift_area_name()
-        self.shell_exec.execute_system(
-            "oc patch bc %s -p "
-            "'{\"spec\":{\"source\":{\"sourceSecret\":{\"name\":\"scmsecret\"}}}}'"
-            " -n %s" % (self.app.deploy_name, project))
+        commit = self.get_source_commit()
+        build_key = (self.env.deploy_host, self.get_openshift_area_name(), self.app.repository, commit)
+        built_by = self._source_builds.get(build_key) if commit else None
+
+        if built_by:
+            self.tag_built_image(built_by)
+        elif not self.start_build(commit) and commit:
+            self._source_builds[build_key] = self.app.deploy_name
 
-        self.openshift_exec("start-build {app_name} --follow"
-                            .format(app_name=self.app.deploy_name))
         self.openshift_exec("env dc/{app_name} {env_vars}"
                             .format(app_name=self.app.deploy_name,
                                     env_vars=self.prepare_env_vars(self.app.env_vars)))
 
+    def is_local_source(self):
+        """
+        Verifies if the app uses a binary build of its repository, which
+        must be a local directory
+
+        Returns:
+            True if the app has binary_build and its repository is a local directory, False otherwise
+        """
+        return self.app.binary_build and os.path.isdir(os.path.expanduser(self.app.repository))
+
+    def create_app_by_local_source(self):
+        """
+        Creates the app in the environment by a binary build of the local
+        working tree. The files ignored by git are not uploaded and the
+        upload is skipped if the working tree didn't change since the last
+        successful build of the app.
+
+        """
+        source_dir = os.path.expanduser(self.app.repository)
+        files = self.git_exec.list_worktree_files(source_dir)
+        tree_hash = utils.hash_files(source_dir, files)
+        app_exists = self.app_exist(self.app)
+
+        if app_exists and self.local_cache.get(self._get_binary_build_cache_key()) == tree_hash:
+            print("...Local source didn't change since the last build, skipping upload")
+        else:
+            self.create_binary_build_if_does_not_exist(source_dir)
+            if self.start_binary_build(source_dir, files):
+                self.local_cache.remove(self._get_binary_build_cache_key())
+            else:
+                self.local_cache.set(self._get_binary_build_cache_key(), tree_hash)
+
+        if not app_exists:
+            print("...Creating app {} from the built image".format(self.app.deploy_name))
+            self.openshift_exec("new-app {app_name} --name {app_name}".format(app_name=self.app.deploy_name))
+
+        self.update_env_vars()
+
+    def create_binary_build_if_does_not_exist(self, source_dir):
+        """
+        Creates a build config expecting binary input if it doesn't exist
+
+        Args:
+            source_dir (str): local source directory used to detect the build strategy
+
+        """
+        if self.oc_return_error("get bc/{app_name}".format(app_name=self.app.deploy_name)):
+            print("...Creating binary build {}".format(self.app.deploy_name))
+            self.openshift_exec("new-build {source_dir} --binary --name {app_name}"
+                                .format(source_dir=source_dir, app_name=self.app.deploy_name))
+
+    def start_binary_build(self, source_dir, files):
+        """
+        Uploads the local files as the build input and waits the build to finish
+
+        Args:
+            source_dir (str): local source directory
+            files (list): file paths relative to `source_dir` to upload
+
+        Returns:
+            err: err != None if the build failed
+        """
+        temp_dir = utils.create_temp_directory()
+        try:
+            archive = os.path.join(temp_dir, "source.tar.gz")
+            utils.create_tar_archive(archive, source_dir, files)
+            print("...Uploading {} files from {}".format(len(files), source_dir))
+            err, out = self.openshift_exec("start-build {app_name} --from-archive={archive} --follow"
+                                           .format(app_name=self.app.deploy_name, archive=archive))
+            return err
+        finally:
+            utils.rmtree(temp_dir)
+
+    def _get_binary_build_cache_key(self):
+        return "binary-build:{}:{}:{}".format(self.env.deploy_host, self.get_openshift_area_name(),
+                                              self.app.deploy_name)
+
+    def start_build(self, commit=None):
+        """
+        Builds the app source on openshift and waits the build to finish
+
+        Args:
+            commit (str): the commit to build. If None builds the bc source ref
+
+        Returns:
+            err: err != None if the build failed
+        """
+        project = self.get_openshift_area_name()
+        self.shell_exec.execute_system(
+            "%s patch bc %s -p "
+            "'{\"spec\":{\"source\":{\"sourceSecret\":{\"name\":\"scmsecret\"}}}}'"
+            " -n %s" % (self.get_oc_command(), self.app.deploy_name, project))
+
+        err, out = self.openshift_exec("start-build {app_name}{commit} --follow"
+                                       .format(app_name=self.app.deploy_name,
+                                               commit=" --commit={}".format(commit) if commit else ""))
+        return err
+
+    def tag_built_image(self, built_by):
+        """
+        Tags the image built for another app of the same repository and
+        commit into the current app image stream, instead of building it again
+
+        Args:
+            built_by (str): deploy name of the app that built the image
+
+        """
+        print("...Source already built by {}, tagging its image".format(built_by))
+        self.openshift_exec("tag {built_by}:latest {app_name}:latest"
+                            .format(built_by=built_by, app_name=self.app.deploy_name))
+
+    def get_source_commit(self):
+        """
+        Resolves the commit of the app repository that will be built.
+        The repository may have a ref after '#', as accepted by 'oc new-app'.
+        Only remote repositories are resolved, a local repository may have
+        commits the cluster can not fetch.
+
+        Returns:
+            str containing the commit sha or None if it could not be resolved
+        """
+        repository, _, ref = self.app.repository.partition("#")
+        if not self.REMOTE_REPOSITORY.match(repository):
+            return None
+        err, out = self.shell_exec.execute_program("git ls-remote {repository} {ref}"
+                                                   .format(repository=repository, ref=ref or "HEAD"), True)
+        tokens = out.split()
+        return tokens[0] if tokens else None
+
     def load_service(self, name, resource):
         if name == 'postgres':
             return self._load_postgres(resource)
@@ -187,12 +406,273 @@ class OpenshiftProvider(AbstractProvider):
         if not logged
         """
         print("...Verifying if oc client is logged......", end="")
+        self.validate_server()
+        token_identity = self.get_token_identity()
+        if self.is_login_cached(token_identity):
+            print("...[Ok] (cached)")
+            return
+
         if not self.is_logged():
             # raising exception for now. We need to think in a better solution for this
             raise OpenShiftNotLoggedError
             # self.login()
+        self.cache_login(token_identity)
         print("...[Ok]")
 
+    def is_login_cached(self, token_identity):
+        """
+        Verifies if the login in the current deploy host was already verified
+        with the same token, in this process or recently by another ndeploy run.
+
+        Args:
+            token_identity (str): identity of the token in use (@see get_token_identity)
+
+        Returns:
+            True if the login is cached, False otherwise
+        """
+        if token_identity is None:
+            return False
+
+        if self._logged_hosts.get(self.env.deploy_host) == token_identity:
+            return True
+
+        cached_identity = self.local_cache.get(self._get_login_cache_key(), min_ttl=self.LOGIN_EXPIRY_MARGIN)
+        if cached_identity == token_identity:
+            self._logged_hosts[self.env.deploy_host] = token_identity
+            return True
+
+        return False
+
+    def cache_login(self, token_identity):
+        """
+        Saves the verified login for the current deploy host
+
+        Args:
+            token_identity (str): identity of the token in use (@see get_token_identity)
+        """
+        if token_identity is None:
+            return
+
+        self._logged_hosts[self.env.deploy_host] = token_identity
+        self.local_cache.set(self._get_login_cache_key(), token_identity, ttl=self.LOGIN_CACHE_TTL)
+
+    def forget_login(self):
+        """
+        Removes the cached login of the current deploy host, so the next
+        deploy verifies the login again.
+
+        """
+        self._logged_hosts.pop(self.env.deploy_host, None)
+        self.local_cache.remove(self._get_login_cache_key())
+
+    def _get_login_cache_key(self):
+        return "login:{}".format(self.env.deploy_host)
+
+    def get_kubeconfig_path(self):
+        """
+        Returns the oc client config file in use.
+        Each environment has its own config file under the ndeploy home, so
+        deploys to different clusters never share the oc current context.
+        Without the ndeploy home the user global config file is used.
+
+        Returns:
+            str containing the full path of the kubeconfig file
+        """
+        if self.ndeploy_dir:
+            return os.path.join(self.ndeploy_dir, "kube", "{}.config".format(self.env.name))
+        return self.get_global_kubeconfig_path()
+
+    @staticmethod
+    def get_global_kubeconfig_path():
+        """
+        Returns the user global oc client config file
+
+        Returns:
+            str containing the full path of the kubeconfig file
+        """
+        kubeconfig = os.environ.get("KUBECONFIG")
+        if kubeconfig:
+            return kubeconfig.split(os.pathsep)[0]
+        return os.path.join(os.path.expanduser("~"), ".kube", "config")
+
+    def get_oc_command(self):
+        """
+        Returns the oc client command for the current environment, passing
+        the environment config file explicitly.
+        The environment config file is created in the first use with the
+        context of the user global config file whose server is the
+        environment deploy host. If there is no such context the file is not
+        created, and the user has to login with the environment config file.
+
+        Returns:
+            str containing the oc command
+        """
+        if not self.ndeploy_dir:
+            return "oc"
+
+        kubeconfig = self.get_kubeconfig_path()
+        if not os.path.isfile(kubeconfig):
+            self.create_kubeconfig(kubeconfig)
+
+        return "oc --config={}".format(kubeconfig)
+
+    def create_kubeconfig(self, kubeconfig):
+        """
+        Creates the environment config file with the context of the user
+        global config file whose server is the environment deploy host.
+        The current context of the global config file is preferred when
+        more than one context matches.
+
+        Args:
+            kubeconfig (str): full path of the environment config file
+        """
+        global_config = self.load_kubeconfig(self.get_global_kubeconfig_path())
+        contexts = [c for c in global_config.get("contexts") or []
+                    if self.is_deploy_host_server(self.get_context_server(global_config, c.get("context") or {}))]
+        if not contexts:
+            return
+
+        context = next((c for c in contexts if c.get("name") == global_config.get("current-context")), contexts[0])
+        cluster_name = context["context"].get("cluster")
+        user_name = context["context"].get("user")
+        config = {
+            "apiVersion": "v1",
+            "kind": "Config",
+            "preferences": {},
+            "current-context": context.get("name"),
+            "contexts": [context],
+            "clusters": [c for c in global_config.get("clusters") or [] if c.get("name") == cluster_name],
+            "users": [u for u in global_config.get("users") or [] if u.get("name") == user_name],
+        }
+
+        print("...Creating oc config for environment {} with the context {}".format(self.env.name, context.get("name")))
+        os.makedirs(os.path.dirname(kubeconfig), mode=0o700, exist_ok=True)
+        with os.fdopen(os.open(kubeconfig, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as file:
+            yaml.safe_dump(config, file, default_flow_style=False)
+
+    def validate_server(self):
+        """
+        Verifies if the current context of the oc config file points to the
+        environment deploy host. The environment config file is created
+        first, if needed (@see get_oc_command). Raise OpenShiftNotLoggedError
+        if the environment still has no config file and
+        OpenShiftServerMismatchError if the server is another one.
+        """
+        self.get_oc_command()
+        kubeconfig = self.get_kubeconfig_path()
+        if self.ndeploy_dir and not os.path.isfile(kubeconfig):
+            raise OpenShiftNotLoggedError
+
+        server = self.get_current_server()
+        if server is not None and not self.is_deploy_host_server(server):
+            raise OpenShiftServerMismatchError(self.env.deploy_host, server, kubeconfig)
+
+    def is_deploy_host_server(self, server):
+        """
+        Verifies if a server of the oc config file is the environment deploy host.
+        The server may be the deploy host name or its IP (@see login).
+
+        Args:
+            server (str): the server url, e.g. https://dev.com:8443
+
+        Returns:
+            True if the server is the deploy host, False otherwise
+        """
+        if not server:
+            return False
+
+        server_host = urlparse(server if "//" in server else "//" + server).hostname
+        if server_host == self.env.deploy_host.lower():
+            return True
+        try:
+            return server_host == socket.gethostbyname(self.env.deploy_host)
+        except OSError:
+            return False
+
+    def get_current_server(self):
+        """
+        Returns the server of the current context of the oc config file
+
+        Returns:
+            str containing the server url or None if it could not be read
+        """
+        config = self.load_kubeconfig(self.get_kubeconfig_path())
+        context = self.get_current_context(config)
+        if context is None:
+            return None
+        return self.get_context_server(config, context)
+
+    @staticmethod
+    def load_kubeconfig(kubeconfig):
+        """
+        Loads an oc config file
+
+        Args:
+            kubeconfig (str): full path of the config file
+
+        Returns:
+            dict with the config, empty if the file could not be read
+        """
+        try:
+            with open(kubeconfig) as file:
+                config = yaml.safe_load(file) or {}
+        except (OSError, yaml.YAMLError):
+            return {}
+        return config if isinstance(config, dict) else {}
+
+    @staticmethod
+    def get_current_context(config):
+        """
+        Returns the current context of an oc config
+
+        Args:
+            config (dict): the oc config (@see load_kubeconfig)
+
+        Returns:
+            dict with the context cluster and user or None if there is no current context
+        """
+        current_context = config.get("current-context")
+        return next((c.get("context") or {} for c in config.get("contexts") or []
+                     if c.get("name") == current_context), None)
+
+    @staticmethod
+    def get_context_server(config, context):
+        """
+        Returns the server of the cluster of a context of an oc config
+
+        Args:
+            config (dict): the oc config (@see load_kubeconfig)
+            context (dict): the context cluster and user
+
+        Returns:
+            str containing the server url or None if the cluster is not in the config
+        """
+        return next((c.get("cluster", {}).get("server") for c in config.get("clusters") or []
+                     if c.get("name") == context.get("cluster")), None)
+
+    def get_token_identity(self):
+        """
+        Returns an identity for the credentials of the current oc context.
+        The identity is a hash of the server, user and token, so a new
+        login results in a new identity.
+
+        Returns:
+            str containing the identity or None if it could not be read
+        """
+        config = self.load_kubeconfig(self.get_kubeconfig_path())
+        context = self.get_current_context(config)
+        if not context:
+            return None
+
+        user = next((u.get("user", {}) for u in config.get("users") or []
+                     if u.get("name") == context.get("user")), {})
+        credentials = user.get("token") or user.get("client-certificate-data") or user.get("client-certificate")
+        if not credentials:
+            return None
+
+        identity = "{}|{}|{}".format(context.get("cluster"), context.get("user"), credentials)
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
     def expose_service(self):
         """
         Expose the openshift route if it doesn't exist.
@@ -265,12 +745,56 @@ class OpenshiftProvider(AbstractProvider):
     def configure_project(self):
         """
         Configure the openshift project where the app will be deployed.
-        Creates the project and the secret for the scm if they doesn't exist
+        Creates the project and the secret for the scm if they doesn't exist.
+
+        The configuration is skipped if the project was already configured
+        with the same inputs (@see get_project_fingerprint). It is recorded
+        only if all the steps succeeded.
+
+        """
+        fingerprint = self.get_project_fingerprint()
+        if self.local_cache.get(self._get_project_cache_key()) == fingerprint:
+            print("...Project {} already configured...[Ok]".format(self.get_openshift_area_name()))
+            return
+
+        errors = [self.create_project_if_does_not_exist(),
+                  self.create_secret_if_does_not_exist(),
+                  self.add_annotations_in_project()]
+        if any(errors):
+            print("...Project {} configuration failed, it will be configured again in the next deploy"
+                  .format(self.get_openshift_area_name()))
+            self.forget_project_configuration()
+            return
+        self.local_cache.set(self._get_project_cache_key(), fingerprint)
+
+    def get_project_fingerprint(self):
+        """
+        Returns a fingerprint of everything configure_project applies in the
+        project: cluster, project name, scm secret key and annotations.
+
+        Returns:
+            str containing the fingerprint
+        """
+        key_path = os.path.expanduser(self.SCM_SECRET_KEY_PATH)
+        key_fingerprint = ""
+        if os.path.isfile(key_path):
+            with open(key_path, 'rb') as key_file:
+                key_fingerprint = hashlib.sha256(key_file.read()).hexdigest()
+
+        inputs = [self.env.deploy_host, self.get_openshift_area_name(), key_fingerprint,
+                  self.get_project_annotations()]
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
 
+    def forget_project_configuration(self):
         """
-        self.create_project_if_does_not_exist()
-        self.create_secret_if_does_not_exist()
-        self.add_annotations_in_project()
+        Removes the project configuration record, so the next deploy
+        configures the project again.
+
+        """
+        self.local_cache.remove(self._get_project_cache_key())
+
+    def _get_project_cache_key(self):
+        return "project:{}:{}".format(self.env.deploy_host, self.get_openshift_area_name())
 
     def create_project(self, project):
         """
@@ -278,23 +802,30 @@ class OpenshiftProvider(AbstractProvider):
 
         Args:
             project: the project name
+
+        Returns:
+            err: err != None if returned error
         """
-        self.openshift_exec("new-project " + project, False)
+        err, out = self.openshift_exec("new-project " + project, False)
+        return err
 
     def create_project_if_does_not_exist(self):
         """
         Verifies if the project exists and creates a new project if it doesn't exist
 
+        Returns:
+            err: err != None if the project could not be created
         """
         project = self.get_openshift_area_name()
         print("...Verifying if project {} exists........."
               .format(project), end="")
         if not self.project_exist(project):
             print("No, creating project.........", end="")
-            self.create_project(project)
-            print("[Ok]")
-        else:
-            print("[Ok]")
+            err = self.create_project(project)
+            print("[Error]" if err else "[Ok]")
+            return err
+        print("[Ok]")
+        return None
 
     def create_secret(self, secret):
         """
@@ -305,40 +836,60 @@ class OpenshiftProvider(AbstractProvider):
         Args:
             secret (str): secret name
 
+        Returns:
+            err: err != None if returned error
         """
         project = self.get_openshift_area_name()
         # temos que executar com os.system por causa do parâmatro ssh-privatekey.
         # Por algum motivo não funciona com subprocess
-        self.shell_exec.execute_system("oc secrets new {secret} "
-                                       "ssh-privatekey=$HOME/.ssh/id_rsa -n {project}"
-                                       .format(project=project, secret=secret))
-        self.openshift_exec("secrets add serviceaccount/builder secrets/{secret}"
-                            .format(secret=secret))
+        status = self.shell_exec.execute_system("{oc} secrets new {secret} "
+                                                "ssh-privatekey=$HOME/.ssh/id_rsa -n {project}"
+                                                .format(oc=self.get_oc_command(), project=project, secret=secret))
+        if status:
+            return "Could not create secret {}, exit status {}".format(secret, status)
+        err, out = self.openshift_exec("secrets add serviceaccount/builder secrets/{secret}"
+                                       .format(secret=secret))
+        return err
 
     def create_secret_if_does_not_exist(self):
         """
         Creates a secret if it doesn't exist.
         The secret will be named 'scmsecret'
 
+        Returns:
+            err: err != None if the secret could not be created
         """
         print("...Verifying if secret scmsecret exists.........", end="")
         if not self.secret_exist("scmsecret"):
             print("No, will create........", end="")
-            self.create_secret("scmsecret")
-            print("[Ok]")
-        else:
-            print("[Ok]")
+            err = self.create_secret("scmsecret")
+            print("[Error]" if err else "[Ok]")
+            return err
+        print("[Ok]")
+        return None
+
+    def get_project_annotations(self):
+        """
+        Returns the openshift annotations of the project
+
+        Returns:
+            dict containing the annotations
+        """
+        return {"openshift.io/node-selector": "region={}".format(self.env.name)}
 
     def add_annotations_in_project(self):
         """
         Add openshift annotations in project
 
+        Returns:
+            err: err != None if returned error
         """
         deployment_config = {
-            "metadata": {"annotations": {"openshift.io/node-selector": "region={}".format(self.env.name)}}
+            "metadata": {"annotations": self.get_project_annotations()}
         }
-        self.openshift_exec("patch namespace {project_name} --patch '{dc_json}'".format(
+        err, out = self.openshift_exec("patch namespace {project_name} --patch '{dc_json}'".format(
             project_name=self.get_openshift_area_name(), dc_json=json.dumps(deployment_config)))
+        return err
 
     def app_exist(self, app):
         """
@@ -467,10 +1018,15 @@ class OpenshiftProvider(AbstractProvider):
 
         """
         project = self.get_openshift_area_name()
-        return self.shell_exec.execute_program(
-            "oc {cmd} {project} {output}"
-            .format(cmd=oc_cmd, project="-n " + project if append_project != "" else "",
+        err, out = self.shell_exec.execute_program(
+            "{oc} {cmd} {project} {output}"
+            .format(oc=self.get_oc_command(), cmd=oc_cmd, project="-n " + project if append_project != "" else "",
                     output="-o {}".format(output) if output else ""), True)
+        if err and any(auth_error in err for auth_error in self.AUTH_ERRORS):
+            self.forget_login()
+        if err and self.MISSING_PROJECT_RESOURCE_ERROR.search(err):
+            self.forget_project_configuration()
+        return err, out
 
     def oc_return_error(self, cmd, append_project=True):
         """
@@ -492,10 +1048,10 @@ class OpenshiftProvider(AbstractProvider):
         Returns:
             True if logged, False otherwise
         """
-        cmd = "oc whoami"
+        cmd = "{oc} whoami".format(oc=self.get_oc_command())
         try:
             err, out = self.shell_exec.execute_program_with_timeout(cmd, True)
-            if "system:anonymous" in err or "provide credentials" in err:
+            if any(auth_error in err for auth_error in self.AUTH_ERRORS):
                 return False
             else:
                 return True
@@ -509,7 +1065,7 @@ class OpenshiftProvider(AbstractProvider):
         """
         # login has to be by IP because of teh https/ssl signed certificate
         ip = socket.gethostbyname(self.env.deploy_host)
-        self.shell_exec.execute_program("oc login https://%s:8443" % ip)
+        self.shell_exec.execute_program("%s login https://%s:8443" % (self.get_oc_command(), ip))
 
     @staticmethod
     def _load_postgres(self, resource):
@@ -0,0 +1,64 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from ndeploy.config_bundle import ConfigBundle, ConfigBundleError
+
+REPO_URL = "git@git.nexxera.com:environment-conf-dev/group.git"
+
+
+class ConfigBundleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.bundle_file = os.path.join(self.temp_dir, "bundle.zip")
+        self.files = {
+            (REPO_URL, "master", "apps/api.json"): b'{"name": "api"}',
+            (REPO_URL, "master", "apps/shared/env.yaml"): b"A: '1'",
+            (REPO_URL, "develop", "apps/api.json"): b'{"name": "api-develop"}',
+        }
+
+    def test_should_read_the_bundled_files(self):
+        ConfigBundle.write(self.bundle_file, self.files, {"env_vars": {"TEMPLATE": "1"}})
+        bundle = ConfigBundle(self.bundle_file)
+
+        for (repo_url, branch, path), content in self.files.items():
+            self.assertEqual(content, bundle.read_file(repo_url, branch, path))
+        self.assertIsNone(bundle.read_file(REPO_URL, "master", "apps/other.json"))
+        self.assertEqual({"env_vars": {"TEMPLATE": "1"}}, bundle.get_template())
+
+    def test_should_list_the_bundled_files_of_a_directory(self):
+        ConfigBundle.write(self.bundle_file, self.files)
+        bundle = ConfigBundle(self.bundle_file)
+
+        self.assertEqual(["apps/api.json", "apps/shared/env.yaml"], bundle.list_files(REPO_URL, "master", "apps"))
+        self.assertEqual(["apps/api.json"], bundle.list_files(REPO_URL, "develop"))
+        self.assertEqual([], bundle.list_files(REPO_URL, "master", "app"))
+        self.assertIsNone(bundle.get_template())
+
+    def test_should_fail_if_a_file_does_not_match_its_hash(self):
+        ConfigBundle.write(self.bundle_file, self.files)
+        with zipfile.ZipFile(self.bundle_file) as archive:
+            entries = {name: archive.read(name) for name in archive.namelist()}
+        index = json.loads(entries["index.json"].decode("utf-8"))
+        entries[index["files"][0]["entry"]] = b'{"name": "changed"}'
+        with zipfile.ZipFile(self.bundle_file, "w") as archive:
+            for name, content in entries.items():
+                archive.writestr(name, content)
+        bundle = ConfigBundle(self.bundle_file)
+
+        with self.assertRaises(ConfigBundleError):
+            bundle.read_file(index["files"][0]["repo_url"], index["files"][0]["branch"], index["files"][0]["path"])
+
+    def test_should_fail_with_invalid_bundle(self):
+        with self.assertRaises(ConfigBundleError):
+            ConfigBundle(self.bundle_file)
+
+        with zipfile.ZipFile(self.bundle_file, "w") as archive:
+            archive.writestr("index.json", json.dumps({"version": ConfigBundle.VERSION + 1, "files": []}))
+        with self.assertRaises(ConfigBundleError):
+            ConfigBundle(self.bundle_file)
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import git
+
+from ndeploy.config_mirror import ConfigMirror, ConfigMirrorError
+
+
+class ConfigMirrorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir, True)
+        self.mirrors_dir = os.path.join(self.work_dir, "mirrors")
+        self.origin = git.Repo.init(os.path.join(self.work_dir, "origin"), initial_branch="develop")
+        self._commit_file("app.json", '{"name": "app"}')
+
+    def test_should_read_file_from_the_mirror(self):
+        config_mirror = ConfigMirror(self.mirrors_dir)
+
+        self.assertEqual(b'{"name": "app"}', config_mirror.read_file(self.origin.working_dir, "develop", "app.json"))
+        self.assertTrue(os.path.isdir(config_mirror.get_mirror_path(self.origin.working_dir)))
+        self.assertTrue(git.Repo(config_mirror.get_mirror_path(self.origin.working_dir)).bare)
+
+    def test_should_return_none_if_file_does_not_exist(self):
+        config_mirror = ConfigMirror(self.mirrors_dir)
+
+        self.assertIsNone(config_mirror.read_file(self.origin.working_dir, "develop", "app.yaml"))
+        self.assertIsNone(config_mirror.read_file(self.origin.working_dir, "master", "app.json"))
+
+    def test_should_fetch_only_after_the_refresh_interval(self):
+        ConfigMirror(self.mirrors_dir).read_file(self.origin.working_dir, "develop", "app.json")
+        self._commit_file("app.json", '{"name": "app2"}')
+
+        self.assertEqual(b'{"name": "app"}', ConfigMirror(self.mirrors_dir, refresh_interval=3600)
+                         .read_file(self.origin.working_dir, "develop", "app.json"))
+        self.assertEqual(b'{"name": "app2"}', ConfigMirror(self.mirrors_dir, refresh_interval=0)
+                         .read_file(self.origin.working_dir, "develop", "app.json"))
+
+    def test_should_fetch_once_per_execution(self):
+        config_mirror = ConfigMirror(self.mirrors_dir, refresh_interval=0)
+        config_mirror.read_file(self.origin.working_dir, "develop", "app.json")
+        self._commit_file("app.json", '{"name": "app2"}')
+
+        self.assertEqual(b'{"name": "app"}', config_mirror.read_file(self.origin.working_dir, "develop", "app.json"))
+
+    def test_should_raise_exception_if_repository_could_not_be_mirrored(self):
+        with self.assertRaises(ConfigMirrorError):
+            ConfigMirror(self.mirrors_dir).read_file(os.path.join(self.work_dir, "nothing"), "develop", "app.json")
+        self.assertEqual([], os.listdir(self.mirrors_dir))
+
+    def test_should_read_file_from_a_tag_or_a_commit(self):
+        self.origin.create_tag("v1")
+        commit = self.origin.head.commit.hexsha
+        self._commit_file("app.json", '{"name": "app2"}')
+        config_mirror = ConfigMirror(self.mirrors_dir)
+
+        self.assertEqual(b'{"name": "app"}', config_mirror.read_file(self.origin.working_dir, "v1", "app.json"))
+        self.assertEqual(b'{"name": "app"}', config_mirror.read_file(self.origin.working_dir, commit, "app.json"))
+        self.assertEqual(["app.json"], config_mirror.list_files(self.origin.working_dir, "v1"))
+        self.assertEqual([], config_mirror.list_files(self.origin.working_dir, "v2"))
+
+    def test_should_prefer_the_branch_if_a_tag_has_the_same_name(self):
+        self.origin.git.branch("release")
+        self.origin.create_tag("release", ref=self.origin.head.commit)
+        self._commit_file("app.json", '{"name": "app2"}')
+        self.origin.git.branch("-f", "release", "develop")
+
+        self.assertEqual(b'{"name": "app2"}',
+                         ConfigMirror(self.mirrors_dir).read_file(self.origin.working_dir, "release", "app.json"))
+
+    def test_should_access_the_repository_with_the_ssh_agent_of_the_key(self):
+        ssh_agents = mock.MagicMock()
+        ssh_agents.get.return_value.get_env.return_value = dict(os.environ, SSH_AUTH_SOCK="/tmp/agent.1")
+        config_mirror = ConfigMirror(self.mirrors_dir, refresh_interval=0, ssh_agents=ssh_agents)
+
+        config_mirror.read_file(self.origin.working_dir, "develop", "app.json", "/ssh/id_rsa_qa")
+        mirror = git.Repo(config_mirror.get_mirror_path(self.origin.working_dir))
+        mirror.git.config("core.sshCommand", "ssh -i /ssh/id_rsa_qa")
+        ConfigMirror(self.mirrors_dir, refresh_interval=0, ssh_agents=ssh_agents) \
+            .read_file(self.origin.working_dir, "develop", "app.json", "/ssh/id_rsa_qa")
+
+        self.assertEqual([mock.call("/ssh/id_rsa_qa")] * 2, ssh_agents.get.call_args_list)
+        with self.assertRaises(git.GitCommandError):
+            mirror.git.config("core.sshCommand")
+
+    def _commit_file(self, file_name, content):
+        with open(os.path.join(self.origin.working_dir, file_name), "w") as file:
+            file.write(content)
+        self.origin.index.add([file_name])
+        self.origin.index.commit("update {}".format(file_name))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from unittest import mock
+
+from ndeploy.config_resolver import ConfigResolver, ConfigCycleError
+
+
+class ConfigResolverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fragments = {}
+        self.load_fragment = mock.MagicMock(side_effect=lambda source, path: self.fragments[(source, path)])
+        self.resolver = ConfigResolver(self.load_fragment)
+
+    def test_should_merge_extended_configs_under_the_config_keys(self):
+        self.fragments[(None, "/conf/base.json")] = {"image": "base", "env_vars": {"A": "1", "B": "1"}}
+
+        data = self.resolver.resolve_file({"extends": "base.json", "name": "app", "env_vars": {"B": "2"}},
+                                          None, "/conf/app.json")
+
+        self.assertEqual({"image": "base", "name": "app", "env_vars": {"A": "1", "B": "2"}}, data)
+
+    def test_should_splice_includes_into_nested_dicts_in_order(self):
+        self.fragments[(None, "/conf/shared/db.yaml")] = {"DATABASE_URL": "db", "POOL": "5"}
+        self.fragments[(None, "/conf/shared/pool.yaml")] = {"POOL": "10"}
+
+        data = self.resolver.resolve_file(
+            {"apps": [{"name": "app", "env_vars": {"include": ["shared/db.yaml", "shared/pool.yaml"], "A": "1"}}]},
+            None, "/conf/apps.yaml")
+
+        self.assertEqual({"apps": [{"name": "app", "env_vars": {"DATABASE_URL": "db", "POOL": "10", "A": "1"}}]},
+                         data)
+
+    def test_should_resolve_fragments_of_fragments_relative_to_them(self):
+        self.fragments[(None, "/conf/shared/base.json")] = {"extends": "../common.json", "image": "base"}
+        self.fragments[(None, "/conf/common.json")] = {"domains": ["a.com"]}
+
+        data = self.resolver.resolve_file({"extends": "shared/base.json"}, None, "/conf/app.json")
+
+        self.assertEqual({"image": "base", "domains": ["a.com"]}, data)
+
+    def test_should_load_each_fragment_once(self):
+        self.fragments[(None, "/conf/env.json")] = {"A": "1"}
+
+        for name in ["app1", "app2", "app3"]:
+            data = self.resolver.resolve_file({"name": name, "env_vars": {"include": "env.json"}},
+                                              None, "/conf/{}.json".format(name))
+            data["env_vars"]["A"] = name
+
+        self.assertEqual(1, self.load_fragment.call_count)
+        self.assertEqual({"A": "1"}, self.resolver.get_fragment(None, "/conf/env.json"))
+
+    def test_should_resolve_remote_fragments_in_the_same_repository(self):
+        source = ("git@git.nexxera.com:conf/group.git", "master", "/home/user/.ssh/id_rsa")
+        self.fragments[(source, "shared/env.json")] = {"A": "1"}
+        self.fragments[(source, "base.json")] = {"env_vars": {"include": "/shared/env.json"}}
+
+        data = self.resolver.resolve_file({"extends": "../base.json"}, source, "apps/app.json")
+
+        self.assertEqual({"env_vars": {"A": "1"}}, data)
+
+    def test_should_fail_on_cycles(self):
+        self.fragments[(None, "/conf/a.json")] = {"extends": "b.json"}
+        self.fragments[(None, "/conf/b.json")] = {"env_vars": {"include": "a.json"}}
+
+        with self.assertRaises(ConfigCycleError) as context:
+            self.resolver.resolve_file({"extends": "a.json"}, None, "/conf/app.json")
+        self.assertEqual(["/conf/a.json", "/conf/b.json", "/conf/a.json"], context.exception.chain)
+
+        with self.assertRaises(ConfigCycleError):
+            self.resolver.resolve_file({"include": "app.json"}, None, "/conf/app.json")
@@ -0,0 +1,77 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+
+from ndeploy import config_stream
+from ndeploy.config_stream import APP_ITEM, iter_config_items
+from ndeploy.exception import InvalidEnvironmentFileError
+
+
+class ConfigStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.data = {
+            "environment": {"name": "dev", "type": "dokku", "deploy_host": "dev.nexxera.com"},
+            "apps": [{"name": "app{}".format(i), "group": "group", "env_vars": {"A": "[{}]".format(i)}}
+                     for i in range(20)],
+            "other": [1, 2]
+        }
+
+    def test_should_yield_each_app_of_a_json_file(self):
+        file = self._write_file("apps.json", json.dumps(self.data, indent=2))
+
+        self._assert_items(self.data, list(iter_config_items(file)))
+
+    def test_should_read_json_values_split_across_reads(self):
+        file = self._write_file("apps.json", json.dumps(self.data))
+
+        with mock.patch.object(config_stream, "READ_SIZE", 7):
+            self._assert_items(self.data, list(iter_config_items(file)))
+
+    def test_should_yield_each_app_of_a_yaml_file(self):
+        file = self._write_file("apps.yaml", yaml.safe_dump(self.data))
+
+        self._assert_items(self.data, list(iter_config_items(file)))
+
+    def test_should_read_apps_lazily(self):
+        file = self._write_file("apps.yaml", "apps:\n  - name: app1\n  - name: [invalid\n")
+        items = iter_config_items(file)
+
+        self.assertEqual((APP_ITEM, {"name": "app1"}), next(items))
+        with self.assertRaises(InvalidEnvironmentFileError):
+            next(items)
+
+    def test_should_yield_single_app_file_items(self):
+        file = self._write_file("app.json", '{"name": "app", "apps_count": 1}')
+
+        self.assertEqual([("name", "app"), ("apps_count", 1)], list(iter_config_items(file)))
+
+    def test_should_accept_empty_apps_list(self):
+        for name, content in [("apps.json", '{"apps": []}'), ("apps.yaml", "apps: []")]:
+            self.assertEqual([], list(iter_config_items(self._write_file(name, content))))
+
+    def test_should_fail_with_invalid_files(self):
+        for name, content in [("apps.json", '{"apps": [{"name": "app"} {"name": "other"}]}'),
+                              ("apps.json", '{"apps": [{"name": "app"}'),
+                              ("apps.yaml", "- name: app"),
+                              ("apps.txt", "name: app")]:
+            with self.assertRaises(InvalidEnvironmentFileError):
+                list(iter_config_items(self._write_file(name, content)))
+
+    def _assert_items(self, data, items):
+        self.assertEqual([(APP_ITEM, app) for app in data["apps"]], [item for item in items if item[0] is APP_ITEM])
+        self.assertEqual({key: value for key, value in data.items() if key != "apps"},
+                         dict(item for item in items if item[0] is not APP_ITEM))
+
+    def _write_file(self, name, content):
+        file = os.path.join(self.temp_dir, name)
+        with open(file, "w") as f:
+            f.write(content)
+        return file
@@ -47,7 +47,23 @@ class EnvironmentTest(unittest.TestCase):
 
     def test_deploy_should_call_deployer(self):
         self.core.deploy("file", "name", "group", "environment")
-        self.deployer.deploy.assert_called_once_with("file", "name", "group", "environment")
+        self.deployer.deploy.assert_called_once_with("file", "name", "group", "environment", False, False, None)
+
+    def test_deploy_all_apps_should_call_deployer(self):
+        self.core.deploy(group="group", environment="environment", all_apps=True)
+        self.deployer.deploy.assert_called_once_with(None, "group", None, "environment", True, False, None)
+
+    def test_compile_should_call_deployer(self):
+        self.core.compile("plan.json", group="group", environment="environment", all_apps=True)
+        self.deployer.compile.assert_called_once_with("plan.json", None, "group", None, "environment", True)
+
+    def test_bundle_should_call_deployer(self):
+        self.core.bundle("bundle.zip", ("dev",), ("group",), ("app",))
+        self.deployer.bundle.assert_called_once_with("bundle.zip", ("dev",), ("group",), ("app",))
+
+    def test_apply_should_call_deployer(self):
+        self.core.apply("plan.json")
+        self.deployer.apply.assert_called_once_with("plan.json")
 
     def test_undeploy_should_call_deployer(self):
         self.core.undeploy("file", "name", "group", "environment")
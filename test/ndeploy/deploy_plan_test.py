@@ -0,0 +1,71 @@
+import json
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+from ndeploy.deploy_plan import DeployPlan, InvalidDeployPlanError
+from ndeploy.model import App, Environment
+
+
+class DeployPlanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.plan_file = os.path.join(self.temp_dir, "plan.json")
+        self.plan = DeployPlan(Environment("dokku", "dev", "dev.nexxera.com"))
+        self.plan.add_step("deploy_by_image", App("api", "group", image="registry/api:1", env_vars={"A": "1"}))
+        self.plan.add_step("deploy_by_git_push", App("worker", "group", repository="git@git.com:group/worker.git"))
+
+    def test_should_save_and_load_the_plan(self):
+        self.plan.save(self.plan_file)
+        plan = DeployPlan.load(self.plan_file)
+
+        self.assertEqual(vars(self.plan.environment), vars(plan.environment))
+        self.assertEqual([(operation, vars(app)) for operation, app in self.plan.steps],
+                         [(operation, vars(app)) for operation, app in plan.steps])
+
+    def test_should_write_the_plan_readable_only_by_the_owner(self):
+        self.plan.save(self.plan_file)
+
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(self.plan_file).st_mode))
+
+    def test_should_fail_if_the_plan_was_changed(self):
+        self._save_changed_plan(lambda document: document["content"]["apps"][0]["app"]["env_vars"].update(A="2"))
+
+        with self.assertRaises(InvalidDeployPlanError):
+            DeployPlan.load(self.plan_file)
+
+    def test_should_fail_with_unsupported_version(self):
+        self._save_changed_plan(lambda document: document.update(version=DeployPlan.VERSION + 1))
+
+        with self.assertRaises(InvalidDeployPlanError):
+            DeployPlan.load(self.plan_file)
+
+    def test_should_fail_with_unknown_operation(self):
+        def change_operation(document):
+            document["content"]["apps"][0]["operation"] = "undeploy"
+            document["checksum"] = DeployPlan.get_checksum(document["content"])
+        self._save_changed_plan(change_operation)
+
+        with self.assertRaises(InvalidDeployPlanError):
+            DeployPlan.load(self.plan_file)
+
+    def test_should_fail_with_missing_or_invalid_file(self):
+        with self.assertRaises(InvalidDeployPlanError):
+            DeployPlan.load(self.plan_file)
+
+        with open(self.plan_file, "w") as file:
+            file.write("[]")
+        with self.assertRaises(InvalidDeployPlanError):
+            DeployPlan.load(self.plan_file)
+
+    def _save_changed_plan(self, change):
+        self.plan.save(self.plan_file)
+        with open(self.plan_file) as file:
+            document = json.load(file)
+        change(document)
+        with open(self.plan_file, "w") as file:
+            json.dump(document, file)
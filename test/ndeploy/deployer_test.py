@@ -1,11 +1,20 @@
 import unittest
 import os
+import io
 import json
+import shutil
+import tarfile
+import tempfile
 from unittest import mock
 
-from ndeploy.exception import InvalidArgumentError, BadFormedRemoteConfigUrlError, InvalidEnvironmentFileError
+import yaml
+
+from ndeploy.exception import InvalidArgumentError, BadFormedRemoteConfigUrlError, InvalidEnvironmentFileError, \
+    AppConfigFileCloneError
+from ndeploy.config_mirror import ConfigMirrorError
 from ndeploy.deployer import Deployer
 from ndeploy.model import Environment
+from ndeploy.parse_cache import ParseCache
 
 
 class DeployerTest(unittest.TestCase):
@@ -59,11 +68,10 @@ class DeployerTest(unittest.TestCase):
         with self.assertRaises(expected_exception=InvalidArgumentError):
             self.deployer.deploy(group="group", name="app")
 
-    @mock.patch("ndeploy.deployer.Deployer._exec_git_clone_file")
-    def test_deploy_with_group_name_and_registered_env(self, mock_exec_git_clone_file):
-        self.env_repo.get_ndeploy_dir.return_value = "/"
+    @mock.patch("ndeploy.deployer.Deployer._exec_git_archive")
+    def test_deploy_with_group_name_and_registered_env(self, mock_exec_git_archive):
         local_file = os.path.join(os.path.dirname(__file__), '../resources', 'app_with_env.json')
-        mock_exec_git_clone_file.return_value = local_file
+        mock_exec_git_archive.side_effect = self._archive_with(local_file)
         self._configure_env("dev", "dev.nexxera.com", "dokku",
                             "git@git.nexxera.com:environment-conf-dev/{group}.git master {name}.json")
         self.deployer.deploy(group="financial-platform", name="financial-platform-core", environment="dev")
@@ -74,6 +82,301 @@ class DeployerTest(unittest.TestCase):
                                  data_config["environment"]["deploy_host"],
                                  data_config["environment"]["type"])
 
+    @mock.patch("ndeploy.deployer.Deployer._exec_git_archive")
+    def test_deploy_should_read_remote_config_file_from_the_config_mirror(self, mock_exec_git_archive):
+        config_mirror = mock.MagicMock()
+        app_data = json.dumps({"name": "app", "group": "financial-platform", "deploy_name": "my-app"}).encode()
+        config_mirror.read_file.side_effect = lambda repo_url, branch, file_path, rsa_path: \
+            app_data if file_path.endswith(".json") else None
+        self.deployer = Deployer(self.provider_repo, self.env_repo, config_mirror)
+        self.env_repo.get_env_private_key_path.return_value = "/home/user/.ndeploy/.ssh/id_rsa_dev"
+        self._configure_env("dev", "dev.nexxera.com", "dokku",
+                            "git@git.nexxera.com:environment-conf-dev/{group}.git master {name}.yaml")
+
+        self.deployer.deploy(group="financial-platform", name="core", environment="dev")
+
+        config_mirror.read_file.assert_any_call("git@git.nexxera.com:environment-conf-dev/financial-platform.git",
+                                                "master", "core.yaml", "/home/user/.ndeploy/.ssh/id_rsa_dev")
+        config_mirror.read_file.assert_any_call("git@git.nexxera.com:environment-conf-dev/financial-platform.git",
+                                                "master", "core.json", "/home/user/.ndeploy/.ssh/id_rsa_dev")
+        mock_exec_git_archive.assert_not_called()
+        self._assert_deploy_call("app", "my-app", "dev", "dev.nexxera.com", "dokku")
+
+    @mock.patch("ndeploy.deployer.Deployer._exec_git_archive")
+    def test_deploy_should_download_remote_config_file_if_it_could_not_be_mirrored(self, mock_exec_git_archive):
+        config_mirror = mock.MagicMock()
+        config_mirror.read_file.side_effect = ConfigMirrorError("git@git.nexxera.com:conf/group.git", "denied")
+        self.deployer = Deployer(self.provider_repo, self.env_repo, config_mirror)
+        mock_exec_git_archive.side_effect = self._archive_with(
+            os.path.join(os.path.dirname(__file__), '../resources', 'app.json'))
+        self._configure_env("qa", "qa.nexxera.com", "openshift",
+                            "git@git.nexxera.com:environment-conf-qa/{group}.git master {name}.json")
+
+        self.deployer.deploy(group="group", name="app", environment="qa")
+
+        self.assertEqual(1, mock_exec_git_archive.call_count)
+        self._assert_deploy_call("my-app", "super-app", "qa", "qa.nexxera.com", "openshift")
+
+    def test_deploy_all_apps_of_group_should_read_config_files_from_the_config_mirror(self):
+        config_files = {
+            "apps/api.json": {"name": "api", "group": "financial-platform"},
+            "apps/worker.yaml": None,
+            "apps/worker.json": {"name": "worker", "group": "financial-platform"},
+            "apps/README.md": None,
+            "apps/old/legacy.json": None,
+        }
+        config_mirror = mock.MagicMock()
+        config_mirror.list_files.return_value = sorted(config_files)
+        config_mirror.read_file.side_effect = lambda repo_url, branch, file_path, rsa_path: \
+            json.dumps(config_files[file_path]).encode()
+        self.deployer = Deployer(self.provider_repo, self.env_repo, config_mirror)
+        self.env_repo.get_env_private_key_path.return_value = "/home/user/.ndeploy/.ssh/id_rsa_dev"
+        self._configure_env("dev", "dev.nexxera.com", "dokku",
+                            "git@git.nexxera.com:environment-conf-dev/{group}.git master apps/{name}.json")
+
+        self.deployer.deploy(group="financial-platform", environment="dev", all_apps=True)
+
+        config_mirror.list_files.assert_called_once_with(
+            "git@git.nexxera.com:environment-conf-dev/financial-platform.git", "master", "apps",
+            "/home/user/.ndeploy/.ssh/id_rsa_dev")
+        self.assertEqual(2, self.mocked_provider.deploy.call_count)
+        self._assert_deploy_call_list(0, "api", "api", "dev", "dev.nexxera.com", "dokku")
+        self._assert_deploy_call_list(1, "worker", "worker", "dev", "dev.nexxera.com", "dokku")
+
+    @mock.patch("ndeploy.deployer.Deployer._exec_git_archive")
+    def test_deploy_all_apps_of_group_should_download_config_files_in_one_archive(self, mock_exec_git_archive):
+        self.env_repo.get_env_private_key_path.return_value = "/home/user/.ndeploy/.ssh/id_rsa_qa"
+        self._configure_env("qa", "qa.nexxera.com", "openshift",
+                            "git@git.nexxera.com:environment-conf-qa/{group}.git master {name}.json")
+        mock_exec_git_archive.return_value = {name + ".json": json.dumps({"name": name, "group": "group"}).encode()
+                                              for name in ["worker", "api"]}
+
+        self.deployer.deploy(group="group", environment="qa", all_apps=True)
+
+        mock_exec_git_archive.assert_called_once_with("/home/user/.ndeploy/.ssh/id_rsa_qa",
+                                                      "git@git.nexxera.com:environment-conf-qa/group.git",
+                                                      "master", "")
+        self._assert_deploy_call_list(0, "api", "api", "qa", "qa.nexxera.com", "openshift")
+        self._assert_deploy_call_list(1, "worker", "worker", "qa", "qa.nexxera.com", "openshift")
+
+    @mock.patch("ndeploy.ssh_agent.SshAgentSession")
+    @mock.patch("ndeploy.shell_exec.ShellExec.read_program_output")
+    def test_git_archive_should_be_read_in_memory(self, mock_read_program_output, mock_ssh_agent_session):
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode="w") as tar:
+            info = tarfile.TarInfo("apps/app.json")
+            info.size = 2
+            tar.addfile(info, io.BytesIO(b"{}"))
+        mock_read_program_output.side_effect = lambda cmd, reader, env: ("", reader(io.BytesIO(archive.getvalue())))
+        mock_ssh_agent_session.return_value.get_env.return_value = {"SSH_AUTH_SOCK": "/tmp/agent.1"}
+
+        files = self.deployer._exec_git_archive("/ssh/id_rsa_qa", "git@git.nexxera.com:conf/group.git", "master",
+                                                "apps/app.json")
+
+        self.assertEqual({"apps/app.json": b"{}"}, files)
+        mock_read_program_output.assert_called_once_with(
+            "git archive --remote=git@git.nexxera.com:conf/group.git master apps/app.json", mock.ANY,
+            env={"SSH_AUTH_SOCK": "/tmp/agent.1"})
+
+    @mock.patch("ndeploy.ssh_agent.SshAgentSession")
+    @mock.patch("ndeploy.shell_exec.ShellExec.read_program_output")
+    def test_git_archive_of_missing_file_should_raise_the_git_error(self, mock_read_program_output, _):
+        mock_read_program_output.side_effect = lambda cmd, reader, env: ("fatal: pathspec did not match",
+                                                                         reader(io.BytesIO(b"")))
+        with self.assertRaises(AppConfigFileCloneError) as context:
+            self.deployer._exec_git_archive("/ssh/id_rsa_qa", "git@git.nexxera.com:conf/group.git", "master",
+                                            "apps/app.json")
+        self.assertEqual("fatal: pathspec did not match", context.exception.error)
+        self.assertIn("fatal: pathspec did not match", str(context.exception))
+
+    @mock.patch("ndeploy.ssh_agent.SshAgentSession")
+    @mock.patch("ndeploy.shell_exec.ShellExec.read_program_output")
+    def test_deploy_should_report_the_git_archive_error_if_no_config_extension_was_downloaded(
+            self, mock_read_program_output, _):
+        mock_read_program_output.side_effect = lambda cmd, reader, env: ("Permission denied (publickey)",
+                                                                         reader(io.BytesIO(b"")))
+        self._configure_env("qa", "qa.nexxera.com", "openshift",
+                            "git@git.nexxera.com:environment-conf-qa/{group}.git master {name}.json")
+
+        with self.assertRaises(AppConfigFileCloneError) as context:
+            self.deployer.deploy(group="group", name="app", environment="qa")
+        self.assertEqual("app.json", context.exception.local_file)
+        self.assertEqual("Permission denied (publickey)", context.exception.error)
+
+    @mock.patch("ndeploy.ssh_agent.SshAgentSession")
+    @mock.patch("ndeploy.shell_exec.ShellExec.read_program_output")
+    def test_git_archive_should_reuse_one_ssh_agent_per_key(self, mock_read_program_output, mock_ssh_agent_session):
+        mock_read_program_output.return_value = ("", {})
+        for rsa_path in ["/ssh/id_rsa_qa", "/ssh/id_rsa_qa", "/ssh/id_rsa_dev"]:
+            for path in ["app.json", "app.yaml"]:
+                self.deployer._exec_git_archive(rsa_path, "git@git.nexxera.com:conf/group.git", "master", path)
+
+        self.assertEqual(["/ssh/id_rsa_qa", "/ssh/id_rsa_dev"],
+                         [c[0][0] for c in mock_ssh_agent_session.call_args_list])
+        self.assertEqual(6, mock_read_program_output.call_count)
+
+    @mock.patch("ndeploy.deployer.Deployer._exec_git_archive")
+    def test_deploy_should_try_the_other_config_extension_if_file_is_not_in_the_archive(self,
+                                                                                        mock_exec_git_archive):
+        local_file = os.path.join(os.path.dirname(__file__), '../resources', 'app.json')
+        mock_exec_git_archive.side_effect = lambda rsa_path, repo_url, branch, path: \
+            self._archive_with(local_file)(rsa_path, repo_url, branch, path) if path.endswith(".json") else {}
+        self._configure_env("qa", "qa.nexxera.com", "openshift",
+                            "git@git.nexxera.com:environment-conf-qa/{group}.git master {name}.yaml")
+
+        self.deployer.deploy(group="group", name="app", environment="qa")
+
+        self.assertEqual(2, mock_exec_git_archive.call_count)
+        self._assert_deploy_call("my-app", "super-app", "qa", "qa.nexxera.com", "openshift")
+
+    def test_deploy_all_apps_should_fail_without_group(self):
+        with self.assertRaises(InvalidArgumentError):
+            self.deployer.deploy(environment="dev", all_apps=True)
+
+        with self.assertRaises(InvalidArgumentError):
+            self.deployer.deploy(group="group", name="app", environment="dev", all_apps=True)
+
+    def test_deploy_stream_should_deploy_each_app_of_the_file(self):
+        local_file = os.path.join(os.path.dirname(__file__), '../resources', 'apps.json')
+        self._configure_env("qa", "qa.nexxera.com", "openshift", None)
+
+        self.deployer.deploy(file=local_file, environment="qa", stream=True)
+
+        self.assertEqual(2, self.mocked_provider.deploy.call_count)
+        self._assert_deploy_call_list(0, "my-app", "super-my-app", "qa", "qa.nexxera.com", "openshift")
+        self._assert_deploy_call_list(1, "other-app", "super-other-app", "qa", "qa.nexxera.com", "openshift")
+
+    def test_deploy_stream_should_deploy_apps_before_reading_the_rest_of_the_file(self):
+        local_file = self._write_temp_file("apps.yaml", "environment: {name: dev, type: dokku, deploy_host: d.com}\n"
+                                                        "apps:\n  - {name: app, group: group}\n  - name: [invalid\n")
+
+        with self.assertRaises(InvalidEnvironmentFileError):
+            self.deployer.deploy(file=local_file, stream=True)
+
+        self._assert_deploy_call("app", "app", "dev", "d.com", "dokku")
+
+    def test_deploy_stream_should_accept_single_app_file(self):
+        local_file = os.path.join(os.path.dirname(__file__), '../resources', 'app_with_env.json')
+
+        self.deployer.deploy(file=local_file, stream=True)
+
+        self._assert_deploy_call("my-app", "super-app", "dev", "dev.nexxera.com", "dokku")
+
+    def test_deploy_stream_should_fail_if_environment_comes_after_apps(self):
+        local_file = os.path.join(os.path.dirname(__file__), '../resources', 'apps_with_env.json')
+
+        with self.assertRaises(InvalidArgumentError):
+            self.deployer.deploy(file=local_file, stream=True)
+        self.mocked_provider.deploy.assert_not_called()
+
+    def test_compile_should_write_a_plan_applied_without_config_files(self):
+        local_file = os.path.join(os.path.dirname(__file__), '../resources', 'apps.json')
+        plan_file = self._write_temp_file("plan.json", "")
+        self._configure_env("qa", "qa.nexxera.com", "openshift", None)
+        self.mocked_provider.plan_deploy.side_effect = lambda app, env: "deploy_by_image"
+
+        self.deployer.compile(plan_file, file=local_file, environment="qa")
+
+        self.assertEqual(2, self.mocked_provider.plan_deploy.call_count)
+        self.mocked_provider.deploy.assert_not_called()
+        self.mocked_provider.execute_deploy.assert_not_called()
+
+        self.deployer = Deployer(self.provider_repo, mock.MagicMock())
+        with mock.patch("ndeploy.deployer.Deployer._load_file_to_dict") as mock_load_file_to_dict:
+            self.deployer.apply(plan_file)
+        mock_load_file_to_dict.assert_not_called()
+
+        calls = self.mocked_provider.execute_deploy.call_args_list
+        self.assertEqual(["deploy_by_image", "deploy_by_image"], [call_args[0][0] for call_args in calls])
+        for index, (app_name, deploy_name) in enumerate([("my-app", "super-my-app"), ("other-app", "super-other-app")]):
+            self._assertApp(app_name, deploy_name, calls[index][0][1])
+            self._assertEnv("qa", "qa.nexxera.com", "openshift", calls[index][0][2])
+
+    def test_compile_should_fail_without_apps(self):
+        local_file = self._write_temp_file("apps.json", '{"apps": []}')
+        plan_file = os.path.join(os.path.dirname(local_file), "plan.json")
+        self._configure_env("qa", "qa.nexxera.com", "openshift", None)
+
+        with self.assertRaises(InvalidArgumentError):
+            self.deployer.compile(plan_file, file=local_file, environment="qa")
+        self.assertFalse(os.path.exists(plan_file))
+
+    @mock.patch("ndeploy.deployer.Deployer._exec_git_archive")
+    def test_deploy_should_read_remote_configs_and_template_from_a_config_bundle(self, mock_exec_git_archive):
+        config_files = {
+            "apps/api.json": {"name": "api", "env_vars": {"include": "/shared/env.json"}},
+            "apps/worker.yaml": {"name": "worker"},
+            "shared/env.json": {"A": "1"},
+        }
+        config_mirror = mock.MagicMock()
+        config_mirror.list_files.return_value = ["apps/api.json", "apps/worker.yaml"]
+        config_mirror.read_file.side_effect = lambda repo_url, branch, file_path, rsa_path: \
+            json.dumps(config_files[file_path]).encode()
+        self.deployer = Deployer(self.provider_repo, self.env_repo, config_mirror)
+        self._configure_env("dev", "dev.nexxera.com", "dokku",
+                            "git@git.nexxera.com:environment-conf-dev/{group}.git master apps/{name}.json")
+        template_file = self._write_temp_file("ndeploy.json", '{"group": "group"}')
+        bundle_file = self._write_temp_file("bundle.zip", "", os.path.dirname(template_file))
+
+        with mock.patch("os.getcwd", return_value=os.path.dirname(template_file)):
+            self.deployer.bundle(bundle_file, ["dev"], ["group"], ["api"])
+        os.remove(template_file)
+
+        self.deployer = Deployer(self.provider_repo, self.env_repo, mock.MagicMock())
+        self.deployer.deploy(group="group", name="api", environment="dev", bundle=bundle_file)
+
+        self._assert_deploy_call("api", "api", "dev", "dev.nexxera.com", "dokku")
+        self.assertEqual("group", self.mocked_provider.deploy.call_args[0][0].group)
+        self.assertEqual({"A": "1"}, self.mocked_provider.deploy.call_args[0][0].env_vars)
+        with self.assertRaises(AppConfigFileCloneError):
+            self.deployer.deploy(group="group", name="worker", environment="dev", bundle=bundle_file)
+        mock_exec_git_archive.assert_not_called()
+
+    def test_deploy_stream_should_fail_without_file(self):
+        with self.assertRaises(InvalidArgumentError):
+            self.deployer.deploy(group="group", name="app", environment="dev", stream=True)
+
+    def test_deploy_should_resolve_extends_and_includes_of_local_config_file(self):
+        env_file = self._write_temp_file("env.yaml", "environment: {name: dev, type: dokku, deploy_host: d.com}")
+        temp_dir = os.path.dirname(env_file)
+        self._write_temp_file("base.json", '{"group": "group", "env_vars": {"A": "1", "B": "1"}}', temp_dir)
+        local_file = self._write_temp_file("apps.yaml", "include: env.yaml\n"
+                                                        "apps:\n"
+                                                        "  - {extends: base.json, name: app1, env_vars: {B: '2'}}\n"
+                                                        "  - {extends: base.json, name: app2}\n", temp_dir)
+
+        for stream in [False, True]:
+            self.mocked_provider.reset_mock()
+            self.deployer.deploy(file=local_file, stream=stream)
+
+            self.assertEqual(2, self.mocked_provider.deploy.call_count)
+            self._assert_deploy_call_list(0, "app1", "app1", "dev", "d.com", "dokku")
+            self._assert_deploy_call_list(1, "app2", "app2", "dev", "d.com", "dokku")
+            self.assertEqual({"A": "1", "B": "2"}, self.mocked_provider.deploy.call_args_list[0][0][0].env_vars)
+            self.assertEqual({"A": "1", "B": "1"}, self.mocked_provider.deploy.call_args_list[1][0][0].env_vars)
+
+    def test_deploy_all_apps_should_read_each_shared_config_fragment_once(self):
+        config_files = {
+            "apps/api.json": {"name": "api", "group": "group", "env_vars": {"include": "shared/env.json"}},
+            "apps/worker.json": {"name": "worker", "group": "group", "env_vars": {"include": "shared/env.json"}},
+            "apps/shared/env.json": {"A": "1"},
+        }
+        config_mirror = mock.MagicMock()
+        config_mirror.list_files.return_value = sorted(config_files)
+        config_mirror.read_file.side_effect = lambda repo_url, branch, file_path, rsa_path: \
+            json.dumps(config_files[file_path]).encode()
+        self.deployer = Deployer(self.provider_repo, self.env_repo, config_mirror)
+        self._configure_env("dev", "dev.nexxera.com", "dokku",
+                            "git@git.nexxera.com:environment-conf-dev/{group}.git master apps/{name}.json")
+
+        self.deployer.deploy(group="group", environment="dev", all_apps=True)
+
+        self.assertEqual(2, self.mocked_provider.deploy.call_count)
+        for call_args in self.mocked_provider.deploy.call_args_list:
+            self.assertEqual({"A": "1"}, call_args[0][0].env_vars)
+        read_paths = [call_args[0][2] for call_args in config_mirror.read_file.call_args_list]
+        self.assertEqual(1, read_paths.count("apps/shared/env.json"))
+
     @mock.patch("ndeploy.deployer.Deployer._get_remote_conf")
     def test_should_raise_exception_if_remote_app_url_is_bad_formed(self, _get_remote_conf):
         # _get_remote_conf.return_value = {"name": "app", "deploy_name": "financial"}
@@ -88,28 +391,27 @@ class DeployerTest(unittest.TestCase):
         with self.assertRaises(InvalidArgumentError):
             self.deployer.undeploy(name="app", group="group", environment="invalid")
 
-    @mock.patch("ndeploy.deployer.Deployer._exec_git_clone_file")
-    def test_undeploy_should_call_correct_provider_to_undeploy(self, mock_exec_git_clone_file):
-        self.env_repo.get_ndeploy_dir.return_value = "/"
+    @mock.patch("ndeploy.deployer.Deployer._exec_git_archive")
+    def test_undeploy_should_call_correct_provider_to_undeploy(self, mock_exec_git_archive):
         local_file = os.path.join(os.path.dirname(__file__), '../resources', 'app.json')
-        mock_exec_git_clone_file.return_value = local_file
+        mock_exec_git_archive.side_effect = self._archive_with(local_file)
 
         self._configure_env("qa", "qa.nexxera.com", "openshift",
                             "git@git.nexxera.com:environment-conf-qa/{group}.git master {name}.json")
         self.deployer.undeploy(name="app", group="group", environment="qa")
         self._assert_undeploy_call("my-app", "super-app", "qa", "qa.nexxera.com", "openshift")
 
-    @mock.patch("ndeploy.deployer.Deployer._exec_git_clone_file")
-    def test_undeploy_should_accept_n_apps_in_config_file(self, mock_exec_git_clone_file):
-        self.env_repo.get_ndeploy_dir.return_value = "/"
+    @mock.patch("ndeploy.deployer.Deployer._exec_git_archive")
+    def test_undeploy_should_accept_n_apps_in_config_file(self, mock_exec_git_archive):
         local_file = os.path.join(os.path.dirname(__file__), '../resources', 'apps.json')
-        mock_exec_git_clone_file.return_value = local_file
+        mock_exec_git_archive.side_effect = self._archive_with(local_file)
 
         self._configure_env("dev", "dev.nexxera.com", "openshift",
                             "git@git.nexxera.com:environment-conf-dev/{group}.git master {name}.json")
 
         self.deployer.undeploy(name="app", group="group", environment="dev")
-        self.assertEqual(2, self.mocked_provider.undeploy.call_count)
+        self.assertEqual(1, self.mocked_provider.undeploy_apps.call_count)
+        self.assertEqual(2, len(self.mocked_provider.undeploy_apps.call_args[0][0]))
         self._assert_undeploy_call_list(0, "my-app", "super-my-app", "dev", "dev.nexxera.com", "openshift")
         self._assert_undeploy_call_list(1, "other-app", "super-other-app", "dev", "dev.nexxera.com", "openshift")
 
@@ -128,16 +430,15 @@ class DeployerTest(unittest.TestCase):
 
     @mock.patch("ndeploy.deployer.Deployer._load_template_ndeploy_file")
     @mock.patch("os.path.exists")
-    @mock.patch("ndeploy.deployer.Deployer._exec_git_clone_file")
+    @mock.patch("ndeploy.deployer.Deployer._exec_git_archive")
     def test_deploy_should_be_possible_to_merge_the_local_template_with_remote_settings(
-            self, mock_exec_git_clone_file, mock_os_exists, _):
-        self.env_repo.get_ndeploy_dir.return_value = "/"
+            self, mock_exec_git_archive, mock_os_exists, _):
         local_file = os.path.join(os.path.dirname(__file__), '../resources', 'app.json')
         # mock_os_exists.return_value = True
         self.deployer._app_data_template = self._load_json_to_dict(local_file)
 
         remote_file = os.path.join(os.path.dirname(__file__), '../resources', 'app_remote.json')
-        mock_exec_git_clone_file.return_value = remote_file
+        mock_exec_git_archive.side_effect = self._archive_with(remote_file)
         remote_data_config = self._load_json_to_dict(remote_file)
 
         self._configure_env("qa", "qa.nexx.com", "openshift",
@@ -183,16 +484,15 @@ class DeployerTest(unittest.TestCase):
 
     @mock.patch("ndeploy.deployer.Deployer._load_template_ndeploy_file")
     @mock.patch("os.path.exists")
-    @mock.patch("ndeploy.deployer.Deployer._exec_git_clone_file")
+    @mock.patch("ndeploy.deployer.Deployer._exec_git_archive")
     def test_deploy_should_be_possible_to_merge_the_local_template_with_remote_settings_from_n_apps(
-            self, mock_exec_git_clone_file, mock_os_exists, _):
-        self.env_repo.get_ndeploy_dir.return_value = "/"
+            self, mock_exec_git_archive, mock_os_exists, _):
         local_file = os.path.join(os.path.dirname(__file__), '../resources', 'apps.json')
         mock_os_exists.return_value = True
         self.deployer._app_data_template = self._load_json_to_dict(local_file)
 
         remote_file = os.path.join(os.path.dirname(__file__), '../resources', 'apps_remote.json')
-        mock_exec_git_clone_file.return_value = remote_file
+        mock_exec_git_archive.side_effect = self._archive_with(remote_file)
         remote_data_config = self._load_json_to_dict(remote_file)
 
         self._configure_env("qa", "qa.nexx.com", "openshift",
@@ -206,6 +506,20 @@ class DeployerTest(unittest.TestCase):
         self._assert_deploy_call_list(1, expected_app2["name"], expected_app2["deploy_name"],
                                       "qa", "qa.nexx.com", "openshift")
 
+    @mock.patch("ndeploy.deployer.Deployer._load_template_ndeploy_file")
+    def test_deploy_should_not_change_the_local_template(self, _):
+        self.deployer._app_data_template = {"group": "group", "env_vars": {"TEMPLATE": "1"}}
+        self._configure_env("qa", "qa.nexx.com", "openshift", None)
+
+        for name in ["app1", "app2"]:
+            local_file = self._write_temp_file("app.json", json.dumps({"name": name, "env_vars": {name: name}}))
+            self.deployer.deploy(file=local_file, environment="qa")
+
+        self.assertEqual({"group": "group", "env_vars": {"TEMPLATE": "1"}}, self.deployer._app_data_template)
+        apps = [call_args[0][0] for call_args in self.mocked_provider.deploy.call_args_list]
+        self.assertEqual({"TEMPLATE": "1", "app1": "app1"}, apps[0].env_vars)
+        self.assertEqual({"TEMPLATE": "1", "app2": "app2"}, apps[1].env_vars)
+
     @mock.patch("os.path.exists")
     def test_deploy_should_raise_exception_if_invalid_yaml_file(self, mock_template_ndeploy):
         mock_template_ndeploy.return_value = False
@@ -213,8 +527,35 @@ class DeployerTest(unittest.TestCase):
         with self.assertRaises(InvalidEnvironmentFileError):
             self.deployer.deploy(file=local_file, environment="qa")
 
+    def test_yaml_config_should_be_loaded_with_a_safe_loader(self):
+        with self.assertRaises(InvalidEnvironmentFileError):
+            self.deployer._load_content_to_dict("app.yaml", "name: !!python/object/apply:os.getcwd []")
+
+    def test_config_content_should_be_parsed_once(self):
+        self.deployer = Deployer(self.provider_repo, self.env_repo, parse_cache=ParseCache())
+        with mock.patch("yaml.load", side_effect=yaml.load) as mock_yaml_load:
+            for _ in range(2):
+                self.assertEqual({"name": "app", "group": "group"},
+                                 self.deployer._load_content_to_dict("app.yaml", "name: app\ngroup: group\n"))
+        self.assertEqual(1, mock_yaml_load.call_count)
+
     # -----------------------  Helpers  ---------------------------------
 
+    @staticmethod
+    def _archive_with(local_file):
+        with open(local_file, "rb") as file:
+            content = file.read()
+        return lambda rsa_path, repo_url, branch, path: {path: content}
+
+    def _write_temp_file(self, name, content, temp_dir=None):
+        if not temp_dir:
+            temp_dir = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, temp_dir, True)
+        file = os.path.join(temp_dir, name)
+        with open(file, "w") as f:
+            f.write(content)
+        return file
+
     def _configure_env(self, name, host, _type, url):
         self.env_repo.has_environment.side_effect = \
             lambda n: n == name
@@ -224,10 +565,12 @@ class DeployerTest(unittest.TestCase):
     def _assert_undeploy_call(self, expected_app_name, expected_app_deploy_name,
                               expected_env_name, expected_env_deploy_host, expected_env_type):
         self.provider_repo.get_provider_for.assert_called_with(expected_env_type)
-        self.assertEqual(1, self.mocked_provider.undeploy.call_count)
+        self.assertEqual(1, self.mocked_provider.undeploy_apps.call_count)
 
-        app_called = self.mocked_provider.undeploy.call_args[0][0]
-        env_called = self.mocked_provider.undeploy.call_args[0][1]
+        apps_called = self.mocked_provider.undeploy_apps.call_args[0][0]
+        self.assertEqual(1, len(apps_called))
+        app_called = apps_called[0]
+        env_called = self.mocked_provider.undeploy_apps.call_args[0][1]
         self._assertApp(expected_app_name, expected_app_deploy_name, app_called)
         self._assertEnv(expected_env_name, expected_env_deploy_host, expected_env_type, env_called)
 
@@ -251,8 +594,8 @@ class DeployerTest(unittest.TestCase):
 
     def _assert_undeploy_call_list(self, index_call_args, expected_app_name, expected_app_deploy_name,
                                    expected_env_name, expected_env_deploy_host, expected_env_type):
-        call_args = self.mocked_provider.undeploy.call_args_list[index_call_args]
-        app_called = call_args[0][0]
+        call_args = self.mocked_provider.undeploy_apps.call_args
+        app_called = call_args[0][0][index_call_args]
         env_called = call_args[0][1]
         self._assertApp(expected_app_name, expected_app_deploy_name, app_called)
         self._assertEnv(expected_env_name, expected_env_deploy_host, expected_env_type, env_called)
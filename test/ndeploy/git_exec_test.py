@@ -1,8 +1,15 @@
+import os
+import shutil
+import fcntl
+import tempfile
+import threading
 import unittest
 from unittest.mock import patch, MagicMock
+
+import git
 from git import PushInfo
 
-from ndeploy.git_exec import GitExec, GitExecError
+from ndeploy.git_exec import GitExec, GitExecError, GitNoSuchPathError
 
 
 class GitExecTest(unittest.TestCase):
@@ -62,6 +69,32 @@ class GitExecTest(unittest.TestCase):
         repo_mock.clone_from.assert_called_with(source_repository, repo_full_path,
                                                 branch=branch_name, progress=self.git_exec.progress)
 
+    @patch('git.Repo')
+    def test_should_be_possible_to_clone_only_the_last_commit_of_a_branch(self, repo_mock):
+        source_repository = "https://git.nexx.com/utils/ndeploy.git"
+        repo_full_path = "/tmp/appteste-ndeploy"
+
+        self.git_exec.git_clone_from(source_repository, repo_full_path, "develop", depth=1, blobless=True,
+                                     single_branch=True)
+        repo_mock.clone_from.assert_called_with(source_repository, repo_full_path, branch="develop", depth=1,
+                                                filter="blob:none", single_branch=True,
+                                                progress=self.git_exec.progress)
+
+    def test_should_deepen_a_shallow_clone(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        origin = self._create_repository_with_commit(os.path.join(work_dir, "origin"), "app.py")
+        self._create_repository_with_commit(origin.working_dir, "worker.py")
+        clone_full_path = os.path.join(work_dir, "clone")
+
+        self.git_exec.git_clone_from("file://" + origin.working_dir, clone_full_path, "master", depth=1,
+                                     single_branch=True)
+        self.assertEqual(1, len(list(git.Repo(clone_full_path).iter_commits())))
+
+        self.assertTrue(self.git_exec.git_deepen(clone_full_path))
+        self.assertEqual(2, len(list(git.Repo(clone_full_path).iter_commits())))
+        self.assertFalse(self.git_exec.git_deepen(clone_full_path))
+
     @patch('git.Repo')
     def test_should_be_possible_to_pull_local_repository(self, mock_repo):
         repo_full_path = "/tmp/appteste-ndeploy"
@@ -71,6 +104,138 @@ class GitExecTest(unittest.TestCase):
         mock_remotes_pull = mock_instance.remotes.origin.pull
         mock_remotes_pull.assert_called_once_with(progress=self.git_exec.progress)
 
+    def test_should_list_worktree_files_excluding_ignored_files(self):
+        repo_full_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, repo_full_path, True)
+        git.Repo.init(repo_full_path)
+        for path, content in [(".gitignore", "*.log\n"), ("app.py", ""), ("debug.log", ""), ("src/main.py", "")]:
+            os.makedirs(os.path.dirname(os.path.join(repo_full_path, path)), exist_ok=True)
+            with open(os.path.join(repo_full_path, path), "w") as file:
+                file.write(content)
+
+        self.assertEqual([".gitignore", "app.py", "src/main.py"], self.git_exec.list_worktree_files(repo_full_path))
+
+    def test_should_raise_exception_when_listing_files_of_a_path_that_is_not_a_repository(self):
+        with self.assertRaises(GitNoSuchPathError):
+            self.git_exec.list_worktree_files(tempfile.gettempdir())
+
+    def test_should_create_and_update_a_bare_mirror(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        origin = self._create_repository_with_commit(os.path.join(work_dir, "origin"), "app.py")
+        mirror_full_path = os.path.join(work_dir, "mirrors", "origin.git")
+
+        self.git_exec.git_mirror(origin.working_dir, mirror_full_path)
+        self.assertTrue(git.Repo(mirror_full_path).bare)
+        self.assertEqual(origin.head.commit.hexsha, self.git_exec.get_commit_sha(mirror_full_path, "master"))
+
+        self._create_repository_with_commit(origin.working_dir, "worker.py")
+        self.git_exec.git_mirror(origin.working_dir, mirror_full_path)
+        self.assertEqual(origin.head.commit.hexsha, self.git_exec.get_commit_sha(mirror_full_path, "master"))
+        self.assertEqual(["origin.git", "origin.git.lock"], sorted(os.listdir(os.path.join(work_dir, "mirrors"))))
+
+    def test_should_wait_for_the_mirror_lock_before_fetching(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        origin = self._create_repository_with_commit(os.path.join(work_dir, "origin"), "app.py")
+        mirror_full_path = os.path.join(work_dir, "origin.git")
+
+        with open(mirror_full_path + ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            fetch = threading.Thread(target=self.git_exec.git_mirror, args=(origin.working_dir, mirror_full_path))
+            fetch.start()
+            fetch.join(0.5)
+            self.assertTrue(fetch.is_alive())
+            self.assertFalse(os.path.exists(mirror_full_path))
+        fetch.join()
+        self.assertTrue(git.Repo(mirror_full_path).bare)
+
+    def test_should_push_a_commit_to_the_remote_url_without_adding_a_remote(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        repo = self._create_repository_with_commit(os.path.join(work_dir, "repo"), "app.py")
+        remote = git.Repo.init(os.path.join(work_dir, "remote.git"), bare=True)
+
+        self.git_exec.git_push_url(repo.working_dir, remote.working_dir, "HEAD", "master")
+        self.assertEqual(repo.head.commit.hexsha, remote.commit("master").hexsha)
+        self.assertEqual([], repo.remotes)
+
+    def test_should_raise_exception_when_the_push_to_the_remote_url_fails(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        repo = self._create_repository_with_commit(os.path.join(work_dir, "repo"), "app.py")
+
+        with self.assertRaises(GitExecError):
+            self.git_exec.git_push_url(repo.working_dir, os.path.join(work_dir, "missing.git"), "HEAD", "master")
+
+    def test_should_add_and_remove_a_worktree_of_a_bare_mirror(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        origin = self._create_repository_with_commit(os.path.join(work_dir, "origin"), "app.py")
+        mirror_full_path = os.path.join(work_dir, "origin.git")
+        self.git_exec.git_mirror(origin.working_dir, mirror_full_path)
+        worktree_full_path = tempfile.mkdtemp(dir=work_dir)
+
+        self.git_exec.git_worktree_add(mirror_full_path, worktree_full_path, "master")
+        self.assertTrue(os.path.isfile(os.path.join(worktree_full_path, "app.py")))
+        self.assertTrue(git.Repo(worktree_full_path).head.is_detached)
+        self.assertEqual(origin.head.commit.hexsha, git.Repo(worktree_full_path).head.commit.hexsha)
+
+        self.git_exec.git_worktree_remove(mirror_full_path, worktree_full_path)
+        self.assertFalse(os.path.exists(worktree_full_path))
+        self.assertEqual(1, len(git.Repo(mirror_full_path).git.worktree("list").splitlines()))
+
+    def test_should_create_a_blobless_mirror_fetching_the_files_on_checkout(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        origin = self._create_repository_with_commit(os.path.join(work_dir, "origin"), "app.py")
+        origin.git.config("uploadpack.allowFilter", "true")
+        mirror_full_path = os.path.join(work_dir, "origin.git")
+
+        self.git_exec.git_mirror("file://" + origin.working_dir, mirror_full_path, blobless=True)
+        mirror = git.Repo(mirror_full_path)
+        self.assertEqual("blob:none", mirror.git.config("remote.origin.partialclonefilter"))
+        blob = origin.head.commit.tree["app.py"].hexsha
+        self.assertIn("?" + blob, mirror.git.rev_list("--objects", "--missing=print", "--all").splitlines())
+
+        self._create_repository_with_commit(origin.working_dir, "worker.py")
+        self.git_exec.git_mirror("file://" + origin.working_dir, mirror_full_path, blobless=True)
+        worktree_full_path = os.path.join(work_dir, "worktree")
+        self.git_exec.git_worktree_add(mirror_full_path, worktree_full_path, "master")
+        self.assertTrue(os.path.isfile(os.path.join(worktree_full_path, "worker.py")))
+        self.git_exec.git_worktree_remove(mirror_full_path, worktree_full_path)
+
+    def test_should_update_a_bare_mirror_with_leftover_worktrees(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        origin = self._create_repository_with_commit(os.path.join(work_dir, "origin"), "app.py")
+        mirror_full_path = os.path.join(work_dir, "origin.git")
+        self.git_exec.git_mirror(origin.working_dir, mirror_full_path)
+        self.git_exec.git_worktree_add(mirror_full_path, os.path.join(work_dir, "leftover"), "master")
+        git.Repo(mirror_full_path).git.worktree("add", os.path.join(work_dir, "checked-out"), "master")
+        removed_full_path = os.path.join(work_dir, "removed")
+        self.git_exec.git_worktree_add(mirror_full_path, removed_full_path, "master")
+        shutil.rmtree(removed_full_path)
+
+        self._create_repository_with_commit(origin.working_dir, "worker.py")
+        self.git_exec.git_mirror(origin.working_dir, mirror_full_path)
+        self.assertEqual(origin.head.commit.hexsha, self.git_exec.get_commit_sha(mirror_full_path, "master"))
+        self.assertEqual(3, len(git.Repo(mirror_full_path).git.worktree("list").splitlines()))
+
+    @patch('git.cmd.Git')
+    def test_should_get_the_commit_of_a_remote_ref(self, git_mock):
+        git_mock.return_value.ls_remote.return_value = "a1b2c3\trefs/heads/master\nd4e5f6\trefs/heads/master-old"
+        self.assertEqual("a1b2c3", self.git_exec.get_remote_ref("dokku@dev.com:myapp", "refs/heads/master"))
+        git_mock.return_value.ls_remote.assert_called_once_with("dokku@dev.com:myapp", "refs/heads/master")
+
+    @patch('git.cmd.Git')
+    def test_should_return_none_if_remote_ref_does_not_exist(self, git_mock):
+        git_mock.return_value.ls_remote.return_value = ""
+        self.assertIsNone(self.git_exec.get_remote_ref("dokku@dev.com:myapp", "refs/heads/master"))
+
+        git_mock.return_value.ls_remote.side_effect = git.GitCommandError("ls-remote", 128)
+        self.assertIsNone(self.git_exec.get_remote_ref("dokku@dev.com:myapp", "refs/heads/master"))
+
     @patch('git.Repo')
     def test_should_be_possible_to_get_the_name_of_the_current_branch(self, mock_repo):
         branch_name = "develop"
@@ -81,3 +246,13 @@ class GitExecTest(unittest.TestCase):
 
         current_branch_name = self.git_exec.get_current_branch_name(repo_full_path)
         self.assertEqual(branch_name, current_branch_name)
+
+    @staticmethod
+    def _create_repository_with_commit(repo_full_path, file_name):
+        repo = git.Repo.init(repo_full_path, initial_branch="master") if not os.path.isdir(repo_full_path) \
+            else git.Repo(repo_full_path)
+        with open(os.path.join(repo_full_path, file_name), "w") as file:
+            file.write(file_name)
+        repo.index.add([file_name])
+        repo.index.commit("add {}".format(file_name))
+        return repo
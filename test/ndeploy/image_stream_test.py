@@ -0,0 +1,81 @@
+import hashlib
+import io
+import tarfile
+import unittest
+
+from ndeploy import image_stream
+
+
+def diff_id(content):
+    return "sha256:" + hashlib.sha256(content).hexdigest()
+
+
+def create_image_archive(files):
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode="w") as tar:
+        for name, content in files:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    archive.seek(0)
+    return archive
+
+
+def read_archive_names(archive):
+    archive.seek(0)
+    with tarfile.open(fileobj=archive, mode="r:gz") as tar:
+        return tar.getnames()
+
+
+class ImageStreamTest(unittest.TestCase):
+
+    def test_parse_layers(self):
+        self.assertEqual([["sha256:a1", "sha256:b2"], ["sha256:c3"]],
+                         image_stream.parse_layers("[sha256:a1 sha256:b2]\n[sha256:c3]\n"))
+
+    def test_chain_id_of_first_layer_is_its_diff_id(self):
+        chain_ids = image_stream.get_chain_ids(["sha256:a1", "sha256:b2"])
+        self.assertEqual("sha256:a1", chain_ids[0])
+        self.assertEqual("sha256:" + hashlib.sha256(b"sha256:a1 sha256:b2").hexdigest(), chain_ids[1])
+
+    def test_shared_layers_should_follow_the_layers_chain(self):
+        host_images = [["sha256:base", "sha256:python"], ["sha256:other", "sha256:app"]]
+        self.assertEqual({"sha256:base", "sha256:python"},
+                         image_stream.get_shared_layers(["sha256:base", "sha256:python", "sha256:app"], host_images))
+        self.assertEqual(set(), image_stream.get_shared_layers(["sha256:python", "sha256:base"], host_images))
+        self.assertEqual(set(), image_stream.get_shared_layers(["sha256:base"], []))
+
+    def test_filter_should_leave_out_legacy_layers_on_host(self):
+        source = create_image_archive([("base/layer.tar", b"base"), ("base/json", b"{}"),
+                                       ("app/layer.tar", b"app"), ("manifest.json", b"[]")])
+        target = io.BytesIO()
+
+        skipped = image_stream.filter_image_archive(source, target, {diff_id(b"base")})
+
+        self.assertEqual(1, skipped)
+        self.assertEqual(["base/json", "app/layer.tar", "manifest.json"], read_archive_names(target))
+
+    def test_filter_should_leave_out_oci_blobs_on_host(self):
+        base_blob = "blobs/sha256/" + hashlib.sha256(b"base").hexdigest()
+        app_blob = "blobs/sha256/" + hashlib.sha256(b"app").hexdigest()
+        source = create_image_archive([(base_blob, b"base"), (app_blob, b"app"), ("manifest.json", b"[]")])
+        target = io.BytesIO()
+
+        skipped = image_stream.filter_image_archive(source, target, {diff_id(b"base")})
+
+        self.assertEqual(1, skipped)
+        self.assertEqual([app_blob, "manifest.json"], read_archive_names(target))
+
+    def test_filter_should_keep_contents(self):
+        source = create_image_archive([("app/layer.tar", b"app"), ("manifest.json", b"[]")])
+        target = io.BytesIO()
+
+        self.assertEqual(0, image_stream.filter_image_archive(source, target, {diff_id(b"base")}))
+
+        target.seek(0)
+        with tarfile.open(fileobj=target, mode="r:gz") as tar:
+            self.assertEqual(b"app", tar.extractfile("app/layer.tar").read())
+
+
+if __name__ == '__main__':
+    unittest.main()
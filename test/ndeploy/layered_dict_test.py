@@ -0,0 +1,55 @@
+import copy
+import unittest
+
+from ndeploy.layered_dict import LayeredDict, to_dict
+
+
+class LayeredDictTest(unittest.TestCase):
+
+    def setUp(self):
+        self.template = {"image": "base", "env_vars": {"A": "1", "B": "1"}, "domains": ["a.com"], "port": {"http": 80}}
+        self.file_data = {"name": "app", "env_vars": {"B": "2", "C": "2"}, "port": 8080}
+        self.original_template = copy.deepcopy(self.template)
+        self.original_file_data = copy.deepcopy(self.file_data)
+
+    def test_should_deep_merge_the_layers_in_order(self):
+        data = LayeredDict(self.template, self.file_data)
+
+        self.assertEqual({"image": "base", "env_vars": {"A": "1", "B": "2", "C": "2"}, "domains": ["a.com"],
+                          "port": 8080, "name": "app"}, to_dict(data))
+        self.assertEqual(["image", "env_vars", "domains", "port", "name"], list(data))
+        self.assertEqual(5, len(data))
+
+    def test_should_not_change_the_layers(self):
+        data = LayeredDict(self.template, self.file_data)
+
+        data["env_vars"]["A"] = "3"
+        data["domains"].append("b.com")
+        data["image"] = "other"
+        del data["name"]
+        data.pop("port")
+
+        self.assertEqual({"image": "other", "env_vars": {"A": "3", "B": "2", "C": "2"},
+                          "domains": ["a.com", "b.com"]}, data.to_dict())
+        self.assertEqual(self.original_template, self.template)
+        self.assertEqual(self.original_file_data, self.file_data)
+
+    def test_should_share_the_template_between_views(self):
+        first = LayeredDict(self.template, {"env_vars": {"A": "first"}})
+        second = LayeredDict(self.template, {"name": "second"})
+
+        first["env_vars"]["D"] = "4"
+
+        self.assertEqual({"A": "1", "B": "1"}, second["env_vars"])
+        self.assertEqual({"A": "first", "B": "1", "D": "4"}, first["env_vars"])
+
+    def test_should_raise_key_error_for_missing_or_deleted_keys(self):
+        data = LayeredDict(self.template, None, self.file_data)
+        del data["image"]
+
+        for key in ["image", "missing"]:
+            with self.assertRaises(KeyError):
+                data[key]
+        with self.assertRaises(KeyError):
+            del data["image"]
+        self.assertNotIn("image", data)
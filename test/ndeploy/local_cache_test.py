@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from ndeploy.local_cache import LocalCache
+
+
+class LocalCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.cache_dir, "cache", "test.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_should_return_default_if_key_does_not_exist(self):
+        cache = LocalCache(self.cache_file)
+        self.assertEqual("default", cache.get("key", "default"))
+
+    def test_should_persist_values_between_instances(self):
+        LocalCache(self.cache_file).set("key", {"value": 1})
+        self.assertEqual({"value": 1}, LocalCache(self.cache_file).get("key"))
+
+    def test_should_keep_values_only_in_memory_without_cache_file(self):
+        cache = LocalCache()
+        cache.set("key", "value")
+        self.assertEqual("value", cache.get("key"))
+        self.assertFalse(os.path.exists(self.cache_file))
+
+    @patch("time.time")
+    def test_should_expire_values_after_ttl(self, mock_time):
+        mock_time.return_value = 1000
+        cache = LocalCache(self.cache_file)
+        cache.set("key", "value", ttl=60)
+
+        mock_time.return_value = 1030
+        self.assertEqual("value", cache.get("key"))
+        self.assertIsNone(cache.get("key", min_ttl=40))
+
+        mock_time.return_value = 1060
+        self.assertIsNone(cache.get("key"))
+
+    def test_should_remove_values(self):
+        cache = LocalCache(self.cache_file)
+        cache.set("key", "value")
+        cache.remove("key")
+        self.assertIsNone(LocalCache(self.cache_file).get("key"))
+
+    def test_should_ignore_corrupted_cache_file(self):
+        os.makedirs(os.path.dirname(self.cache_file))
+        with open(self.cache_file, 'w') as file:
+            file.write("{invalid")
+        self.assertIsNone(LocalCache(self.cache_file).get("key"))
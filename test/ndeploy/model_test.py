@@ -64,6 +64,16 @@ class AssembleModelTest(unittest.TestCase):
             Environment(type="dokku", name="qa", deploy_host="qa.nexxera.com",
                         app_deployment_file_url="git@git.nexxera.com")
 
+    def test_environment_should_accept_several_deploy_hosts(self):
+        env = Environment(type="dokku", name="qa", deploy_host="qa1.nexxera.com, qa2.nexxera.com",
+                          app_deployment_file_url=get_valid_deployment_file_url())
+        self.assertEqual(["qa1.nexxera.com", "qa2.nexxera.com"], env.get_deploy_hosts())
+
+        host_env = env.for_host("qa2.nexxera.com")
+        self.assertEqual(["qa2.nexxera.com"], host_env.get_deploy_hosts())
+        self.assertEqual(env.name, host_env.name)
+        self.assertEqual(env.app_deployment_file_url, host_env.app_deployment_file_url)
+
     # def test_null_app_deployment_file_url_should_be_accepted(self):
     #     with self.assertRaises(BadFormedRemoteConfigUrlError):
     #         Environment(type="dokku", name="qa", deploy_host="qa.nexxera.com",
@@ -0,0 +1,60 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+
+from ndeploy.parse_cache import ParseCache
+
+
+class ParseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+
+    def test_should_parse_each_content_once(self):
+        parse = mock.MagicMock(side_effect=yaml.safe_load)
+        cache = ParseCache()
+
+        self.assertEqual({"name": "app"}, cache.get_or_parse("name: app", "yaml", parse))
+        self.assertEqual({"name": "app"}, cache.get_or_parse("name: app", "yaml", parse))
+        self.assertEqual({"name": "other"}, cache.get_or_parse("name: other", "yaml", parse))
+        self.assertEqual(2, parse.call_count)
+
+    def test_should_return_a_copy_of_the_cached_data(self):
+        cache = ParseCache()
+        data = cache.get_or_parse('{"env_vars": {"A": "1"}}', "json", json.loads)
+        data["env_vars"]["A"] = "2"
+
+        self.assertEqual({"env_vars": {"A": "1"}}, cache.get_or_parse('{"env_vars": {"A": "1"}}', "json", json.loads))
+
+    def test_should_reuse_parsed_content_across_runs(self):
+        ParseCache(self.cache_dir).get_or_parse("name: app", "yaml", yaml.safe_load)
+        parse = mock.MagicMock()
+
+        self.assertEqual({"name": "app"}, ParseCache(self.cache_dir).get_or_parse("name: app", "yaml", parse))
+        parse.assert_not_called()
+
+    def test_should_not_persist_json_content_or_data_json_can_not_represent(self):
+        cache = ParseCache(self.cache_dir)
+        cache.get_or_parse('{"name": "app"}', "json", json.loads)
+        cache.get_or_parse("1: one", "yaml", yaml.safe_load)
+        cache.get_or_parse("date: 2020-01-01", "yaml", yaml.safe_load)
+
+        self.assertEqual([], os.listdir(self.cache_dir))
+
+    def test_should_parse_again_if_persisted_entry_is_invalid(self):
+        key = ParseCache.get_key("name: app", "yaml")
+        with open(os.path.join(self.cache_dir, key + ".json"), "w") as file:
+            file.write("{invalid")
+
+        cache = ParseCache(self.cache_dir)
+        self.assertEqual({"name": "app"}, cache.get_or_parse("name: app", "yaml", yaml.safe_load))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import shlex
+import sys
+import threading
+import unittest
+
+from ndeploy.shell_exec import ShellExec
+
+
+class ShellExecTest(unittest.TestCase):
+
+    LARGE_OUTPUT = 1024 * 1024
+
+    def test_execute_pipe_should_not_block_when_the_producer_writes_many_errors(self):
+        producer = self._python("import sys; sys.stderr.write('e' * {}); print('data')".format(self.LARGE_OUTPUT))
+        consumer = self._python("import sys; print(sys.stdin.read().upper())")
+
+        err, out = self._run_with_timeout(lambda: ShellExec.execute_pipe(producer, consumer, silent=True))
+        self.assertEqual("DATA", out)
+        self.assertEqual(self.LARGE_OUTPUT, len(err))
+
+    def test_execute_stream_should_not_block_when_the_programs_write_large_outputs(self):
+        producer = self._python("import sys; sys.stderr.write('e' * {}); print('data')".format(self.LARGE_OUTPUT))
+        consumer = self._python("import sys; data = sys.stdin.read(); sys.stderr.write('e' * {size}); "
+                                "print(data.upper() * {size})".format(size=self.LARGE_OUTPUT))
+
+        err, out = self._run_with_timeout(
+            lambda: ShellExec.execute_stream(producer, consumer, lambda source, target: target.write(source.read()),
+                                             silent=True))
+        self.assertEqual("DATA\n" * (self.LARGE_OUTPUT - 1) + "DATA", out)
+        self.assertEqual(2 * self.LARGE_OUTPUT + 1, len(err))
+
+    def test_read_program_output_should_not_block_when_the_program_writes_many_errors(self):
+        cmd = self._python("import sys; sys.stderr.write('e' * {}); print('data')".format(self.LARGE_OUTPUT))
+
+        err, result = self._run_with_timeout(lambda: ShellExec.read_program_output(cmd, lambda stdout: stdout.read()))
+        self.assertEqual(b"data\n", result)
+        self.assertEqual(self.LARGE_OUTPUT, len(err))
+
+    # Helpers
+
+    @staticmethod
+    def _python(code):
+        return "{} -c {}".format(shlex.quote(sys.executable), shlex.quote(code))
+
+    def _run_with_timeout(self, fn):
+        results = []
+        thread = threading.Thread(target=lambda: results.append(fn()), daemon=True)
+        thread.start()
+        thread.join(30)
+        self.assertFalse(thread.is_alive(), "the programs are blocked")
+        return results[0]
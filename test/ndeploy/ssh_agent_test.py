@@ -0,0 +1,79 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from ndeploy.shell_exec import ShellExec
+from ndeploy.ssh_agent import SshAgentPool, SshAgentSession, SshAgentError
+
+AGENT_OUTPUT = "SSH_AUTH_SOCK=/tmp/ssh-a1/agent.10; export SSH_AUTH_SOCK;\n" \
+               "SSH_AGENT_PID=11; export SSH_AGENT_PID;\n" \
+               "echo Agent pid 11;"
+
+
+class SshAgentSessionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.shell_exec = mock.MagicMock()
+        self.shell_exec.execute_program.side_effect = lambda cmd, silent, env=None: \
+            ("", AGENT_OUTPUT) if cmd == "ssh-agent -s" else ("Identity added: /ssh/id_rsa_qa", "")
+
+    def test_should_start_agent_and_add_key_once(self):
+        session = SshAgentSession("/ssh/id_rsa_qa", self.shell_exec)
+        self.addCleanup(session.stop)
+
+        env = session.get_env()
+        session.get_env()
+
+        self.assertEqual("/tmp/ssh-a1/agent.10", env["SSH_AUTH_SOCK"])
+        self.assertEqual("11", env["SSH_AGENT_PID"])
+        self.assertEqual(["ssh-agent -s", "ssh-add /ssh/id_rsa_qa"],
+                         [c[0][0] for c in self.shell_exec.execute_program.call_args_list])
+
+    def test_should_kill_agent_on_stop(self):
+        session = SshAgentSession("/ssh/id_rsa_qa", self.shell_exec)
+        session.start()
+        session.stop()
+        session.stop()
+
+        kill_calls = [c for c in self.shell_exec.execute_program.call_args_list if c[0][0] == "ssh-agent -k"]
+        self.assertEqual(1, len(kill_calls))
+        self.assertEqual("11", kill_calls[0][1]["env"]["SSH_AGENT_PID"])
+
+    def test_should_raise_exception_and_stop_agent_if_key_is_not_added(self):
+        self.shell_exec.execute_program.side_effect = lambda cmd, silent, env=None: \
+            ("", AGENT_OUTPUT) if cmd.startswith("ssh-agent") else ("Error loading key", "")
+        session = SshAgentSession("/ssh/id_rsa_qa", self.shell_exec)
+
+        with self.assertRaises(SshAgentError):
+            session.start()
+        self.shell_exec.execute_program.assert_any_call("ssh-agent -k", True, env=mock.ANY)
+
+    @unittest.skipUnless(shutil.which("ssh-agent") and shutil.which("ssh-keygen"), "requires openssh client")
+    def test_should_serve_the_key_with_a_real_agent(self):
+        key_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, key_dir, True)
+        rsa_path = os.path.join(key_dir, "id_rsa_qa")
+        ShellExec.execute_program("ssh-keygen -f {} -t rsa -N '' -q".format(rsa_path), True)
+        session = SshAgentSession(rsa_path)
+        self.addCleanup(session.stop)
+
+        keys = subprocess.run(["ssh-add", "-l"], env=session.get_env(), stdout=subprocess.PIPE).stdout.decode()
+        self.assertEqual(1, len(keys.splitlines()))
+
+
+class SshAgentPoolTest(unittest.TestCase):
+
+    def test_should_share_one_session_per_key(self):
+        ssh_agents = SshAgentPool(mock.MagicMock())
+
+        session = ssh_agents.get("/ssh/id_rsa_qa")
+        self.assertIs(session, ssh_agents.get("/ssh/id_rsa_qa"))
+        self.assertIsNot(session, ssh_agents.get("/ssh/id_rsa_dev"))
+        self.assertEqual("/ssh/id_rsa_qa", session.rsa_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,8 @@
 import os
+import tarfile
 import unittest
 
-from ndeploy.utils import get_temp_dir_app_if_exists, create_temp_directory, rmtree
+from ndeploy.utils import create_temp_directory, rmtree, hash_files, create_tar_archive
 
 
 class UtilsTest(unittest.TestCase):
@@ -11,20 +12,29 @@ class UtilsTest(unittest.TestCase):
         rmtree(temp_dir)
         self.assertFalse(os.path.isdir(temp_dir))
 
-    def test_should_be_possible_to_get_a_temporary_directory(self):
-        app_name = "appteste-"
-        self._create_and_validate_temp_directory(app_name)
-
-        app_temp_dir = get_temp_dir_app_if_exists(app_name)
-        self.assertIsNotNone(app_temp_dir)
+    def test_hash_files_should_change_when_content_changes(self):
+        temp_dir = self._create_and_validate_temp_directory()
+        self.addCleanup(rmtree, temp_dir)
+        with open(os.path.join(temp_dir, "file.txt"), "w") as file:
+            file.write("content")
+        first_hash = hash_files(temp_dir, ["file.txt"])
+        self.assertEqual(first_hash, hash_files(temp_dir, ["file.txt"]))
 
-        rmtree(app_temp_dir)
-        self.assertFalse(os.path.isdir(app_temp_dir))
+        with open(os.path.join(temp_dir, "file.txt"), "w") as file:
+            file.write("new content")
+        self.assertNotEqual(first_hash, hash_files(temp_dir, ["file.txt"]))
 
-    def test_when_the_temporary_dir_does_not_exist_it_should_return_none(self):
-        app_name = "appteste-"
-        app_temp_dir = get_temp_dir_app_if_exists(app_name)
-        self.assertIsNone(app_temp_dir)
+    def test_should_create_tar_archive_only_with_the_files_passed(self):
+        temp_dir = self._create_and_validate_temp_directory()
+        self.addCleanup(rmtree, temp_dir)
+        for name in ["included.txt", "excluded.txt"]:
+            with open(os.path.join(temp_dir, name), "w") as file:
+                file.write(name)
+
+        archive_path = os.path.join(temp_dir, "archive.tar.gz")
+        create_tar_archive(archive_path, temp_dir, ["included.txt"])
+        with tarfile.open(archive_path) as archive:
+            self.assertEqual(["included.txt"], archive.getnames())
 
     # Helpers
 
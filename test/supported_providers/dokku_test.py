@@ -1,8 +1,17 @@
+import hashlib
+import io
+import json
+import os
+import sys
+import tarfile
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, patch
 
+from ndeploy import utils
+from ndeploy.git_exec import GitExecError
 from ndeploy.model import App, Environment
-from supported_providers.dokku import DokkuProvider
+from ndeploy.shell_exec import ShellExec
+from supported_providers.dokku import DokkuProvider, DokkuMultiHostDeployError, DokkuImageTransferError
 
 
 class DokkuTest(unittest.TestCase):
@@ -12,6 +21,7 @@ class DokkuTest(unittest.TestCase):
         self.shell_exec = MagicMock()
         self.dokku.set_shell_exec(self.shell_exec)
         self.git_exec = MagicMock()
+        self.git_exec.get_remote_ref.return_value = None
         self.dokku.set_git_exec(self.git_exec)
         self._configure_dokku_exec()
         self.env = Environment("dokku", "dev", "dev.com")
@@ -42,10 +52,8 @@ class DokkuTest(unittest.TestCase):
 
         source_repository = ".@{branch_name}".format(branch_name=branch_name)
         self._deploy_and_validate_app_create_by_source(source_repository)
-        self.git_exec.remote_git_add.assert_any_call(source_repository.split("@")[0],
-                                                     DokkuProvider.DOKKU_REMOTE_NAME, "dokku@dev.com:myapp")
-        self.git_exec.git_push.assert_any_call(source_repository.split("@")[0], DokkuProvider.DOKKU_REMOTE_NAME,
-                                               branch_name, "master")
+        self.git_exec.git_push_url.assert_any_call(source_repository.split("@")[0], "dokku@dev.com:myapp",
+                                                   branch_name, "master")
 
     def test_should_be_possible_injected_env_var_into_container_when_deploy_by_source(self):
         self.git_exec.get_current_branch_name.return_value = "develop"
@@ -56,22 +64,19 @@ class DokkuTest(unittest.TestCase):
         self.dokku.dokku_exec.assert_any_call("config:set --no-restart {app_name} "
                                               "DATA=\"teste do juca\" URL=\"http://jb.com.br\""
                                               .format(app_name=self.app.deploy_name))
-        self.git_exec.remote_git_add.assert_any_call(source_repository.split("@")[0], DokkuProvider.DOKKU_REMOTE_NAME,
-                                                     "dokku@dev.com:myapp")
-        self.git_exec.git_push.assert_any_call(source_repository.split("@")[0], DokkuProvider.DOKKU_REMOTE_NAME,
-                                               source_repository.split("@")[1], "master")
+        self.git_exec.git_push_url.assert_any_call(source_repository.split("@")[0], "dokku@dev.com:myapp",
+                                                   source_repository.split("@")[1], "master")
 
     def test_when_does_not_have_the_branch_in_the_repository_is_set_the_current_work_branch_by_default(self):
         self.git_exec.get_current_branch_name.return_value = "develop"
 
         source_repository = "."
         self._deploy_and_validate_app_create_by_source(source_repository)
-        self.git_exec.remote_git_add.assert_any_call(source_repository, DokkuProvider.DOKKU_REMOTE_NAME,
-                                                     "dokku@dev.com:myapp")
-        self.git_exec.git_push.assert_any_call(source_repository, DokkuProvider.DOKKU_REMOTE_NAME, "develop", "master")
+        self.git_exec.git_push_url.assert_any_call(source_repository, "dokku@dev.com:myapp", "develop", "master")
 
+    @patch('ndeploy.utils.rmtree')
     @patch('ndeploy.utils.create_temp_directory')
-    def test_should_be_possible_deploy_by_remote_source(self, mock_create_temp_directory):
+    def test_should_be_possible_deploy_by_remote_source(self, mock_create_temp_directory, mock_rmtree):
         repository = "https://git.nexx.com/utils/ndeploy.git"
         branch_name = "master"
         source_full_path = "/tmp/test"
@@ -80,28 +85,420 @@ class DokkuTest(unittest.TestCase):
 
         self._deploy_and_validate_app_create_by_source(source_repository)
         mock_create_temp_directory.assert_any_call(prefix=self.app.name)
-        self.git_exec.git_clone_from.assert_any_call(repository, source_full_path, branch_name)
-        self.git_exec.remote_git_add.assert_any_call(source_full_path, DokkuProvider.DOKKU_REMOTE_NAME,
-                                                     "dokku@dev.com:myapp")
-        self.git_exec.git_push.assert_any_call(source_full_path, DokkuProvider.DOKKU_REMOTE_NAME, branch_name, "master")
-
-    @patch('ndeploy.utils.get_temp_dir_app_if_exists')
-    def test_when_have_local_cache_of_the_remote_repository_the_source_must_be_updated_to_deploy(self,
-                                                                                                 mock_get_temp_dir):
-        branch_name = "master"
-        source_repository = "https://git.nexx.com/utils/ndeploy.git@{branch_name}".format(branch_name=branch_name)
-        self.git_exec.get_current_branch_name.return_value = branch_name
-        temp_dir = "/temp/appteste-33-ndeploy"
-        mock_get_temp_dir.return_value = temp_dir
+        self.git_exec.git_clone_from.assert_any_call(repository, source_full_path, branch_name,
+                                                     depth=1, single_branch=True)
+        self.git_exec.git_push_url.assert_any_call(source_full_path, "dokku@dev.com:myapp",
+                                                   "HEAD", "master")
+        mock_rmtree.assert_called_once_with(source_full_path)
 
-        self._deploy_and_validate_app_create_by_source(source_repository)
-        self.git_exec.get_current_branch_name.assert_any_call(temp_dir)
-        self.git_exec.git_pull.assert_any_call(temp_dir)
-        self.git_exec.remote_git_add.assert_any_call(temp_dir, DokkuProvider.DOKKU_REMOTE_NAME, "dokku@dev.com:myapp")
-        self.git_exec.git_push.assert_any_call(temp_dir, DokkuProvider.DOKKU_REMOTE_NAME, branch_name, "master")
+    @patch('ndeploy.utils.create_temp_directory')
+    def test_should_deploy_remote_source_from_a_worktree_of_the_repository_mirror(self, mock_create_temp_directory):
+        repository = "https://git.nexx.com/utils/ndeploy.git"
+        worktree = "/tmp/myapp-worktree-ndeploy"
+        mirror = os.path.join("/home/user/.ndeploy", "mirrors", hashlib.sha1(repository.encode()).hexdigest() + ".git")
+        mock_create_temp_directory.return_value = worktree
+        self.dokku.ndeploy_dir = "/home/user/.ndeploy"
+
+        self._deploy_and_validate_app_create_by_source(repository + "@develop")
+        self.git_exec.git_mirror.assert_called_once_with(repository, mirror, blobless=True)
+        self.git_exec.git_worktree_add.assert_called_once_with(mirror, worktree, "develop")
+        self.git_exec.git_push_url.assert_any_call(worktree, "dokku@dev.com:myapp",
+                                                   "HEAD", "master")
+        self.git_exec.git_worktree_remove.assert_called_once_with(mirror, worktree)
+        self.git_exec.git_clone_from.assert_not_called()
+
+    def test_should_deepen_shallow_clone_and_push_again_if_push_is_rejected(self):
+        self.git_exec.get_current_branch_name.return_value = "develop"
+        self.git_exec.git_push_url.side_effect = [GitExecError("rejected"), None]
+        self.git_exec.git_deepen.return_value = True
+
+        self._deploy_and_validate_app_create_by_source(".@develop")
+        self.git_exec.git_deepen.assert_called_once_with(".")
+        self.assertEqual(2, self.git_exec.git_push_url.call_count)
+
+    def test_should_raise_push_error_if_repository_is_not_shallow(self):
+        self.git_exec.get_current_branch_name.return_value = "develop"
+        self.git_exec.git_push_url.side_effect = GitExecError("rejected")
+        self.git_exec.git_deepen.return_value = False
+
+        with self.assertRaises(GitExecError):
+            self.dokku.deploy(App("myapp", "mygroup", repository=".@develop"), self.env)
+        self.git_exec.git_push_url.assert_called_once_with(".", "dokku@dev.com:myapp", "develop", "master")
+
+    @patch('ndeploy.utils.create_temp_directory')
+    def test_apps_of_the_same_repository_should_share_the_mirror_fetch(self, mock_create_temp_directory):
+        mock_create_temp_directory.return_value = "/tmp/worktree-ndeploy"
+        self.git_exec.get_current_branch_name.return_value = "master"
+        self.dokku.ndeploy_dir = "/home/user/.ndeploy"
+
+        self.dokku.deploy(App("api", "mygroup", repository="https://git.nexx.com/utils/ndeploy.git@develop"), self.env)
+        self.dokku.deploy(App("worker", "mygroup", repository="https://git.nexx.com/utils/ndeploy.git"), self.env)
+
+        self.assertEqual(1, self.git_exec.git_mirror.call_count)
+        self.git_exec.git_worktree_add.assert_any_call(ANY, "/tmp/worktree-ndeploy", "master")
+        self.git_exec.git_push_url.assert_any_call("/tmp/worktree-ndeploy", "dokku@dev.com:api", "HEAD", "master")
+        self.git_exec.git_push_url.assert_any_call("/tmp/worktree-ndeploy", "dokku@dev.com:worker", "HEAD", "master")
+        self.assertEqual(2, self.git_exec.git_worktree_remove.call_count)
+
+    def test_should_load_host_snapshot_once_for_all_apps_of_the_host(self):
+        self._deploy_and_validate_by_image()
+        self.dokku.deploy(App("otherapp", "mygroup", image="image1.dev.registry.com"), self.env)
+        proxy_reports = [c for c in self.dokku.dokku_exec.call_args_list if c[0][0] == "proxy:report"]
+        self.assertEqual(1, len(proxy_reports))
+
+    def test_should_skip_app_creation_and_port_redirect_if_already_on_host(self):
+        self.dokku.dokku_exec.side_effect = lambda cmd, *args: ("", self._proxy_report()) \
+            if cmd == "proxy:report" else ("", "")
+        self.dokku.deploy(App("myapp", "mygroup", image="image1.dev.registry.com"), self.env)
+
+        executed = [c[0][0] for c in self.dokku.dokku_exec.call_args_list]
+        self.assertNotIn("apps:create myapp", executed)
+        self.assertNotIn("proxy:ports-add myapp http:80:8080", executed)
+        self.assertIn("tags:deploy myapp latest", executed)
+
+    def test_should_parse_proxy_report(self):
+        self.assertEqual({"myapp": {"http:80:8080", "https:443:8080"}, "otherapp": set()},
+                         self.dokku._parse_proxy_report(self._proxy_report()))
+
+    def test_should_skip_config_set_if_env_vars_did_not_change_on_the_host(self):
+        self._configure_running_container({"DATA": "teste", "DOKKU_APP_TYPE": "dockerfile"}, "sha256:old")
+        self.dokku.deploy(App("myapp", "mygroup", image="image1.dev.registry.com", env_vars={"DATA": "teste"}),
+                          self.env)
+
+        self.dokku.dokku_exec.assert_any_call("docker-direct container inspect c1", True)
+        config_sets = [c for c in self.dokku.dokku_exec.call_args_list if c[0][0].startswith("config:set")]
+        self.assertEqual(0, len(config_sets))
+
+        self.dokku.deploy(App("myapp", "mygroup", image="image1.dev.registry.com", env_vars={"DATA": "new"}), self.env)
+        self.dokku.dokku_exec.assert_called_with("tags:deploy myapp latest")
+        self.dokku.dokku_exec.assert_any_call("config:set --no-restart myapp DATA=\"new\"")
+
+    def test_should_skip_tags_deploy_if_the_app_already_runs_the_image_with_the_same_env_vars(self):
+        self._configure_running_container({"DATA": "teste"}, "sha256:abc")
+        self.dokku.deploy(App("myapp", "mygroup", image="image1.dev.registry.com", env_vars={"DATA": "teste"}),
+                          self.env)
+
+        executed = [c[0][0] for c in self.dokku.dokku_exec.call_args_list]
+        self.assertNotIn("tags:deploy myapp latest", executed)
+        self.assertEqual(1, len([cmd for cmd in executed if cmd == "proxy:report"]))
+
+    def test_should_deploy_the_image_if_the_pull_downloaded_a_newer_one(self):
+        self._configure_running_container({"DATA": "teste"}, "sha256:abc",
+                                          pull_status="Status: Downloaded newer image for image1.dev.registry.com")
+        self.dokku.deploy(App("myapp", "mygroup", image="image1.dev.registry.com", env_vars={"DATA": "teste"}),
+                          self.env)
+        self.dokku.dokku_exec.assert_any_call("tags:deploy myapp latest")
+
+    def test_should_parse_host_images_by_tag_and_digest(self):
+        self.dokku.dokku_exec.side_effect = lambda cmd, *args: \
+            ("", "sha256:abc,registry.com/myapp,1.0,sha256:d1\nsha256:def,dokku/myapp,latest,<none>\n") \
+            if cmd.startswith("docker-direct images") else ("", "")
+        self.assertEqual({"registry.com/myapp:1.0": "sha256:abc", "registry.com/myapp@sha256:d1": "sha256:abc",
+                          "dokku/myapp:latest": "sha256:def"}, self.dokku._get_host_image_ids())
+
+    def test_should_set_env_vars_if_the_host_config_could_not_be_read(self):
+        self.dokku.dokku_exec.side_effect = lambda cmd, *args: ("ssh: connect to host dev.com", "") \
+            if cmd.startswith("docker-direct") else ("", "")
+        self.dokku.deploy(App("myapp", "mygroup", image="image1.dev.registry.com", env_vars={"DATA": "teste"}),
+                          self.env)
+        self.dokku.deploy(App("myapp", "mygroup", image="image1.dev.registry.com", env_vars={"DATA": "teste"}),
+                          self.env)
+
+        config_sets = [c for c in self.dokku.dokku_exec.call_args_list if c[0][0].startswith("config:set")]
+        self.assertEqual(2, len(config_sets))
+
+    def test_should_pull_each_image_once_per_host(self):
+        image = "image1.dev.registry.com"
+        self.dokku.deploy(App("myapp", "mygroup", image=image), self.env)
+        self.dokku.deploy(App("otherapp", "mygroup", image=image), self.env)
+        self.dokku.deploy(App("otherapp", "mygroup", image=image), Environment("dokku", "qa", "qa.com"))
+
+        pulls = [c for c in self.dokku.dokku_exec.call_args_list if c[0][0] == "docker-direct pull " + image]
+        self.assertEqual(2, len(pulls))
+        self.dokku.dokku_exec.assert_any_call("docker-direct tag {} dokku/otherapp:latest".format(image))
+
+    def test_should_pull_the_image_again_if_the_pull_failed(self):
+        image = "image1.dev.registry.com"
+        self.dokku.dokku_exec.side_effect = lambda cmd, *args: ("Error response from daemon: timeout", "") \
+            if cmd.startswith("docker-direct pull") else ("", "")
+        self.dokku.deploy(App("myapp", "mygroup", image=image), self.env)
+        self.dokku.deploy(App("otherapp", "mygroup", image=image), self.env)
+
+        pulls = [c for c in self.dokku.dokku_exec.call_args_list if c[0][0] == "docker-direct pull " + image]
+        self.assertEqual(2, len(pulls))
+
+    def test_should_not_pull_image_pinned_by_digest_if_host_has_it(self):
+        image = "registry.com/myapp@sha256:abc123"
+        self.dokku.dokku_exec.side_effect = lambda cmd, *args: ("", "sha256:def456") \
+            if cmd.startswith("docker-direct image inspect") else ("", "")
+        self.app = App("myapp", "mygroup", image=image)
+        self.dokku.deploy(self.app, self.env)
+
+        self.dokku.dokku_exec.assert_any_call("docker-direct image inspect --format {{.Id}} " + image, True)
+        executed = [c[0][0] for c in self.dokku.dokku_exec.call_args_list]
+        self.assertNotIn("docker-direct pull " + image, executed)
+
+    def test_should_pull_image_pinned_by_digest_if_host_does_not_have_it(self):
+        image = "registry.com/myapp@sha256:abc123"
+        self.dokku.dokku_exec.side_effect = lambda cmd, *args: ("Error: No such image", "") \
+            if cmd.startswith("docker-direct image inspect") else ("", "")
+        self.dokku.deploy(App("myapp", "mygroup", image=image), self.env)
+        self.dokku.dokku_exec.assert_any_call("docker-direct pull " + image)
+
+    def test_should_skip_push_if_dokku_remote_has_the_local_commit(self):
+        self.git_exec.get_current_branch_name.return_value = "develop"
+        self.git_exec.get_remote_ref.return_value = "a1b2c3"
+        self.git_exec.get_commit_sha.return_value = "a1b2c3"
+        self._deploy_and_validate_app_create_by_source(".@develop")
+
+        self.git_exec.get_remote_ref.assert_called_once_with("dokku@dev.com:myapp", "refs/heads/master")
+        self.git_exec.get_commit_sha.assert_called_once_with(".", "develop")
+        self.git_exec.git_push_url.assert_not_called()
+
+    def test_should_skip_clone_and_push_if_dokku_remote_has_the_remote_source_commit(self):
+        self.git_exec.get_remote_ref.return_value = "a1b2c3"
+        self._deploy_and_validate_app_create_by_source("https://git.nexx.com/utils/ndeploy.git@develop")
+
+        self.git_exec.get_remote_ref.assert_any_call("https://git.nexx.com/utils/ndeploy.git", "refs/heads/develop")
+        self.git_exec.git_clone_from.assert_not_called()
+        self.git_exec.git_push_url.assert_not_called()
+
+    def test_should_sync_remote_source_on_dokku_host_if_source_sync_is_enabled(self):
+        self.dokku.deploy(App("myapp", "mygroup", repository="https://git.nexx.com/utils/ndeploy.git@develop",
+                              source_sync=True), self.env)
+
+        self.dokku.dokku_exec.assert_any_call("git:sync --build myapp https://git.nexx.com/utils/ndeploy.git develop")
+        self.git_exec.git_clone_from.assert_not_called()
+        self.git_exec.git_push_url.assert_not_called()
+
+    def test_source_sync_should_be_ignored_for_local_repositories(self):
+        self.git_exec.get_current_branch_name.return_value = "develop"
+        self.dokku.deploy(App("myapp", "mygroup", repository=".@develop", source_sync=True), self.env)
+
+        self.git_exec.git_push_url.assert_called_once_with(".", "dokku@dev.com:myapp", "develop", "master")
+        self.assertNotIn("git:sync", " ".join(str(c) for c in self.dokku.dokku_exec.call_args_list))
+
+    def test_should_only_apply_env_vars_if_source_was_already_deployed(self):
+        self.git_exec.get_remote_ref.return_value = "a1b2c3"
+        self._deploy_and_validate_app_create_by_source("https://git.nexx.com/utils/ndeploy.git@develop",
+                                                       env_vars={"DATA": "teste"})
+        self.dokku.dokku_exec.assert_any_call("config:set myapp DATA=\"teste\"")
+        self.git_exec.git_push_url.assert_not_called()
+
+    def test_should_skip_env_vars_if_source_was_already_deployed_with_the_same_host_config(self):
+        self.git_exec.get_remote_ref.return_value = "a1b2c3"
+        self._configure_running_container({"DATA": "teste"}, "sha256:abc")
+        self.dokku.deploy(App("myapp", "mygroup", repository="https://git.nexx.com/utils/ndeploy.git@develop",
+                              env_vars={"DATA": "teste"}), self.env)
+
+        self.assertNotIn("config:set", " ".join(str(c) for c in self.dokku.dokku_exec.call_args_list))
+        self.git_exec.git_push_url.assert_not_called()
+
+    def test_should_push_if_dokku_remote_has_another_commit(self):
+        self.git_exec.get_current_branch_name.return_value = "develop"
+        self.git_exec.get_remote_ref.return_value = "a1b2c3"
+        self.git_exec.get_commit_sha.return_value = "d4e5f6"
+        self._deploy_and_validate_app_create_by_source(".@develop")
+        self.git_exec.git_push_url.assert_any_call(".", "dokku@dev.com:myapp", "develop", "master")
+
+    def test_should_deploy_image_on_all_hosts_of_the_environment(self):
+        dokku = self._create_dokku_with_shell_exec()
+        dokku.deploy(App("myapp", "mygroup", image="image1.dev.registry.com"),
+                     Environment("dokku", "dev", "dev1.com,dev2.com"))
+
+        for host in ["dev1.com", "dev2.com"]:
+            self.shell_exec.execute_program.assert_any_call(
+                "ssh dokku@{} docker-direct pull image1.dev.registry.com".format(host), False)
+            self.shell_exec.execute_program.assert_any_call(
+                "ssh dokku@{} tags:deploy myapp latest".format(host), False)
+        self.assertEqual({"dev1.com", "dev2.com"}, set(dokku.hosts_timings))
+
+    def test_should_report_hosts_that_failed(self):
+        dokku = self._create_dokku_with_shell_exec()
+        self.shell_exec.execute_program.side_effect = \
+            lambda cmd, *args: (_ for _ in ()).throw(OSError("unreachable")) if "dev2.com" in cmd else ("", "")
+
+        with self.assertRaises(DokkuMultiHostDeployError) as context:
+            dokku.deploy(App("myapp", "mygroup", image="image1.dev.registry.com"),
+                         Environment("dokku", "dev", "dev1.com,dev2.com"))
+        self.assertEqual(["dev2.com"], context.exception.failed_hosts)
+        self.shell_exec.execute_program.assert_any_call("ssh dokku@dev1.com tags:deploy myapp latest", False)
+
+    def test_should_build_source_once_and_distribute_the_image_to_the_other_hosts(self):
+        dokku = self._create_dokku_with_shell_exec()
+        self.git_exec.get_current_branch_name.return_value = "develop"
+        self.shell_exec.execute_pipe.return_value = ("", "Loaded image: dokku/myapp:latest")
+
+        dokku.deploy(App("myapp", "mygroup", repository=".@develop"), Environment("dokku", "dev", "dev1.com,dev2.com"))
+
+        self.git_exec.git_push_url.assert_called_once_with(".", "dokku@dev1.com:myapp", "develop", "master")
+        self.shell_exec.execute_pipe.assert_called_once_with(
+            "ssh dokku@dev1.com docker-direct save dokku/myapp:latest", "ssh dokku@dev2.com docker-direct load")
+        self.shell_exec.execute_program.assert_any_call("ssh dokku@dev2.com tags:deploy myapp latest", False)
+
+    def test_should_not_distribute_the_image_if_nothing_was_built_and_host_has_it(self):
+        dokku = self._configure_source_already_deployed_on_hosts({"dev1.com": "sha256:abc", "dev2.com": "sha256:abc"})
+
+        dokku.deploy(App("myapp", "mygroup", repository=".@develop", env_vars={"DATA": "teste"}),
+                     Environment("dokku", "dev", "dev1.com,dev2.com"))
+
+        self.git_exec.git_push_url.assert_not_called()
+        self.shell_exec.execute_pipe.assert_not_called()
+        self.shell_exec.execute_program.assert_any_call("ssh dokku@dev2.com config:set myapp DATA=\"teste\"", False)
+        executed = [c[0][0] for c in self.shell_exec.execute_program.call_args_list]
+        self.assertNotIn("ssh dokku@dev2.com tags:deploy myapp latest", executed)
+
+    def test_should_distribute_the_existing_image_to_hosts_without_it(self):
+        dokku = self._configure_source_already_deployed_on_hosts({"dev1.com": "sha256:abc"})
+        self.shell_exec.execute_pipe.return_value = ("", "Loaded image: dokku/myapp:latest")
+
+        dokku.deploy(App("myapp", "mygroup", repository=".@develop"), Environment("dokku", "dev", "dev1.com,dev2.com"))
+
+        self.git_exec.git_push_url.assert_not_called()
+        self.shell_exec.execute_program.assert_any_call("ssh dokku@dev2.com apps:create myapp", False)
+        self.shell_exec.execute_pipe.assert_called_once_with(
+            "ssh dokku@dev1.com docker-direct save dokku/myapp:latest", "ssh dokku@dev2.com docker-direct load")
+        self.shell_exec.execute_program.assert_any_call("ssh dokku@dev2.com tags:deploy myapp latest", False)
+
+    def test_should_fail_if_built_image_is_not_loaded_on_host(self):
+        dokku = self._create_dokku_with_shell_exec()
+        self.git_exec.get_current_branch_name.return_value = "develop"
+        self.shell_exec.execute_pipe.return_value = ("Error: No such image", "")
+
+        with self.assertRaises(DokkuMultiHostDeployError) as context:
+            dokku.deploy(App("myapp", "mygroup", repository=".@develop"),
+                         Environment("dokku", "dev", "dev1.com,dev2.com"))
+        self.assertEqual(["dev2.com"], context.exception.failed_hosts)
+
+    def test_undeploy_should_destroy_app_on_all_hosts(self):
+        dokku = self._create_dokku_with_shell_exec()
+        dokku.undeploy_apps([App("myapp", "mygroup")], Environment("dokku", "dev", "dev1.com,dev2.com"))
+        for host in ["dev1.com", "dev2.com"]:
+            self.shell_exec.execute_program.assert_any_call(
+                "ssh dokku@{} --force apps:destroy myapp".format(host), False)
+
+    def test_should_stream_local_image_to_host_without_the_layers_it_has(self):
+        stub_dir = self._create_docker_stubs()
+        self.addCleanup(utils.rmtree, stub_dir)
+        dokku = DokkuProvider()
+        dokku.set_shell_exec(ShellExec())
+        dokku.set_git_exec(self.git_exec)
+        dokku.LOCAL_DOCKER_COMMAND = "{} {}".format(sys.executable, os.path.join(stub_dir, "docker"))
+
+        with patch.dict(os.environ, {"PATH": stub_dir + os.pathsep + os.environ["PATH"]}):
+            dokku.deploy(App("myapp", "mygroup", image="myimage:1", image_delivery="stream"), self.env)
+
+        with tarfile.open(os.path.join(stub_dir, "loaded.tar.gz"), "r:gz") as loaded:
+            self.assertEqual(["app/layer.tar", "manifest.json"], loaded.getnames())
+        with open(os.path.join(stub_dir, "ssh.log")) as log:
+            executed = log.read().splitlines()
+        self.assertIn("dokku@dev.com docker-direct tag myimage:1 dokku/myapp:1", executed)
+        self.assertIn("dokku@dev.com tags:deploy myapp 1", executed)
+        self.assertFalse([cmd for cmd in executed if "docker-direct pull" in cmd])
+
+    def test_should_fail_if_streamed_image_is_not_loaded(self):
+        self.dokku.set_shell_exec(self.shell_exec)
+        self.shell_exec.execute_program.return_value = ("", "[sha256:a1]")
+        self.shell_exec.execute_stream.return_value = ("Error: unexpected EOF", "")
+
+        with self.assertRaises(DokkuImageTransferError):
+            self.dokku.deploy(App("myapp", "mygroup", image="myimage:1", image_delivery="stream"), self.env)
 
     # Helpers
 
+    @staticmethod
+    def _create_docker_stubs():
+        """
+        Creates stubs of the local docker and of ssh to the dokku host.
+        The image has the layers base and app, and the host has only base.
+        """
+        stub_dir = utils.create_temp_directory()
+        layers = {name: "sha256:" + hashlib.sha256(name.encode()).hexdigest() for name in ["base", "app"]}
+        image = io.BytesIO()
+        with tarfile.open(fileobj=image, mode="w") as tar:
+            for name, content in [("base/layer.tar", b"base"), ("app/layer.tar", b"app"), ("manifest.json", b"[]")]:
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                tar.addfile(info, io.BytesIO(content))
+        with open(os.path.join(stub_dir, "image.tar"), "wb") as file:
+            file.write(image.getvalue())
+
+        with open(os.path.join(stub_dir, "docker"), "w") as file:
+            file.write("import shutil, sys\n"
+                       "if sys.argv[1] == 'save':\n"
+                       "    shutil.copyfileobj(open({image!r}, 'rb'), sys.stdout.buffer)\n"
+                       "else:\n"
+                       "    print('[{base} {app}]')\n"
+                       .format(image=os.path.join(stub_dir, "image.tar"), **layers))
+
+        with open(os.path.join(stub_dir, "ssh"), "w") as file:
+            file.write("#!{python}\n"
+                       "import shutil, sys\n"
+                       "open({log!r}, 'a').write(' '.join(sys.argv[1:]) + '\\n')\n"
+                       "args = sys.argv[2:]\n"
+                       "if args[:2] == ['docker-direct', 'load']:\n"
+                       "    shutil.copyfileobj(sys.stdin.buffer, open({loaded!r}, 'wb'))\n"
+                       "    print('Loaded image: myimage:1')\n"
+                       "elif args[:2] == ['docker-direct', 'images']:\n"
+                       "    print('sha256:hostimage')\n"
+                       "elif args[:3] == ['docker-direct', 'image', 'inspect']:\n"
+                       "    print('[{base}]')\n"
+                       .format(python=sys.executable, log=os.path.join(stub_dir, "ssh.log"),
+                               loaded=os.path.join(stub_dir, "loaded.tar.gz"), **layers))
+        os.chmod(os.path.join(stub_dir, "ssh"), 0o755)
+        return stub_dir
+
+    def _configure_source_already_deployed_on_hosts(self, image_ids):
+        dokku = self._create_dokku_with_shell_exec()
+        self.git_exec.get_current_branch_name.return_value = "develop"
+        self.git_exec.get_remote_ref.return_value = "a1b2c3"
+        self.git_exec.get_commit_sha.return_value = "a1b2c3"
+        report = "=====> myapp proxy information" if "dev2.com" in image_ids else ""
+
+        def execute_program(cmd, *args):
+            host = cmd.split()[1].split("@")[1]
+            if "image inspect" in cmd:
+                return ("", image_ids[host]) if host in image_ids else ("Error: No such image", "")
+            if "docker-direct images" in cmd:
+                return "", "{},dokku/myapp,latest,<none>".format(image_ids[host]) if host in image_ids else ""
+            if "proxy:report" in cmd:
+                return "", report
+            return "", ""
+        self.shell_exec.execute_program.side_effect = execute_program
+        return dokku
+
+    def _create_dokku_with_shell_exec(self):
+        dokku = DokkuProvider()
+        dokku.set_shell_exec(self.shell_exec)
+        dokku.set_git_exec(self.git_exec)
+        self.shell_exec.execute_program.return_value = ("", "")
+        return dokku
+
+    @staticmethod
+    def _proxy_report():
+        return "=====> myapp proxy information\n" \
+               "       Proxy enabled:                 true\n" \
+               "       Proxy port map:                http:80:8080 https:443:8080\n" \
+               "       Proxy type:                    nginx\n" \
+               "=====> otherapp proxy information\n" \
+               "       Proxy enabled:                 true\n" \
+               "       Proxy port map:                \n"
+
+    def _configure_running_container(self, env_vars, image_id, pull_status="Status: Image is up to date"):
+        """
+        Configures the host with a running container of myapp and the image
+        image1.dev.registry.com:latest with the id sha256:abc.
+        """
+        container = {"Image": image_id, "Config": {"Labels": {"com.dokku.app-name": "myapp"},
+                                                   "Env": ["{}={}".format(*var) for var in env_vars.items()]}}
+        outputs = {"proxy:report": self._proxy_report(),
+                   "docker-direct ps": "c1\n",
+                   "docker-direct container inspect": json.dumps([container]),
+                   "docker-direct images": "sha256:abc,image1.dev.registry.com,latest,<none>\n",
+                   "docker-direct pull": pull_status}
+        self.dokku.dokku_exec.side_effect = lambda cmd, *args: \
+            ("", next((out for prefix, out in outputs.items() if cmd.startswith(prefix)), ""))
+
     def _configure_dokku_exec(self):
         self.dokku.dokku_exec = MagicMock(return_value=("", ""))
 
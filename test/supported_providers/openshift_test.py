@@ -1,6 +1,13 @@
+import os
+import shutil
+import tempfile
 import unittest
+from unittest.mock import patch
+
+import yaml
+
 from supported_providers.openshift import OpenshiftProvider, \
-    OpenShiftNotLoggedError, OpenShiftNameTooLongError
+    OpenShiftNotLoggedError, OpenShiftNameTooLongError, OpenShiftServerMismatchError
 from ndeploy.model import App, Environment
 from unittest.mock import MagicMock, call
 
@@ -10,8 +17,12 @@ class OpenShiftTest(unittest.TestCase):
     def setUp(self):
         self.openshift = OpenshiftProvider()
         self.shell_exec = MagicMock()
+        self.shell_exec.execute_program.return_value = ("", "")
+        self.shell_exec.execute_system.return_value = 0
         self.openshift.set_shell_exec(self.shell_exec)
         self._configure_is_logged(True)
+        self._configure_token_identity(None)
+        self.openshift.get_current_server = MagicMock(return_value="https://dev.com:8443")
         self._configure_openshift_exec()
         self._configure_get_deploy_revision([0, 1])
         self._configure_route_exist("myapp-mygroup.dev.com", True)
@@ -78,6 +89,98 @@ class OpenShiftTest(unittest.TestCase):
         self.shell_exec.execute_system.assert_any_call(
             "oc patch bc myapp -p '{\"spec\":{\"source\":{\"sourceSecret\":{\"name\":\"scmsecret\"}}}}' -n mygroup")
 
+    def test_should_build_the_resolved_source_commit(self):
+        self.shell_exec.execute_program.return_value = ("", "a1b2c3\tHEAD")
+        self._deploy_by_source()
+        self.shell_exec.execute_program.assert_any_call("git ls-remote git@git.nexxera.com/myapp HEAD", True)
+        self.openshift.openshift_exec.assert_any_call("start-build myapp --commit=a1b2c3 --follow")
+
+    def test_should_build_once_apps_with_the_same_repository_and_commit(self):
+        self.shell_exec.execute_program.return_value = ("", "a1b2c3\trefs/heads/develop")
+        repository = "git@git.nexxera.com/myapp#develop"
+        self._deploy(App("myapp", "mygroup", repository=repository))
+        self._deploy(App("otherapp", "mygroup", repository=repository))
+
+        self.shell_exec.execute_program.assert_any_call("git ls-remote git@git.nexxera.com/myapp develop", True)
+        self.openshift.openshift_exec.assert_any_call("start-build myapp --commit=a1b2c3 --follow")
+        self.openshift.openshift_exec.assert_any_call("tag myapp:latest otherapp:latest")
+        builds = [c for c in self.openshift.openshift_exec.call_args_list if c[0][0].startswith("start-build")]
+        self.assertEqual(1, len(builds))
+
+    def test_should_build_again_if_the_build_of_the_commit_failed(self):
+        self.shell_exec.execute_program.return_value = ("", "a1b2c3\tHEAD")
+        self.openshift.openshift_exec.side_effect = lambda cmd, *args, **kwargs: \
+            ("error: build myapp-1 failed", "") if cmd.startswith("start-build myapp ") else (None, "")
+        repository = "git@git.nexxera.com/myapp"
+        self._deploy(App("myapp", "mygroup", repository=repository))
+        self._deploy(App("otherapp", "mygroup", repository=repository))
+
+        self.openshift.openshift_exec.assert_any_call("start-build otherapp --commit=a1b2c3 --follow")
+        tags = [c for c in self.openshift.openshift_exec.call_args_list if c[0][0].startswith("tag ")]
+        self.assertEqual([], tags)
+
+    def test_should_not_pin_the_commit_of_a_local_repository(self):
+        repository = "/home/user/git/myapp#develop"
+        self._deploy(App("myapp", "mygroup", repository=repository))
+        self._deploy(App("otherapp", "mygroup", repository=repository))
+
+        executed = [c[0][0] for c in self.shell_exec.execute_program.call_args_list]
+        self.assertFalse([cmd for cmd in executed if cmd.startswith("git ls-remote")])
+        self.openshift.openshift_exec.assert_any_call("start-build myapp --follow")
+        self.openshift.openshift_exec.assert_any_call("start-build otherapp --follow")
+
+    def test_should_build_each_app_if_commit_is_unknown(self):
+        repository = "git@git.nexxera.com/myapp"
+        self._deploy(App("myapp", "mygroup", repository=repository))
+        self._deploy(App("otherapp", "mygroup", repository=repository))
+        self.openshift.openshift_exec.assert_any_call("start-build myapp --follow")
+        self.openshift.openshift_exec.assert_any_call("start-build otherapp --follow")
+
+    def test_deploy_by_local_source_should_upload_the_working_tree(self):
+        source_dir = self._create_local_source()
+        self._configure_app_exist("myapp", False)
+        self.openshift.openshift_exec.side_effect = \
+            lambda cmd, *args, **kwargs: ("NotFound", "") if cmd == "get bc/myapp" else (None, "")
+        self._deploy(App("myapp", "mygroup", repository=source_dir, binary_build=True))
+
+        self.openshift.git_exec.list_worktree_files.assert_called_once_with(source_dir)
+        self.openshift.openshift_exec.assert_any_call("new-build {} --binary --name myapp".format(source_dir))
+        self.openshift.openshift_exec.assert_any_call("new-app myapp --name myapp")
+        uploads = [c[0][0] for c in self.openshift.openshift_exec.call_args_list
+                   if c[0][0].startswith("start-build myapp --from-archive=")]
+        self.assertEqual(1, len(uploads))
+
+    def test_deploy_by_local_source_should_skip_upload_if_working_tree_did_not_change(self):
+        source_dir = self._create_local_source()
+        self._configure_app_exist("myapp", True)
+        self.openshift.start_binary_build = MagicMock(return_value=None)
+        self._deploy(App("myapp", "mygroup", repository=source_dir, binary_build=True))
+        self._deploy(App("myapp", "mygroup", repository=source_dir, binary_build=True))
+        self.assertEqual(1, self.openshift.start_binary_build.call_count)
+
+        with open(os.path.join(source_dir, "app.py"), "w") as file:
+            file.write("print('changed')")
+        self._deploy(App("myapp", "mygroup", repository=source_dir, binary_build=True))
+        self.assertEqual(2, self.openshift.start_binary_build.call_count)
+
+    def test_deploy_by_local_source_should_upload_again_if_last_build_failed(self):
+        source_dir = self._create_local_source()
+        self._configure_app_exist("myapp", True)
+        self.openshift.start_binary_build = MagicMock(return_value="error: build myapp-1 failed")
+        self._deploy(App("myapp", "mygroup", repository=source_dir, binary_build=True))
+        self.openshift.start_binary_build.return_value = None
+        self._deploy(App("myapp", "mygroup", repository=source_dir, binary_build=True))
+        self._deploy(App("myapp", "mygroup", repository=source_dir, binary_build=True))
+        self.assertEqual(2, self.openshift.start_binary_build.call_count)
+
+    def test_deploy_by_local_source_without_binary_build_should_create_app_from_the_directory(self):
+        source_dir = self._create_local_source()
+        self._configure_app_exist("myapp", False)
+        self._deploy(App("myapp", "mygroup", repository=source_dir))
+
+        self.openshift.git_exec.list_worktree_files.assert_not_called()
+        self.openshift.openshift_exec.assert_any_call("new-app {} --name myapp".format(source_dir))
+
     def test_should_expose_service_if_does_not_exist(self):
         self._configure_route_exist("myapp-mygroup.dev.com", False)
         self._deploy_by_source()
@@ -122,6 +225,16 @@ class OpenShiftTest(unittest.TestCase):
         self.openshift.openshift_exec.assert_any_call(
             "delete all -l app=myapp")
 
+    def test_undeploy_apps_should_delete_all_apps_of_a_project_at_once(self):
+        apps = [App("app1", "group1"), App("app2", "group1"), App("app3", "Group2")]
+        self.openshift.get_openshift_area_name = MagicMock(side_effect=lambda: self.openshift.app.group.lower())
+        self.openshift.undeploy_apps(apps, Environment("openshift", "dev", "dev.com"))
+        self.openshift.openshift_exec.assert_has_calls([
+            call("delete all -l 'app in (app1,app2)'"),
+            call("delete all -l app=app3"),
+        ])
+        self.assertEqual(2, self.openshift.openshift_exec.call_count)
+
     def test_should_not_create_app_if_app_already_exists(self):
         self._configure_app_exist("myapp", True)
         self.openshift.create_app = MagicMock()
@@ -153,6 +266,31 @@ class OpenShiftTest(unittest.TestCase):
         self.openshift.openshift_exec.assert_any_call(
             "deploy myapp --latest")
 
+    def test_should_not_force_deploy_if_image_or_env_changes(self):
+        self._configure_app_exist("myapp", True)
+        self._configure_get_deploy_revision([1, 2])
+        self.openshift.force_deploy = MagicMock()
+        self._deploy_by_image()
+        self.openshift.force_deploy.assert_not_called()
+
+    def test_should_apply_image_and_env_changes_with_rollouts_paused(self):
+        self._configure_app_exist("myapp", True)
+        env_vars = {"APP": "jucabala"}
+        self._deploy_by_image(env_vars=env_vars)
+        self.openshift.openshift_exec.assert_has_calls([
+            call("rollout pause dc/myapp"),
+            call("import-image myapp:latest"),
+            call("env dc/myapp {}".format(self.openshift.prepare_env_vars(env_vars))),
+            call("rollout resume dc/myapp"),
+        ], any_order=False)
+
+    def test_should_resume_rollouts_if_deploy_fails(self):
+        self._configure_app_exist("myapp", True)
+        self.openshift.import_image = MagicMock(side_effect=RuntimeError)
+        with self.assertRaises(RuntimeError):
+            self._deploy_by_image()
+        self.openshift.openshift_exec.assert_any_call("rollout resume dc/myapp")
+
     def test_should_be_route_exist(self):
         self.openshift = OpenshiftProvider()
         self.openshift.app = self._create_app()
@@ -186,8 +324,200 @@ class OpenShiftTest(unittest.TestCase):
         ]
         self.openshift.openshift_exec.assert_has_calls(calls_expected, any_order=False)
 
+    def test_should_verify_login_once_for_the_same_token(self):
+        self._configure_get_deploy_revision([0, 1, 0, 1])
+        self._configure_token_identity("token-1")
+        self._deploy_by_image()
+        self._deploy_by_image()
+        self.assertEqual(1, self.openshift.is_logged.call_count)
+
+    def test_should_verify_login_again_if_token_changes(self):
+        self._configure_get_deploy_revision([0, 1, 0, 1])
+        self._configure_token_identity("token-1")
+        self._deploy_by_image()
+        self._configure_token_identity("token-2")
+        self._deploy_by_image()
+        self.assertEqual(2, self.openshift.is_logged.call_count)
+
+    def test_should_verify_login_every_time_if_token_is_unknown(self):
+        self._configure_get_deploy_revision([0, 1, 0, 1])
+        self._configure_token_identity(None)
+        self._deploy_by_image()
+        self._deploy_by_image()
+        self.assertEqual(2, self.openshift.is_logged.call_count)
+
+    def test_should_verify_login_again_after_auth_error(self):
+        openshift = OpenshiftProvider()
+        openshift.set_shell_exec(self.shell_exec)
+        openshift.app = self._create_app()
+        openshift.env = Environment("openshift", "dev", "dev.com")
+        openshift.cache_login("token-1")
+        self.assertTrue(openshift.is_login_cached("token-1"))
+
+        self.shell_exec.execute_program.return_value = ("error: You must be logged in to the server (Unauthorized)", "")
+        openshift.openshift_exec("get dc/myapp")
+        self.assertFalse(openshift.is_login_cached("token-1"))
+
+    def test_should_use_login_verified_by_another_run(self):
+        self._configure_token_identity("token-1")
+        self.openshift.local_cache.set("login:dev.com", "token-1", ttl=OpenshiftProvider.LOGIN_CACHE_TTL)
+        self._deploy_by_image()
+        self.openshift.is_logged.assert_not_called()
+
+    def test_should_verify_login_if_cached_login_is_near_expiry(self):
+        self._configure_token_identity("token-1")
+        self.openshift.local_cache.set("login:dev.com", "token-1", ttl=OpenshiftProvider.LOGIN_EXPIRY_MARGIN - 1)
+        self._deploy_by_image()
+        self.assertEqual(1, self.openshift.is_logged.call_count)
+
+    def test_should_read_token_identity_from_kubeconfig(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".config") as kubeconfig:
+            kubeconfig.write("current-context: dev\n"
+                             "contexts:\n- name: dev\n  context: {cluster: dev-com, user: dev-user}\n"
+                             "users:\n- name: dev-user\n  user: {token: abc}\n")
+            kubeconfig.flush()
+            with patch.dict(os.environ, {"KUBECONFIG": kubeconfig.name}):
+                openshift = OpenshiftProvider()
+                identity = openshift.get_token_identity()
+                self.assertIsNotNone(identity)
+                self.assertEqual(identity, openshift.get_token_identity())
+
+    def test_should_configure_project_only_once_for_the_same_inputs(self):
+        self._configure_get_deploy_revision([0, 1, 0, 1])
+        self._configure_project_exist("mygroup", True)
+        self._configure_secret_exist("scmsecret", True)
+        self._deploy_by_image()
+        self._deploy_by_image()
+        self.assertEqual(1, self.openshift.project_exist.call_count)
+        self.assertEqual(1, self.openshift.secret_exist.call_count)
+
+    def test_should_configure_project_again_if_annotations_change(self):
+        self._configure_get_deploy_revision([0, 1, 0, 1])
+        self._configure_project_exist("mygroup", True)
+        self._configure_secret_exist("scmsecret", True)
+        self._deploy_by_image()
+        self.openshift.deploy(self._create_app(repository=""), Environment("openshift", "qa", "dev.com"))
+        self.assertEqual(2, self.openshift.project_exist.call_count)
+        self.openshift.openshift_exec.assert_any_call(
+            'patch namespace mygroup --patch \'{"metadata": {"annotations": '
+            '{"openshift.io/node-selector": "region=qa"}}}\'')
+
+    def test_should_configure_project_again_if_a_step_failed(self):
+        self._configure_get_deploy_revision([0, 1, 0, 1, 0, 1])
+        self._configure_project_exist("mygroup", True)
+        self._configure_secret_exist("scmsecret", False)
+        self.shell_exec.execute_system.return_value = 256
+        self._deploy_by_image()
+        self.shell_exec.execute_system.return_value = 0
+        self._deploy_by_image()
+        self._deploy_by_image()
+        self.assertEqual(2, self.shell_exec.execute_system.call_count)
+        self.assertEqual(2, self.openshift.secret_exist.call_count)
+
+    def test_should_configure_project_again_after_missing_resource_error(self):
+        openshift = OpenshiftProvider()
+        openshift.set_shell_exec(self.shell_exec)
+        openshift.app = self._create_app()
+        openshift.env = Environment("openshift", "dev", "dev.com")
+        openshift.local_cache.set(openshift._get_project_cache_key(), openshift.get_project_fingerprint())
+
+        self.shell_exec.execute_program.return_value = \
+            ('Error from server (NotFound): secrets "scmsecret" not found', "")
+        openshift.openshift_exec("get secret scmsecret")
+        self.assertIsNone(openshift.local_cache.get(openshift._get_project_cache_key()))
+
+    @patch("socket.gethostbyname", side_effect=OSError)
+    def test_should_use_an_oc_config_file_per_environment(self, _):
+        ndeploy_dir = self._create_global_kubeconfig()
+
+        openshift = OpenshiftProvider()
+        openshift.set_shell_exec(self.shell_exec)
+        openshift.set_ndeploy_dir(ndeploy_dir)
+        openshift.app = self._create_app()
+        with patch.dict(os.environ, {"KUBECONFIG": os.path.join(ndeploy_dir, "global.config")}):
+            for env_name in ["dev", "qa"]:
+                openshift.env = Environment("openshift", env_name, "{}.com".format(env_name))
+                openshift.openshift_exec("get dc/myapp")
+
+                kubeconfig = os.path.join(ndeploy_dir, "kube", "{}.config".format(env_name))
+                self.shell_exec.execute_program.assert_called_with(
+                    "oc --config={} get dc/myapp -n mygroup ".format(kubeconfig), True)
+                with open(kubeconfig) as file:
+                    config = yaml.safe_load(file)
+                self.assertEqual(env_name, config["current-context"])
+                self.assertEqual(["https://{}.com:8443".format(env_name)],
+                                 [cluster["cluster"]["server"] for cluster in config["clusters"]])
+                self.assertEqual(["{}-user".format(env_name)], [user["name"] for user in config["users"]])
+                self.assertEqual("https://{}.com:8443".format(env_name), openshift.get_current_server())
+                openshift.validate_server()
+
+    @patch("socket.gethostbyname", side_effect=OSError)
+    def test_first_login_check_should_create_the_environment_oc_config_file(self, _):
+        ndeploy_dir = self._create_global_kubeconfig()
+
+        openshift = OpenshiftProvider()
+        openshift.set_shell_exec(self.shell_exec)
+        openshift.set_ndeploy_dir(ndeploy_dir)
+        openshift.app = self._create_app()
+        openshift.env = Environment("openshift", "dev", "dev.com")
+        openshift.is_logged = MagicMock(return_value=True)
+        with patch.dict(os.environ, {"KUBECONFIG": os.path.join(ndeploy_dir, "global.config")}):
+            openshift.handle_login()
+
+        self.assertTrue(os.path.isfile(os.path.join(ndeploy_dir, "kube", "dev.config")))
+        self.assertEqual("https://dev.com:8443", openshift.get_current_server())
+        openshift.is_logged.assert_called_once_with()
+
+    @patch("socket.gethostbyname", side_effect=OSError)
+    def test_should_not_create_oc_config_file_if_no_context_points_to_the_environment(self, _):
+        ndeploy_dir = self._create_global_kubeconfig()
+
+        openshift = OpenshiftProvider()
+        openshift.set_shell_exec(self.shell_exec)
+        openshift.set_ndeploy_dir(ndeploy_dir)
+        openshift.app = self._create_app()
+        openshift.env = Environment("openshift", "prod", "prod.com")
+        with patch.dict(os.environ, {"KUBECONFIG": os.path.join(ndeploy_dir, "global.config")}):
+            openshift.openshift_exec("get dc/myapp")
+
+            self.assertFalse(os.path.exists(os.path.join(ndeploy_dir, "kube", "prod.config")))
+            with self.assertRaises(OpenShiftNotLoggedError):
+                openshift.validate_server()
+
+    @patch("socket.gethostbyname", return_value="10.0.0.1")
+    def test_should_fail_if_oc_config_file_points_to_another_server(self, _):
+        ndeploy_dir = self._create_global_kubeconfig()
+        os.makedirs(os.path.join(ndeploy_dir, "kube"))
+        shutil.copyfile(os.path.join(ndeploy_dir, "global.config"), os.path.join(ndeploy_dir, "kube", "qa.config"))
+
+        openshift = OpenshiftProvider()
+        openshift.set_ndeploy_dir(ndeploy_dir)
+        openshift.env = Environment("openshift", "qa", "qa.com")
+        with self.assertRaises(OpenShiftServerMismatchError):
+            openshift.validate_server()
+
+        openshift.env = Environment("openshift", "qa", "dev-by-ip.com")
+        with open(os.path.join(ndeploy_dir, "kube", "qa.config"), "w") as file:
+            yaml.safe_dump({"current-context": "ip", "contexts": [{"name": "ip", "context": {"cluster": "ip"}}],
+                            "clusters": [{"name": "ip", "cluster": {"server": "https://10.0.0.1:8443"}}]}, file)
+        openshift.validate_server()
+
     # helpers
 
+    def _create_global_kubeconfig(self):
+        ndeploy_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, ndeploy_dir, True)
+        config = {"current-context": "dev", "contexts": [], "clusters": [], "users": []}
+        for env_name in ["dev", "qa"]:
+            config["contexts"].append({"name": env_name,
+                                       "context": {"cluster": env_name, "user": "{}-user".format(env_name)}})
+            config["clusters"].append({"name": env_name,
+                                       "cluster": {"server": "https://{}.com:8443".format(env_name)}})
+            config["users"].append({"name": "{}-user".format(env_name), "user": {"token": env_name}})
+        with open(os.path.join(ndeploy_dir, "global.config"), "w") as file:
+            yaml.safe_dump(config, file)
+        return ndeploy_dir
+
     @staticmethod
     def _create_app(env_vars={}, image=None, repository=None, domains=list()):
         return App("myapp", "mygroup", image=image if image is not None else "image1.dev.nexxera.com",
@@ -210,6 +540,18 @@ class OpenShiftTest(unittest.TestCase):
         env = Environment("openshift", "dev", "dev.com")
         self.openshift.deploy(app, env)
 
+    def _create_local_source(self):
+        source_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source_dir, True)
+        with open(os.path.join(source_dir, "app.py"), "w") as file:
+            file.write("print('app')")
+        self.openshift.set_git_exec(MagicMock())
+        self.openshift.git_exec.list_worktree_files.return_value = ["app.py"]
+        return source_dir
+
+    def _configure_token_identity(self, identity):
+        self.openshift.get_token_identity = MagicMock(return_value=identity)
+
     def _configure_is_logged(self, is_logged):
         self.openshift.is_logged = MagicMock(return_value=is_logged)
 